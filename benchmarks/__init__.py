@@ -0,0 +1 @@
+"""Micro-benchmarks for zeroae-goblet, runnable with asv or directly."""
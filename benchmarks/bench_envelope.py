@@ -0,0 +1,72 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+"""
+Compares slicing the body out of a smee envelope against decoding and re-encoding it.
+
+Run with ``python -m benchmarks.bench_envelope``.
+"""
+
+import json
+import timeit
+
+from zeroae.smee import envelope
+
+
+def make_envelope(n_commits: int) -> str:
+    commit = {
+        "id": "0d1a26e67d8f5eaf1f6ba5c57fc3c7d91ac0fd1c",
+        "message": "Update README.md",
+        "author": {"name": "Monalisa Octocat", "email": "mona@github.com"},
+        "added": [],
+        "removed": [],
+        "modified": ["README.md"],
+        "distinct": True,
+    }
+    body = {"ref": "refs/heads/main", "commits": [commit] * n_commits}
+    body["head_commit"] = dict(commit, message="Update README.md — naïve façade")
+    headers = {"x-github-event": "push", "content-type": "application/json"}
+    data = dict(**headers, body=body, query={}, timestamp=1590000000000)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+class TimeUnwrap:
+    params = [10, 1_000, 20_000]
+    param_names = ["commits"]
+
+    def setup(self, commits):
+        self.data = make_envelope(commits)
+
+    def time_parse(self, commits):
+        envelope.parse(self.data)
+
+    def time_split(self, commits):
+        envelope.split(self.data)
+
+
+def main():
+    bench = TimeUnwrap()
+    for commits in TimeUnwrap.params:
+        bench.setup(commits)
+        size = len(bench.data.encode("utf-8")) / 1024
+        for name in ["time_parse", "time_split"]:
+            fn = getattr(bench, name)
+            number = max(1, 2_000 // commits)
+            best = min(timeit.repeat(lambda: fn(commits), number=number, repeat=5))
+            print(f"{name:12} {size:10.1f} KiB {best / number * 1_000:10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
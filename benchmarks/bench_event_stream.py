@@ -0,0 +1,105 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+"""
+Compares the byte-level EventStreamParser against the original line-based generator.
+
+Run with ``python -m benchmarks.bench_event_stream``.
+"""
+
+import json
+import timeit
+
+import requests_mock
+
+from zeroae.smee import event_stream
+from zeroae.smee.event_stream import Event
+
+N_EVENTS = 200
+
+
+def iter_events_lines(r):
+    """The original ``iter_lines`` based generator, kept as the baseline."""
+    event = None
+    r.encoding = r.encoding if r.encoding else "utf-8"
+    for line in r.iter_lines(chunk_size=128, decode_unicode=True):
+        if not line:
+            if event is not None and event.data is not None:
+                yield event
+            event = None
+        elif line.startswith(":"):
+            pass
+        else:
+            if event is None:
+                event = Event()
+            k, v = line.split(":", maxsplit=1) if ":" in line else (line, "")
+            if hasattr(event, k):
+                event.__setattr__(k, v[1:] if v.startswith(" ") else v)
+
+
+def make_stream(n_events: int, body_size: int) -> bytes:
+    body = {"action": "opened", "padding": "x" * body_size}
+    envelope = {"x-github-event": "push", "body": body, "query": {}, "timestamp": 1}
+    data = json.dumps(envelope, separators=(",", ":"))
+    ping = "event: ping\ndata: {}\n\n"
+    frames = (f"id: {i}\ndata: {data}\n\n{ping}" for i in range(n_events))
+    return "".join(frames).encode("utf-8")
+
+
+class TimeIterEvents:
+    params = ([256, 16 * 1024], [4 * 1024, 64 * 1024])
+    param_names = ["body_size", "chunk_size"]
+
+    def setup(self, body_size, chunk_size):
+        self.stream = make_stream(N_EVENTS, body_size)
+        self.mocker = requests_mock.Mocker()
+        self.mocker.start()
+        self.mocker.get("mock://smee.io/bench", content=self.stream)
+
+    def teardown(self, body_size, chunk_size):
+        self.mocker.stop()
+
+    def time_iter_lines(self, body_size, chunk_size):
+        r = event_stream.get("mock://smee.io/bench")
+        for _ in iter_events_lines(r):
+            pass
+
+    def time_parser(self, body_size, chunk_size):
+        r = event_stream.get("mock://smee.io/bench")
+        for _ in r.iter_events(chunk_size=chunk_size):
+            pass
+
+
+def main():
+    bench = TimeIterEvents()
+    for body_size in TimeIterEvents.params[0]:
+        for chunk_size in TimeIterEvents.params[1]:
+            bench.setup(body_size, chunk_size)
+            try:
+                for name in ["time_iter_lines", "time_parser"]:
+                    fn = getattr(bench, name)
+                    best = min(
+                        timeit.repeat(lambda: fn(body_size, chunk_size), number=5)
+                    )
+                    print(
+                        f"{name:16} body={body_size:>6}B chunk={chunk_size:>6}B "
+                        f"{best / 5 * 1_000:8.2f} ms/{N_EVENTS} events"
+                    )
+            finally:
+                bench.teardown(body_size, chunk_size)
+
+
+if __name__ == "__main__":
+    main()
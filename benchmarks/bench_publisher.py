@@ -0,0 +1,85 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+"""
+Compares the native Publisher against PyPubSub's sendMessage, the previous path.
+
+Run with ``python -m benchmarks.bench_publisher``.
+"""
+
+import timeit
+
+from pubsub import pub
+from pubsub.utils import ExcPublisher
+
+from zeroae.goblet.publisher import Publisher
+
+N_MESSAGES = 10_000
+TOPICS = ["gh", "gh.bench", "gh.bench.opened"]
+
+# The GitHubAppBlueprint setup.
+pub.setListenerExcHandler(ExcPublisher(pub.getDefaultTopicMgr()))
+
+
+class TimeSend:
+    params = [1, 10]
+    param_names = ["listeners_per_topic"]
+
+    def setup(self, listeners_per_topic):
+        self.payload = {"action": "opened"}
+        # Bound methods, PyPubSub only keeps weak references to its listeners.
+        self.listeners = [Listener() for _ in range(listeners_per_topic)]
+
+        self.publisher = Publisher()
+        for topic in TOPICS:
+            for listener in self.listeners:
+                pub.subscribe(listener.__call__, topic)
+                self.publisher.subscribe(listener.__call__, topic)
+
+    def teardown(self, listeners_per_topic):
+        pub.unsubAll()
+
+    def time_pubsub(self, listeners_per_topic):
+        for _ in range(N_MESSAGES):
+            pub.sendMessage("gh.bench.opened", payload=self.payload)
+
+    def time_publisher(self, listeners_per_topic):
+        for _ in range(N_MESSAGES):
+            self.publisher.send("gh.bench.opened", self.payload)
+
+
+class Listener:
+    def __call__(self, payload):
+        pass
+
+
+def main():
+    bench = TimeSend()
+    for n in TimeSend.params:
+        bench.setup(n)
+        try:
+            for name in ["time_pubsub", "time_publisher"]:
+                fn = getattr(bench, name)
+                best = min(timeit.repeat(lambda: fn(n), number=1, repeat=5))
+                print(
+                    f"{name:15} listeners={n * len(TOPICS):>3} "
+                    f"{best / N_MESSAGES * 1_000_000:8.2f} us/message"
+                )
+        finally:
+            bench.teardown(n)
+
+
+if __name__ == "__main__":
+    main()
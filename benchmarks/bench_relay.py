@@ -0,0 +1,125 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+"""
+Broadcast throughput of the relay, one channel and many subscribers.
+
+The relay runs on this process' event loop, the subscribers are spread over a few
+child processes so they do not compete with it for the same core.
+
+Run with ``python -m benchmarks.bench_relay``.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import time
+from typing import Tuple
+
+from zeroae.smee.relay import Relay
+
+N_EVENTS = 10_000
+BATCH = 100
+PROCESSES = 4
+
+
+async def subscribe(port: int, n_events: int):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /bench HTTP/1.1\r\nAccept: text/event-stream\r\n\r\n")
+    # Count the frames' blank lines, the ready event included.
+    received, last = -1, b""
+    while received < n_events:
+        chunk = await reader.read(1 << 16)
+        if not chunk:
+            raise ConnectionError("The relay hung up")
+        received += (last + chunk).count(b"\n\n")
+        last = chunk[-1:]
+    writer.close()
+
+
+def subscribers(port: int, n_subscribers: int, n_events: int):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    tasks = [subscribe(port, n_events) for _ in range(n_subscribers)]
+    loop.run_until_complete(asyncio.gather(*tasks))
+    loop.close()
+
+
+async def broadcast(n_subscribers: int, body_size: int) -> Tuple[float, float]:
+    """Returns the wall-clock and the relay's CPU seconds to broadcast N_EVENTS."""
+    relay = await Relay(port=0, max_subscriber_buffer=64 << 20).start()
+    loop = asyncio.get_event_loop()
+    processes = []
+    for i in range(min(PROCESSES, n_subscribers)):
+        n = len(range(i, n_subscribers, PROCESSES))
+        p = multiprocessing.Process(
+            target=subscribers, args=(relay.port, n, N_EVENTS), daemon=True
+        )
+        p.start()
+        processes.append(p)
+    while len(relay.channel("bench").subscribers) < n_subscribers:
+        await asyncio.sleep(0.01)
+
+    body = json.dumps({"action": "opened", "padding": "x" * body_size}).encode()
+    headers = {"x-github-event": "pull_request", "content-type": "application/json"}
+    start, cpu = time.perf_counter(), time.process_time()
+    for i in range(0, N_EVENTS, BATCH):
+        for _ in range(BATCH):
+            relay.publish("bench", headers, body)
+        await asyncio.sleep(0)
+    writers = relay.channel("bench").subscribers
+    while any(w.transport.get_write_buffer_size() for w in writers):
+        await asyncio.sleep(0.001)
+    # Stop counting the relay's CPU time once it handed every event to the kernel.
+    cpu = time.process_time() - cpu
+    for p in processes:
+        await loop.run_in_executor(None, p.join)
+    elapsed = time.perf_counter() - start
+    await relay.close()
+    return elapsed, cpu
+
+
+class TimeBroadcast:
+    params = ([1, 100, 300], [256, 4 * 1024])
+    param_names = ["subscribers", "body_size"]
+
+    def time_broadcast(self, subscribers, body_size):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(broadcast(subscribers, body_size))
+        finally:
+            loop.close()
+
+
+def main():
+    for subscribers in TimeBroadcast.params[0]:
+        for body_size in TimeBroadcast.params[1]:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                elapsed, cpu = loop.run_until_complete(
+                    broadcast(subscribers, body_size)
+                )
+            finally:
+                loop.close()
+            print(
+                f"subscribers={subscribers:>4} body={body_size:>5}B "
+                f"{N_EVENTS / elapsed:10,.0f} events/s, "
+                f"{N_EVENTS / cpu:10,.0f} events per relay CPU second"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+"""
+Compares WebhookVerifier against octokit's webhook.verify, on 1KB to 5MB payloads.
+
+Run with ``python -m benchmarks.bench_signatures``.
+"""
+
+import hmac
+import json
+import timeit
+import uuid
+
+from octokit import webhook
+
+from zeroae.goblet.signatures import WebhookVerifier
+
+SECRET = "bench-secret"
+
+
+def sign(body: bytes, algorithm: str) -> str:
+    return f"{algorithm}={hmac.new(SECRET.encode(), body, algorithm).hexdigest()}"
+
+
+def make_request(body_size: int):
+    body = json.dumps({"action": "opened", "padding": "x" * body_size}).encode()
+    headers = {
+        "X-GitHub-Delivery": str(uuid.uuid4()),
+        "X-GitHub-Event": "push",
+        "X-Hub-Signature": sign(body, "sha1"),
+        "x-hub-signature-256": sign(body, "sha256"),
+    }
+    return headers, body
+
+
+class TimeVerify:
+    params = [1024, 64 * 1024, 1024 * 1024, 5 * 1024 * 1024]
+    param_names = ["body_size"]
+
+    def setup(self, body_size):
+        self.headers, self.body = make_request(body_size)
+        self.verifier = WebhookVerifier([SECRET])
+
+    def time_octokit(self, body_size):
+        # The blueprint decoded the raw body, before octokit encoded it back.
+        body = self.body.decode("utf-8")
+        assert webhook.verify(self.headers, body, SECRET, events=["*"])
+
+    def time_verifier(self, body_size):
+        assert self.verifier.verify(self.headers, self.body)
+
+
+def main():
+    bench = TimeVerify()
+    for body_size in TimeVerify.params:
+        bench.setup(body_size)
+        number = max(1, 1024 * 1024 // body_size)
+        for name in ["time_octokit", "time_verifier"]:
+            fn = getattr(bench, name)
+            best = min(timeit.repeat(lambda: fn(body_size), number=number))
+            print(
+                f"{name:14} body={body_size:>8}B "
+                f"{best / number * 1_000_000:10.1f} us/request"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-from collections import defaultdict
+import hmac
+import threading
+import uuid
 from http import HTTPStatus
-from typing import DefaultDict
 
 import pytest
 from pubsub import pub
@@ -8,6 +9,11 @@ from pytest_chalice.handlers import RequestHandler
 
 import zeroae
 from zeroae.goblet.chalice import bp
+from zeroae.goblet.payload import LazyPayload, Receivers
+from zeroae.goblet.queues import Delivery
+from zeroae.goblet.signatures import WebhookVerifier
+
+DELIVERY = "72d3162e-cc78-11e3-81ab-4c9367dc0958"
 
 
 @pytest.fixture
@@ -17,13 +23,17 @@ def no_requests(monkeypatch):
 
 
 @pytest.fixture
-def mock_request(monkeypatch) -> DefaultDict:
-    responses = defaultdict()
-    monkeypatch.setattr(
-        "requests.sessions.Session.request",
-        lambda *a, **kw: responses[(kw["method"], kw["url"])],
-    )
-    return responses
+def mock_listener():
+    """A gh.mock listener, recording the payloads it received."""
+    payloads = []
+
+    def listener(payload):
+        payloads.append(payload)
+
+    bp.on_gh_event("mock")(listener)
+    yield payloads
+    bp.publisher.unsubscribe(listener, "gh.mock")
+    bp._receivers.clear()
 
 
 @pytest.fixture(
@@ -33,7 +43,7 @@ def mock_request(monkeypatch) -> DefaultDict:
     ]
 )
 def mock_headers(request):
-    return request.param
+    return {**request.param, "x-github-delivery": str(uuid.uuid4())}
 
 
 def test_register(client: RequestHandler, mock_headers):
@@ -47,41 +57,328 @@ def test_register_callback_no_code(client: RequestHandler, mock_headers):
 
 
 def test_register_callback(
-    client: RequestHandler, monkeypatch, mock_headers, mock_request
+    client: RequestHandler, monkeypatch, mock_headers, requests_mock
 ):
     code = "mock-code"
-
-    class MockResponse:
-        @staticmethod
-        def json():
-            return {"html_url": "http://next.test"}
-
-    mock_request.default_factory = lambda *a, **kw: MockResponse()
+    requests_mock.post(
+        f"{zeroae.goblet.config.GHE_API_URL.geturl()}/app-manifests/{code}/conversions",
+        json={"html_url": "http://next.test"},
+    )
 
     monkeypatch.setattr(
         zeroae.goblet.config, "save_app_registration", lambda *a, **kw: True
     )
     response = client.get(f"/callback?code={code}", headers=mock_headers)
     assert response.status_code == HTTPStatus.SEE_OTHER
+    assert response.headers["Location"] == "http://next.test/installations/new"
 
 
-def test_events(client: RequestHandler, monkeypatch, mock_headers, no_requests):
-    monkeypatch.setattr("pubsub.pub.sendMessage", lambda *args, **kwargs: True)
+def test_events(
+    client: RequestHandler, monkeypatch, mock_headers, mock_listener, no_requests
+):
+    monkeypatch.setattr(bp, "publish", lambda *args: True)
     mock_headers["x-github-event"] = "mock"
 
-    monkeypatch.setattr("octokit.webhook.verify", lambda *args, **kwargs: True)
+    monkeypatch.setattr(WebhookVerifier, "verify", lambda *args: True)
     # 📜: There is a bug in chalice that erases route method information...
     response = client.get(f"/events", headers=mock_headers, body="{}")
     assert response.status_code == HTTPStatus.OK
 
-    monkeypatch.setattr("octokit.webhook.verify", lambda *args, **kwargs: False)
+    monkeypatch.setattr(WebhookVerifier, "verify", lambda *args: False)
     response = client.get(f"/events", headers=mock_headers, body="{}")
     assert response.status_code == HTTPStatus.FORBIDDEN
 
 
+def test_events_signature(
+    client: RequestHandler, monkeypatch, mock_headers, mock_listener
+):
+    monkeypatch.setattr(bp, "publish", lambda *args: True)
+    monkeypatch.setattr("zeroae.goblet.config.APP_WEBHOOK_SECRET", "new-secret")
+    monkeypatch.setattr("zeroae.goblet.config.APP_WEBHOOK_SECRETS", ["old-secret"])
+    mock_headers["x-github-event"] = "mock"
+
+    for secret in ["new-secret", "old-secret"]:
+        digest = hmac.new(secret.encode(), b"{}", "sha256").hexdigest()
+        mock_headers["x-hub-signature-256"] = f"sha256={digest}"
+        response = client.get("/events", headers=mock_headers, body="{}")
+        assert response.status_code == HTTPStatus.OK
+
+    response = client.get("/events", headers=mock_headers, body="[]")
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+def test_events_async(client: RequestHandler, monkeypatch, mock_headers, mock_listener):
+    published = []
+    monkeypatch.setattr(bp, "publish", lambda topic, payload: published.append(topic))
+    monkeypatch.setattr(WebhookVerifier, "verify", lambda *args: True)
+    monkeypatch.setattr(zeroae.goblet.config, "DISPATCH_MODE", "async")
+    mock_headers["x-github-event"] = "mock"
+
+    response = client.get("/events", headers=mock_headers, body="{}")
+    assert response.status_code == HTTPStatus.ACCEPTED
+    bp.dispatcher.join()
+    assert published == ["gh.mock"]
+    assert bp.stats["dispatch"]["published"] == 1
+
+    monkeypatch.setattr(bp.dispatcher, "submit", lambda *args: False)
+    mock_headers["x-github-delivery"] = str(uuid.uuid4())
+    response = client.get("/events", headers=mock_headers, body="{}")
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    bp.shutdown()
+
+
+def test_events_queue(client: RequestHandler, monkeypatch, mock_headers, mock_listener):
+    from zeroae.goblet.queues import MemoryQueue
+
+    monkeypatch.setattr(WebhookVerifier, "verify", lambda *args: True)
+    monkeypatch.setattr(zeroae.goblet.config, "DISPATCH_MODE", "queue")
+    monkeypatch.setattr(bp, "_ingress", MemoryQueue())
+    monkeypatch.setattr(bp, "_deliveries", None)
+    monkeypatch.setattr(zeroae.goblet.config, "DELIVERY_CACHE_URL", "")
+    mock_headers["x-github-event"] = "mock"
+    mock_headers["x-github-delivery"] = DELIVERY
+
+    response = client.get("/events", headers=mock_headers, body='{"a": 1}')
+    assert response.status_code == HTTPStatus.ACCEPTED
+    delivery = bp.ingress.get(timeout=0)
+    assert (delivery.id, delivery.topic) == (DELIVERY, "gh.mock")
+    assert delivery.body == b'{"a": 1}'
+
+
+def test_events_redelivery(
+    client: RequestHandler, monkeypatch, mock_headers, mock_listener
+):
+    from zeroae.goblet.deliveries import MemoryDeliveryCache
+    from zeroae.goblet.queues import MemoryQueue
+
+    monkeypatch.setattr(WebhookVerifier, "verify", lambda *args: True)
+    monkeypatch.setattr(bp, "_deliveries", MemoryDeliveryCache())
+    mock_headers["x-github-event"] = "mock"
+    mock_headers["x-github-delivery"] = DELIVERY
+
+    for _ in range(2):
+        response = client.get("/events", headers=mock_headers, body="{}")
+        assert response.status_code == HTTPStatus.OK
+    assert mock_listener == [{}]
+    assert bp.stats["deliveries"]["hits"] == 1
+
+    # The delivery that could not be queued is not a duplicate when retried.
+    monkeypatch.setattr(zeroae.goblet.config, "DISPATCH_MODE", "queue")
+    monkeypatch.setattr(bp, "_ingress", MemoryQueue(max_size=1))
+    mock_headers["x-github-delivery"] = "0b4e3f5c-cc78-11e3-81ab-4c9367dc0958"
+    bp.ingress.put(Delivery("full", "gh.mock", b"{}"))
+    response = client.get("/events", headers=mock_headers, body="{}")
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    bp.ingress.get(timeout=0)
+    response = client.get("/events", headers=mock_headers, body="{}")
+    assert response.status_code == HTTPStatus.ACCEPTED
+
+
+def test_events_without_listeners(client: RequestHandler, monkeypatch, mock_headers):
+    monkeypatch.setattr(WebhookVerifier, "verify", lambda *args: True)
+    mock_headers["x-github-event"] = "gollum"
+    skipped = bp.counters["skipped"]
+
+    response = client.get("/events", headers=mock_headers, body="not json")
+    assert response.status_code == HTTPStatus.OK
+    assert bp.counters["skipped"] == skipped + 1
+
+
+def test_events_headers(client: RequestHandler, monkeypatch, mock_headers):
+    monkeypatch.setattr(WebhookVerifier, "verify", lambda *args: True)
+
+    # Signed, but without the event.
+    response = client.get("/events", headers=mock_headers, body="{}")
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    for event in ["not_a_github_event", "push.created", "../push"]:
+        mock_headers["x-github-event"] = event
+        response = client.get("/events", headers=mock_headers, body="{}")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    mock_headers["x-github-event"] = "gollum"
+    for delivery in [None, "abc", DELIVERY.upper()]:
+        mock_headers.pop("x-github-delivery", None)
+        if delivery is not None:
+            mock_headers["x-github-delivery"] = delivery
+        response = client.get("/events", headers=mock_headers, body="{}")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    mock_headers["x-github-delivery"] = DELIVERY
+    response = client.get("/events", headers=mock_headers, body="{}")
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_lazy_payload(monkeypatch):
+    payloads = []
+
+    def listener(payload):
+        payloads.append(payload)
+
+    bp.on_gh_event("lazy_mock", lazy=True)(listener)
+    assert bp.receivers("gh.lazy_mock") is Receivers.LAZY
+    bp.deliver("gh.lazy_mock", b'{"action": "opened"}')
+    (payload,) = payloads
+    assert isinstance(payload, LazyPayload)
+    assert not payload.decoded
+    assert payload["action"] == "opened"
+
+    # A listener of the parent topic expects a dict, the payload must be decoded.
+    def eager(payload):
+        payloads.append(payload)
+
+    bp.on_gh_event("*")(eager)
+    assert bp.receivers("gh.lazy_mock") is Receivers.EAGER
+    bp.deliver("gh.lazy_mock", b'{"action": "closed"}')
+    assert payloads[1:] == [{"action": "closed"}] * 2
+    bp.publisher.unsubscribe(eager, "gh")
+    bp.publisher.unsubscribe(listener, "gh.lazy_mock")
+    bp._receivers.clear()
+
+
+def test_on_gh_event_action():
+    received = []
+
+    def opened(payload):
+        received.append(("opened", payload["number"]))
+
+    def labeled(payload):
+        received.append(("labeled", payload["number"]))
+
+    def any_action(payload):
+        received.append(("any", payload["number"]))
+
+    bp.on_gh_event("route_mock.opened")(opened)
+    bp.on_gh_event("route_mock.labeled", repository="zeroae/goblet", label="bug")(
+        labeled
+    )
+    bp.on_gh_event("route_mock")(any_action)
+
+    repository = b'"repository": {"full_name": "zeroae/goblet"}'
+    bp.dispatch("gh.route_mock", b'{"action": "opened", "number": 1}')
+    bp.dispatch("gh.route_mock", b'{"action": "closed", "number": 2}')
+    bp.dispatch(
+        "gh.route_mock",
+        b'{"action": "labeled", "number": 3, "label": {"name": "bug"}, %s}'
+        % repository,
+    )
+    bp.dispatch(
+        "gh.route_mock",
+        b'{"action": "labeled", "number": 4, "label": {"name": "docs"}, %s}'
+        % repository,
+    )
+    assert sorted(received) == [
+        ("any", 1),
+        ("any", 2),
+        ("any", 3),
+        ("any", 4),
+        ("labeled", 3),
+        ("opened", 1),
+    ]
+    bp.publisher.unsubscribe(opened, "gh.route_mock.opened")
+    bp.publisher.unsubscribe(labeled.listener, "gh.route_mock.labeled")
+    bp.publisher.unsubscribe(any_action, "gh.route_mock")
+    bp._receivers.clear()
+
+
 def test_on_gh_event():
     @bp.on_gh_event("mock")
     def ping(payload):
         pass
 
-    assert pub.getDefaultTopicMgr().getTopic("gh.mock") is not None
+    assert ping in bp.publisher.listeners("gh.mock")
+    bp.publisher.unsubscribe(ping, "gh.mock")
+
+
+def test_on_gh_events():
+    batches = []
+
+    @bp.on_gh_events("batch_mock", max_batch=2, max_wait=60)
+    def handler(payloads):
+        batches.append(payloads)
+
+    for i in range(3):
+        bp.deliver("gh.batch_mock", b'{"i": %d}' % i)
+    assert batches == [[{"i": 0}, {"i": 1}]]
+    assert bp.stats["batches"]["test_on_gh_events.<locals>.handler"]["pending"] == 1
+
+    bp.shutdown()
+    assert batches[1:] == [[{"i": 2}]]
+    bp.publisher.unsubscribe(handler.listener, "gh.batch_mock")
+    bp._batchers.remove(handler.batcher)
+
+
+def test_coalesce(mock_listener):
+    bp.coalesce("mock", key=lambda p: p["ref"], window=60)
+    for i in range(3):
+        bp.deliver("gh.mock", b'{"ref": "main", "i": %d}' % i)
+    assert mock_listener == []
+    assert bp.stats["coalesce"]["gh.mock"]["coalesced"] == 2
+
+    bp.shutdown()
+    assert mock_listener == [{"ref": "main", "i": 2}]
+    bp._coalescers.clear()
+
+
+def test_coalesce_action(monkeypatch):
+    received = []
+    published = threading.Event()
+
+    def listener(payload):
+        received.append((payload["action"], threading.current_thread().name))
+        if payload["action"] == "synchronize":
+            published.set()
+
+    monkeypatch.setattr(zeroae.goblet.config, "DISPATCH_MODE", "async")
+    # Only the event has a listener.
+    bp.on_gh_event("coalesce_mock")(listener)
+    bp.coalesce("coalesce_mock.synchronize", key=lambda p: p["ref"], window=0.2)
+    for action in [b"synchronize", b"synchronize", b"opened"]:
+        bp.dispatch("gh.coalesce_mock", b'{"action": "%s", "ref": "a"}' % action)
+    bp.dispatcher.join()
+    assert [a for a, _ in received] == ["opened"]
+    assert bp.stats["coalesce"]["gh.coalesce_mock.synchronize"]["coalesced"] == 1
+
+    # Published by a dispatcher worker, not by the timer thread.
+    assert published.wait(1)
+    assert received[1][1].startswith("goblet-dispatch-")
+    bp.shutdown()
+
+    # Nothing is left pending once the sync responses are returned.
+    received.clear()
+    monkeypatch.setattr(zeroae.goblet.config, "DISPATCH_MODE", "sync")
+    bp.dispatch("gh.coalesce_mock", b'{"action": "synchronize", "ref": "a"}')
+    assert received == [("synchronize", threading.current_thread().name)]
+    assert bp._dispatcher is None
+
+    bp.publisher.unsubscribe(listener, "gh.coalesce_mock")
+    bp._coalescers.clear()
+    bp._receivers.clear()
+
+
+def test_pubsub_compatibility(monkeypatch, mock_listener):
+    received = []
+
+    def listener(payload):
+        received.append(payload)
+
+    pub.subscribe(listener, "gh.mock")
+    bp.deliver("gh.mock", b"{}")
+    assert (mock_listener, received) == ([{}], [])
+
+    monkeypatch.setattr(zeroae.goblet.config, "DISPATCH_PUBSUB", True)
+    bp.deliver("gh.mock", b"{}")
+    assert (mock_listener, received) == ([{}, {}], [{}])
+    pub.unsubscribe(listener, "gh.mock")
+
+
+def test_listener_errors(mock_listener):
+    def broken(payload):
+        raise RuntimeError("broken")
+
+    bp.on_gh_event("mock")(broken)
+    failed = bp.publisher.stats["failed"]
+    bp.deliver("gh.mock", b"{}")
+    assert mock_listener == [{}]
+    assert bp.publisher.stats["failed"] == failed + 1
+    bp.publisher.unsubscribe(broken, "gh.mock")
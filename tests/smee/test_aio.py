@@ -0,0 +1,118 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+import asyncio
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from zeroae.smee import cli
+from zeroae.smee.aio import KeyedDispatcher, repository_key
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_keyed_dispatcher_order_per_key():
+    delivered = []
+    running = set()
+    max_running = 0
+
+    async def handler(key, i):
+        nonlocal max_running
+        running.add((key, i))
+        max_running = max(max_running, len(running))
+        await asyncio.sleep(0.001 * (3 - key))
+        running.remove((key, i))
+        delivered.append((key, i))
+
+    async def main():
+        dispatcher = KeyedDispatcher(handler, concurrency=2)
+        for i in range(5):
+            for key in range(3):
+                await dispatcher.submit(key, key, i)
+        await dispatcher.join()
+        assert dispatcher.lanes == 0
+
+    run(main())
+
+    assert max_running == 2
+    for key in range(3):
+        assert [i for k, i in delivered if k == key] == list(range(5))
+
+
+def test_keyed_dispatcher_handler_errors():
+    delivered = []
+
+    async def handler(i):
+        if i == 0:
+            raise RuntimeError("boom")
+        delivered.append(i)
+
+    async def main():
+        dispatcher = KeyedDispatcher(handler, concurrency=1, max_pending=1)
+        for i in range(3):
+            await dispatcher.submit(None, i)
+        await dispatcher.join()
+
+    run(main())
+    assert delivered == [1, 2]
+
+
+@pytest.mark.parametrize(
+    "body,key",
+    [
+        ({"repository": {"id": 42, "name": "goblet"}}, b"42"),
+        ({"zen": "Keep it logically awesome."}, None),
+    ],
+)
+def test_repository_key(body, key):
+    body = json.dumps(body, separators=(",", ":")).encode()
+    assert repository_key({}, body) == key
+
+
+def test_command_line_interface_async(requests_mock):
+    url = "mock://smee.io/new"
+    messages = [
+        {"body": {"repository": {"id": i % 2}, "i": i}, "timestamp": 1, "query": {}}
+        for i in range(6)
+    ]
+    stream = "event:ready\ndata:{}\n\n"
+    stream += "".join(f"data:{json.dumps(m)}\n\n" for m in messages)
+    requests_mock.get(url, text=stream)
+
+    target_url = "mock://target.io/events"
+    requests_mock.post(target_url)
+
+    runner = CliRunner()
+    args = [f"--url={url}", f"--target={target_url}", "--no-reconnect"]
+    args += ["--async", "--concurrency=3"]
+    result = runner.invoke(cli.smee, args)
+    assert result.exit_code == 0
+    assert f"Connected {url}" in result.output
+
+    posts = [r.json() for r in requests_mock.request_history if r.method == "POST"]
+    assert len(posts) == len(messages)
+    for repo in range(2):
+        expected = [
+            m["body"]["i"] for m in messages if m["body"]["repository"]["id"] == repo
+        ]
+        assert [p["i"] for p in posts if p["repository"]["id"] == repo] == expected
@@ -0,0 +1,83 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+import json
+
+import pytest
+
+from zeroae.smee import envelope
+
+BODIES = [
+    {},
+    {"zen": "Keep it logically awesome.", "hook_id": 1, "active": True},
+    {"action": "opened", "pull_request": {"title": "🥇 naïve ✓", "body": None}},
+    {"commits": [{"message": 'fix "quotes" \\ and\nnewlines\t\x01'}]},
+    {"query": {"body": [1, 2.5, -3e-05]}, "nested": ',"query":{"a":1}'},
+    ["a", " ", "😀"],
+]
+
+
+def stringify(o) -> str:
+    """Mimics JavaScript's JSON.stringify, as used by smee.io."""
+    return json.dumps(o, separators=(",", ":"), ensure_ascii=False)
+
+
+@pytest.mark.parametrize("body", BODIES)
+@pytest.mark.parametrize("query", [{}, {"a": "b", "query": {"x": "y"}}])
+def test_split_is_byte_identical(body, query):
+    headers = {"x-github-event": "push", "x-github-delivery": "72d3162e"}
+    data = stringify(dict(**headers, body=body, query=query, timestamp=1590000000))
+
+    assert envelope.split(data) == envelope.parse(data)
+    assert envelope.split(data) == (
+        headers,
+        json.dumps(body, separators=(",", ":")).encode(),
+    )
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        '{"body":{},"timestamp":1}',
+        '{"x":"y","body": {},"query":{},"timestamp":1}',
+        '{"x":"y", "body":{},"query":{},"timestamp":1}',
+        '{"body":{},"query":{}}',
+    ],
+)
+def test_split_unexpected_layout(data):
+    assert envelope.split(data) is None
+
+
+def test_client_passthrough(requests_mock):
+    from zeroae.smee import SmeeClient
+
+    body = {"action": "opened", "title": "naïve"}
+    data = stringify(
+        {"x-github-event": "issues", "body": body, "query": {}, "timestamp": 1}
+    )
+    requests_mock.get("mock://smee.io/channel", text=f"data:{data}\n\n")
+    target = requests_mock.post("mock://target.io/events")
+
+    client = SmeeClient(
+        "mock://smee.io/channel",
+        "mock://target.io/events",
+        passthrough=True,
+        reconnect=False,
+    )
+    client.run()
+
+    assert target.last_request.body == b'{"action":"opened","title":"na\\u00efve"}'
+    assert target.last_request.headers["x-github-event"] == "issues"
+    assert client.stats["unsplit"] == 0
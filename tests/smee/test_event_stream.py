@@ -76,3 +76,49 @@ def test_one_json_event(stream, data, requests_mock):
     assert len(events) == 1
     assert events[0].type == "message"
     assert events[0].json() == data
+
+
+@pytest.mark.parametrize("eol", ["\n", "\r", "\r\n"])
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1024])
+def test_parser_line_endings(eol, chunk_size):
+    lines = ["\ufeff: comment", "id: 1", "event: ready", "data: {}", ""]
+    lines += ["data: a", "data:b"]
+    stream = eol.join(lines)
+    stream = (stream + eol + eol).encode("utf-8")
+
+    parser = event_stream.EventStreamParser()
+    events = []
+    for start in range(0, len(stream), chunk_size):
+        end = start + chunk_size
+        events += parser.feed(stream[start:end])
+
+    assert [(e.id, e.type, e.data) for e in events] == [
+        ("1", "ready", "{}"),
+        (None, "message", "a\nb"),
+    ]
+    assert parser.last_event_id == "1"
+
+
+@pytest.mark.parametrize(
+    "stream,retry", [("retry: 5000\ndata\n\n", 5000), ("retry: 5s\ndata\n\n", 2000)]
+)
+def test_parser_retry(stream, retry):
+    parser = event_stream.EventStreamParser()
+    (event,) = parser.feed(stream.encode())
+    assert event.retry == retry
+    assert parser.retry == retry
+
+
+def test_parser_unknown_fields():
+    parser = event_stream.EventStreamParser()
+    (event,) = parser.feed(b"type: x\n_data: x\nid: a\0b\ndata: \xf0\x9f\xa5\x87\n\n")
+    assert event.type == "message"
+    assert event.id is None
+    assert event.data == "🥇"
+
+
+def test_iter_events_chunk_size(requests_mock):
+    requests_mock.get("mock://smee.io/new", text="data: 1\n\ndata: 2\n\n")
+    r = event_stream.get("mock://smee.io/new")
+    events: list[Event] = list(r.iter_events(chunk_size=3))
+    assert [e.data for e in events] == ["1", "2"]
@@ -0,0 +1,163 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+import threading
+import time
+
+import pytest
+import requests
+from click.testing import CliRunner
+
+from zeroae.smee import SmeeClient, cli
+from zeroae.smee.fanout import FanOut, Target
+from zeroae.smee.spool import Spool
+
+
+class FakeTransport(object):
+    def __init__(self, url, fail=0, gate=None):
+        self.url = url
+        self.fail = fail
+        self.gate = gate
+        self.bodies = []
+
+    def post(self, data, headers):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.fail:
+            self.fail -= 1
+            raise requests.exceptions.ConnectionError()
+        self.bodies.append(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_fan_out(requests_mock):
+    source = "mock://smee.io/channel"
+    requests_mock.get(
+        source,
+        text="".join(
+            f'id:{i}\ndata:{{"body":{{"i":{i}}},"timestamp":1,"query":{{}}}}\n\n'
+            for i in range(3)
+        ),
+    )
+    a, b = FakeTransport("mock://a"), FakeTransport("mock://b")
+    fanout = FanOut([Target(a), Target(b)])
+    client = SmeeClient(source, fanout.url, fanout, reconnect=False)
+    client.run()
+
+    expected = [b'{"i":%d}' % i for i in range(3)]
+    assert a.bodies == expected
+    assert b.bodies == expected
+    stats = fanout.target_stats
+    assert stats["mock://a"]["delivered"] == 3
+    assert stats["mock://b"]["latency_count"] == 3
+
+
+def test_slow_target_does_not_stall_the_others():
+    gate = threading.Event()
+    slow, fast = FakeTransport("mock://slow", gate=gate), FakeTransport("mock://fast")
+    fanout = FanOut([Target(slow, queue_size=2), Target(fast)])
+    fanout.post(b"0", {})
+    while fanout.targets[0].stats["queued"]:
+        time.sleep(0.01)
+    for i in range(1, 5):
+        fanout.post(b"%d" % i, {})
+    assert fanout.targets[1].flush(timeout=5)
+    assert fast.bodies == [b"%d" % i for i in range(5)]
+    assert slow.bodies == []
+
+    gate.set()
+    fanout.flush()
+    # One event was being delivered, two were queued, the rest overflowed.
+    assert slow.bodies == [b"0", b"1", b"2"]
+    assert fanout.targets[0].stats["dropped"] == 2
+    fanout.close()
+
+
+def test_drop_policy():
+    target = Target(FakeTransport("mock://a", fail=1))
+    target.start()
+    target.put("0", {}, b"0")
+    target.put("1", {}, b"1")
+    target.stop()
+    assert target.transport.bodies == [b"1"]
+    assert target.stats["dropped"] == 1
+    assert target.stats["failed"] == 1
+
+
+def test_server_errors_are_failures():
+    class Unavailable(FakeTransport):
+        def post(self, data, headers):
+            r = requests.Response()
+            r.status_code = 503
+            return r
+
+    target = Target(Unavailable("mock://a"))
+    target.start()
+    target.put("0", {}, b"0")
+    target.stop()
+    assert target.stats["failed"] == 1
+    assert target.stats["dropped"] == 1
+    assert "delivered" not in target.stats
+
+
+def test_retry_policy():
+    transport = FakeTransport("mock://a", fail=3)
+    target = Target(transport, policy="retry", max_backoff=0.01)
+    target.start()
+    target.put("0", {}, b"0")
+    target.put("1", {}, b"1")
+    target.stop()
+    assert target.transport.bodies == [b"0", b"1"]
+    assert target.stats["retried"] == 3
+
+
+def test_spool_policy(tmpdir):
+    spool = Spool(str(tmpdir))
+    target = Target(FakeTransport("mock://a", fail=1), policy="spool", spool=spool)
+    # Only deliver from the spool once the worker stops.
+    target._drainer.start = lambda: None
+    target.start()
+    target.put("0", {}, b"0")
+    target.put("1", {}, b"1")
+    target.flush()
+    assert target.transport.bodies == []
+    assert len(spool) == 2
+    assert target.stats["spooled"] == 2
+
+
+def test_spool_policy_requires_a_spool():
+    with pytest.raises(ValueError):
+        Target(FakeTransport("mock://a"), policy="spool")
+    with pytest.raises(ValueError):
+        Target(FakeTransport("mock://a"), policy="later")
+
+
+def test_command_line_interface_fan_out(requests_mock):
+    source = "mock://smee.io/new"
+    requests_mock.get(source, text='data:{"body":{},"timestamp":1,"query":{}}\n\n')
+    targets = [requests_mock.post(f"mock://{name}.io/events") for name in "ab"]
+
+    runner = CliRunner()
+    args = [f"--url={source}", "--no-reconnect", "--on-failure=retry"]
+    args += ["--target=mock://a.io/events", "--target=mock://b.io/events"]
+    result = runner.invoke(cli.smee, args)
+    assert result.exit_code == 0, result.output
+    assert "to mock://a.io/events, mock://b.io/events" in result.output
+    assert [t.call_count for t in targets] == [1, 1]
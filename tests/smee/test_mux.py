@@ -0,0 +1,148 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+import json
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from zeroae.smee import SmeeClient, cli
+from zeroae.smee.mux import MultiSmeeClient
+
+
+def mock_channel(requests_mock, name, n_events):
+    source = f"mock://smee.io/{name}"
+    messages = [
+        {"body": {"channel": name, "i": i}, "timestamp": 1, "query": {}}
+        for i in range(n_events)
+    ]
+    stream = "event:ready\ndata:{}\n\n"
+    stream += "".join(
+        f"id:{i}\ndata:{json.dumps(m)}\n\n" for i, m in enumerate(messages)
+    )
+    requests_mock.get(source, text=stream)
+    target = requests_mock.post(f"mock://{name}.target.io/events")
+    return source, f"mock://{name}.target.io/events", target
+
+
+def test_multi_smee_client(requests_mock):
+    channels = {}
+    targets = {}
+    for name, n_events in [("a", 3), ("b", 5)]:
+        source, target_url, target = mock_channel(requests_mock, name, n_events)
+        channels[source] = target_url
+        targets[name] = target
+
+    client = MultiSmeeClient.connect(
+        channels, lambda s, t: SmeeClient(s, t, reconnect=False), concurrency=2
+    )
+    client.run()
+
+    for name, n_events in [("a", 3), ("b", 5)]:
+        bodies = [r.json() for r in targets[name].request_history]
+        assert bodies == [{"channel": name, "i": i} for i in range(n_events)]
+
+    stats = client.stats
+    assert stats["mock://smee.io/a"]["delivered"] == 3
+    assert stats["mock://smee.io/b"]["delivered"] == 5
+
+
+def test_connect_failure_closes_connected_channels():
+    closed = []
+
+    class Client(object):
+        def __init__(self, source, target):
+            if source == "mock://smee.io/broken":
+                raise ConnectionError(source)
+            self.source = source
+
+        def close(self):
+            closed.append(self.source)
+
+    channels = {
+        "mock://smee.io/a": "mock://a.target.io/events",
+        "mock://smee.io/b": "mock://b.target.io/events",
+        "mock://smee.io/broken": "mock://c.target.io/events",
+    }
+    with pytest.raises(ConnectionError):
+        MultiSmeeClient.connect(channels, Client)
+    assert closed == ["mock://smee.io/a", "mock://smee.io/b"]
+
+
+def test_hung_target_does_not_stall_other_channels(requests_mock):
+    class Transport(object):
+        url = "mock://target"
+        stats = dict(requests=0, connections=0, reused=0)
+
+        def __init__(self, gate=None):
+            self.gate = gate
+            self.bodies = []
+
+        def post(self, data, headers):
+            if self.gate is not None:
+                self.gate.wait(5)
+            self.bodies.append(data)
+
+        def flush(self):
+            pass
+
+        def close(self):
+            pass
+
+    gate = threading.Event()
+    transports = {"a": Transport(gate), "b": Transport()}
+    channels = {}
+    for name, n_events in [("a", 2), ("b", 4)]:
+        source, _, _ = mock_channel(requests_mock, name, n_events)
+        channels[source] = name
+
+    client = MultiSmeeClient.connect(
+        channels,
+        lambda s, t: SmeeClient(s, t, transports[t], reconnect=False),
+        concurrency=1,
+        # Every event on the same lane, the worst case for the hung channel.
+        key=lambda headers, body: None,
+    )
+    runner = threading.Thread(target=client.run)
+    runner.start()
+    try:
+        for _ in range(500):
+            if len(transports["b"].bodies) == 4:
+                break
+            threading.Event().wait(0.01)
+        assert len(transports["b"].bodies) == 4
+        assert transports["a"].bodies == []
+    finally:
+        gate.set()
+        runner.join(5)
+    assert len(transports["a"].bodies) == 2
+
+
+def test_command_line_interface_channels(requests_mock, tmpdir):
+    channels = {}
+    for name in ["a", "b"]:
+        source, target_url, _ = mock_channel(requests_mock, name, 2)
+        channels[source] = target_url
+    channels_file = tmpdir.join("channels.json")
+    channels_file.write(json.dumps(channels))
+
+    runner = CliRunner()
+    args = [f"--channels={channels_file}", "--no-reconnect", f"--spool={tmpdir}"]
+    result = runner.invoke(cli.smee, args)
+    assert result.exit_code == 0
+    for source, target_url in channels.items():
+        assert f"Forwarding {source} to {target_url}" in result.output
+    assert tmpdir.join("smee.io_a").isdir()
@@ -0,0 +1,79 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+import pytest
+
+from zeroae.smee.recording import Recorder, Recording
+
+
+def record(path, n_events, **kwargs):
+    recorder = Recorder(str(path), **kwargs)
+    for i in range(n_events):
+        headers = {"x-github-event": "push", "x-github-delivery": str(i)}
+        recorder.record(100.0 + i, str(i), headers, b'{"i":%d}' % i)
+    return recorder
+
+
+def test_round_trip(tmpdir):
+    path = tmpdir.join("events.rec")
+    record(path, 10, block_bytes=100).close()
+
+    recording = Recording(str(path))
+    assert len(recording) == 10
+    assert len(recording.blocks) > 1
+    assert recording.duration == 9.0
+    events = list(recording)
+    assert [e.id for e in events] == [str(i) for i in range(10)]
+    assert events[3].timestamp == 103.0
+    assert events[3].headers["x-github-event"] == "push"
+    assert events[3].body == b'{"i":3}'
+
+
+def test_since(tmpdir):
+    path = tmpdir.join("events.rec")
+    record(path, 10, block_bytes=100).close()
+    events = Recording(str(path)).since(105.0)
+    assert [e.body for e in events] == [b'{"i":%d}' % i for i in range(5, 10)]
+
+
+def test_unclosed_recording_is_scanned(tmpdir):
+    path = tmpdir.join("events.rec")
+    recorder = record(path, 5, block_bytes=100)
+    recorder.flush()
+    # A torn block at the end, e.g. the process was killed while writing it.
+    with open(str(path), "ab") as f:
+        f.write(b"\x10\x00\x00")
+
+    recording = Recording(str(path))
+    assert len(recording) == 5
+    assert [e.id for e in recording] == [str(i) for i in range(5)]
+
+
+def test_post(tmpdir):
+    path = tmpdir.join("events.rec")
+    recorder = Recorder(str(path))
+    recorder.post(b"{}", {"x-github-delivery": "abc"})
+    recorder.close()
+    (event,) = Recording(str(path))
+    assert event.id == "abc"
+    assert event.body == b"{}"
+    assert event.timestamp > 0
+
+
+def test_not_a_recording(tmpdir):
+    path = tmpdir.join("events.rec")
+    path.write("{}")
+    with pytest.raises(ValueError):
+        Recording(str(path))
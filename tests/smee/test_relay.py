@@ -0,0 +1,188 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from zeroae.smee import envelope, event_stream
+from zeroae.smee.relay import Channel, Relay
+
+
+@pytest.fixture
+def relay():
+    """A relay served from its own event loop thread."""
+    loop = asyncio.new_event_loop()
+    server = Relay(port=0, ping_interval=60)
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.port}"
+    yield server
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def post(url, body, **headers):
+    headers.setdefault("content-type", "application/json")
+    r = requests.post(url, data=body, headers=headers)
+    assert r.status_code == 200
+
+
+def test_broadcast(relay):
+    channel = f"{relay.url}/channel"
+    streams = [event_stream.get(channel, timeout=5) for _ in range(3)]
+    events = [s.iter_events() for s in streams]
+    for e in events:
+        assert next(e).type == "ready"
+
+    for i in range(3):
+        post(f"{channel}?n={i}", '{ "i": %d }' % i, **{"x-github-event": "push"})
+
+    for e in events:
+        for i in range(3):
+            event = next(e)
+            assert event.id == str(i + 1)
+            headers, body = envelope.split(event.data)
+            assert headers["x-github-event"] == "push"
+            assert "content-length" not in headers
+            assert body == b'{"i":%d}' % i
+            assert event.json()["query"] == {"n": str(i)}
+    for s in streams:
+        s.close()
+
+
+def test_last_event_id_catch_up(relay):
+    channel = f"{relay.url}/channel"
+    for i in range(3):
+        post(channel, '{"i":%d}' % i)
+
+    stream = event_stream.get(channel, headers={"Last-Event-ID": "1"}, timeout=5)
+    events = stream.iter_events()
+    assert next(events).type == "ready"
+    assert [next(events).json()["body"]["i"] for _ in range(2)] == [1, 2]
+    stream.close()
+
+
+def test_new_channel(relay):
+    stream = event_stream.get(f"{relay.url}/new", timeout=5)
+    assert stream.url.startswith(relay.url)
+    assert not stream.url.endswith("/new")
+    assert next(stream.iter_events()).type == "ready"
+    stream.close()
+
+
+def test_form_encoded_and_invalid_bodies(relay):
+    channel = f"{relay.url}/channel"
+    stream = event_stream.get(channel, timeout=5)
+    events = stream.iter_events()
+    next(events)
+
+    form = "application/x-www-form-urlencoded"
+    post(channel, "payload=%7B%7D", **{"content-type": form})
+    assert next(events).json()["body"] == {"payload": "{}"}
+
+    r = requests.post(channel, data="{", headers={"content-type": "application/json"})
+    assert r.status_code == 400
+    assert relay.stats["published"] == 1
+    stream.close()
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", ""])
+def test_invalid_content_length(relay, length):
+    with socket.create_connection(("127.0.0.1", relay.port), timeout=5) as s:
+        s.sendall(
+            b"POST /channel HTTP/1.1\r\nHost: x\r\nContent-Length: %s\r\n\r\n{}"
+            % length.encode()
+        )
+        assert s.recv(4096).startswith(b"HTTP/1.1 400 Bad Request")
+
+
+def test_idle_channels_are_dropped(relay):
+    relay.channel_ttl = 0.05
+    post(f"{relay.url}/unread", "{}")
+    stream = event_stream.get(f"{relay.url}/channel", timeout=5)
+    assert next(stream.iter_events()).type == "ready"
+    assert "channel" in relay.channels
+    stream.close()
+
+    deadline = time.monotonic() + 5
+    while relay.channels and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert relay.channels == {}
+    assert relay.stats["expired"] == 2
+
+
+def test_slow_subscriber_is_dropped():
+    class Transport:
+        size = 0
+        aborted = False
+
+        def get_write_buffer_size(self):
+            return self.size
+
+        def abort(self):
+            self.aborted = True
+
+    class Writer:
+        def __init__(self):
+            self.transport = Transport()
+            self.data = []
+
+        def write(self, data):
+            self.data.append(data)
+
+    channel = Channel("channel", Relay(max_subscriber_buffer=10))
+    fast, slow = Writer(), Writer()
+    channel.subscribe(fast, [])
+    channel.subscribe(slow, [])
+    slow.transport.size = 11
+
+    channel.broadcast(b"data")
+    assert fast.data[-1] == b"data"
+    assert slow.transport.aborted
+    assert channel.subscribers == {fast}
+
+
+def test_events_are_coalesced():
+    loop = asyncio.new_event_loop()
+    relay = Relay()
+    channel = relay.channel("channel")
+    writes = []
+
+    class Writer:
+        transport = type("Transport", (), {"get_write_buffer_size": lambda s: 0})()
+
+        def write(self, data):
+            writes.append(data)
+
+    async def publish():
+        channel.subscribe(Writer(), [])
+        for i in range(3):
+            relay.publish("channel", {}, json.dumps({"i": i}).encode())
+        await asyncio.sleep(0)
+
+    loop.run_until_complete(publish())
+    loop.close()
+    # The stream headers and ready event, then one write for the three events.
+    assert len(writes) == 2
+    assert writes[1].count(b"\ndata:") == 3
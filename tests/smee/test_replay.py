@@ -0,0 +1,94 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+import json
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from zeroae.smee import cli
+from zeroae.smee.recording import Recorder, Recording
+from zeroae.smee.replay import AsyncReplayClient, ReplayClient, speed
+
+
+@pytest.fixture
+def recording(tmpdir):
+    path = str(tmpdir.join("events.rec"))
+    recorder = Recorder(path)
+    for i in range(5):
+        recorder.record(i * 0.1, str(i), {"x-github-event": "push"}, b'{"i":%d}' % i)
+    recorder.close()
+    return path
+
+
+@pytest.mark.parametrize("cls", [ReplayClient, AsyncReplayClient])
+def test_replay(cls, recording, requests_mock):
+    target = requests_mock.post("mock://target.io/events")
+    client = cls(recording, "mock://target.io/events", speed=0)
+    client.run()
+
+    assert [r.json() for r in target.request_history] == [{"i": i} for i in range(5)]
+    assert target.request_history[0].headers["x-github-event"] == "push"
+    report = client.report()
+    assert report["events"] == report["delivered"] == 5
+    assert report["throughput"] > 0
+    assert report["latency_p99"] >= report["latency_p50"] > 0
+
+
+def test_replay_speed(recording, requests_mock):
+    requests_mock.post("mock://target.io/events")
+    start = time.monotonic()
+    ReplayClient(recording, "mock://target.io/events", speed=4).run()
+    # The events span 0.4s, i.e. 0.1s at 4x.
+    assert 0.1 <= time.monotonic() - start < 0.4
+
+
+def test_speed():
+    assert speed("1x") == 1.0
+    assert speed("10X") == 10.0
+    assert speed("0.5") == 0.5
+    assert speed("max") == 0.0
+    for value in ["fast", "-1x", "nan", "infx"]:
+        with pytest.raises(ValueError):
+            speed(value)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.replay, ["--speed", "nan", __file__])
+    assert result.exit_code == 2
+    assert "--speed" in result.output
+
+
+def test_command_line_interface_record_and_replay(requests_mock, tmpdir):
+    source = "mock://smee.io/new"
+    envelope = {"x-github-delivery": "1", "body": {"i": 1}, "timestamp": 1, "query": {}}
+    requests_mock.get(source, text=f"id:1\ndata:{json.dumps(envelope)}\n\n")
+    requests_mock.post("mock://target.io/events")
+    path = str(tmpdir.join("events.rec"))
+
+    runner = CliRunner()
+    args = [f"--url={source}", "--no-reconnect", "--target=mock://target.io/events"]
+    result = runner.invoke(cli.smee, args + [f"--record={path}"])
+    assert result.exit_code == 0, result.output
+    (event,) = Recording(path)
+    assert event.body == b'{"i":1}'
+
+    replayed = requests_mock.post("mock://replay.io/events")
+    args = [path, "--target=mock://replay.io/events", "--speed=max", "--async"]
+    result = runner.invoke(cli.replay, args)
+    assert result.exit_code == 0, result.output
+    assert "1 events in" in result.output
+    assert "p99" in result.output
+    assert replayed.last_request.json() == {"i": 1}
@@ -14,6 +14,7 @@
 #  limitations under the License.
 # ------------------------------------------------------------------------------
 import pytest
+import requests
 from click.testing import CliRunner
 
 from zeroae.smee import cli
@@ -38,7 +39,7 @@ def smee_server_mock(requests_mock):
 def test_command_line_interface(smee_server_mock, requests_mock):
     """Test the SMEE CLI."""
     runner = CliRunner()
-    args = [f"--url={smee_server_mock}"]
+    args = [f"--url={smee_server_mock}", "--no-reconnect"]
 
     target_url = "mock://target.io/events"
     requests_mock.post(target_url)
@@ -55,7 +56,7 @@ def test_command_line_interface(smee_server_mock, requests_mock):
 def test_command_line_interface_port_path(port, path, smee_server_mock, requests_mock):
     """Test the SMEE CLI."""
     runner = CliRunner()
-    args = [f"--url={smee_server_mock}"]
+    args = [f"--url={smee_server_mock}", "--no-reconnect"]
 
     if port is None:
         port = 3000
@@ -73,3 +74,45 @@ def test_command_line_interface_port_path(port, path, smee_server_mock, requests
     help_result = runner.invoke(cli.smee, args)
     assert help_result.exit_code == 0
     assert f"Connected {smee_server_mock}" in help_result.output
+
+
+def test_reconnect(requests_mock, monkeypatch):
+    from zeroae.smee import SmeeClient
+
+    url = "mock://smee.io/channel"
+    message = 'id:{}\ndata:{{"body":{{"id":{}}},"timestamp":1,"query":{{}}}}\n\n'
+    requests_mock.get(
+        url,
+        [
+            {"text": "retry:5000\n\nevent:ready\ndata:{}\n\n" + message.format(1, 1)},
+            {"exc": requests.exceptions.ConnectTimeout},
+            {"text": message.format(1, 1) + message.format(2, 2)},
+        ],
+    )
+    requests_mock.post("mock://target.io/events")
+
+    delays = []
+    monkeypatch.setattr("time.sleep", delays.append)
+
+    client = SmeeClient(url, "mock://target.io/events")
+    events = client.iter_events()
+    assert [next(events).type for _ in range(3)] == ["ready", "message", "message"]
+
+    assert len(delays) == 2
+    assert 5 <= delays[0] <= 7.5 and 10 <= delays[1] <= 15
+    assert requests_mock.request_history[-1].headers["Last-Event-ID"] == "1"
+    assert client.stats == {"duplicates": 1, "reconnects": 1}
+    assert client.last_event_id == "2"
+
+
+@pytest.mark.parametrize(
+    "retry,attempt,delay",
+    [(2000, 0, 2), (2000, 3, 16), (2000, 10, 60), (90000, 2, 90), (2000, 5000, 60)],
+)
+def test_backoff(retry, attempt, delay, requests_mock):
+    from zeroae.smee import SmeeClient
+
+    requests_mock.get("mock://smee.io/channel", text="")
+    client = SmeeClient("mock://smee.io/channel", "mock://target.io/events")
+    client.retry = retry
+    assert delay <= client.backoff(attempt) <= delay * 1.5
@@ -0,0 +1,190 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+import os
+import threading
+
+import requests
+
+from zeroae.smee.spool import Spool, SpoolDrainer
+
+
+def drain(spool):
+    rv = []
+    while True:
+        record = spool.peek(timeout=0)
+        if record is None:
+            return rv
+        rv.append(record)
+        spool.ack()
+
+
+def segments(path):
+    return sorted(name for name in os.listdir(path) if name.endswith(".log"))
+
+
+def test_append_peek_ack(tmpdir):
+    spool = Spool(str(tmpdir))
+    for i in range(3):
+        assert spool.append(str(i), {"x-github-event": "push"}, b'{"i":%d}' % i)
+    assert len(spool) == 3
+
+    record = spool.peek()
+    assert record.event_id == "0"
+    assert record.headers == {"x-github-event": "push"}
+    assert spool.peek().body == b'{"i":0}'
+    spool.ack()
+
+    assert [r.body for r in drain(spool)] == [b'{"i":1}', b'{"i":2}']
+    assert len(spool) == 0
+    assert spool.peek(timeout=0) is None
+
+
+def test_reopen_resumes_at_cursor(tmpdir):
+    spool = Spool(str(tmpdir))
+    for i in range(3):
+        spool.append(str(i), {}, b"{}")
+    spool.peek()
+    spool.ack()
+    spool.close()
+
+    spool = Spool(str(tmpdir))
+    assert len(spool) == 2
+    assert [r.event_id for r in drain(spool)] == ["1", "2"]
+
+
+def test_torn_tail_is_truncated(tmpdir):
+    spool = Spool(str(tmpdir))
+    spool.append("0", {}, b"{}")
+    spool.close()
+    with open(os.path.join(str(tmpdir), segments(str(tmpdir))[-1]), "ab") as f:
+        f.write(b"\x10\x00\x00")
+
+    spool = Spool(str(tmpdir))
+    assert [r.event_id for r in drain(spool)] == ["0"]
+    spool.append("1", {}, b"{}")
+    assert [r.event_id for r in drain(spool)] == ["1"]
+
+
+def test_compaction(tmpdir):
+    path = str(tmpdir)
+    spool = Spool(path, segment_bytes=256, compact_bytes=256)
+    for i in range(10):
+        spool.append(str(i), {}, b"x" * 64)
+    assert len(segments(path)) == 5
+
+    assert len(drain(spool)) == 10
+    assert len(segments(path)) == 1
+    assert spool.size < 256
+
+
+def test_max_bytes_drops_oldest(tmpdir):
+    path = str(tmpdir)
+    spool = Spool(path, max_bytes=512, segment_bytes=256)
+    for i in range(10):
+        spool.append(str(i), {}, b"x" * 64)
+
+    assert spool.size <= 512
+    assert spool.dropped > 0
+    assert len(spool) == 10 - spool.dropped
+    assert [r.event_id for r in drain(spool)] == [
+        str(i) for i in range(spool.dropped, 10)
+    ]
+
+
+def test_drainer(tmpdir):
+    spool = Spool(str(tmpdir))
+    for i in range(3):
+        spool.append(str(i), {}, b"{}")
+
+    delivered = []
+    done = threading.Event()
+    attempts = iter([False, True, True, True])
+
+    def deliver(record):
+        if not next(attempts):
+            return False
+        delivered.append(record.event_id)
+        if len(delivered) == 3:
+            done.set()
+        return True
+
+    drainer = SpoolDrainer(spool, deliver)
+    drainer.start()
+    assert done.wait(5)
+    drainer.stop()
+    assert delivered == ["0", "1", "2"]
+    assert len(spool) == 0
+
+
+def test_client_spools_undelivered_events(tmpdir, requests_mock):
+    from zeroae.smee import SmeeClient
+
+    url = "mock://smee.io/channel"
+    message = 'id:{}\ndata:{{"body":{{"id":{}}},"timestamp":1,"query":{{}}}}\n\n'
+    requests_mock.get(url, text="".join(message.format(i, i) for i in range(3)))
+    target = requests_mock.post(
+        "mock://target.io/events",
+        [{"exc": requests.exceptions.ConnectionError}, {"status_code": 200}],
+    )
+
+    spool = Spool(str(tmpdir))
+    client = SmeeClient(url, "mock://target.io/events", spool=spool, reconnect=False)
+    for event in client.iter_events():
+        client.dispatch(event)
+
+    assert target.call_count == 1
+    assert client.stats["spooled"] == 3
+    assert [r.body for r in drain(spool)] == [b'{"id":0}', b'{"id":1}', b'{"id":2}']
+
+
+def test_drainer_syncs_when_idle(tmpdir, monkeypatch):
+    spool = Spool(str(tmpdir), fsync_every=64, fsync_interval=0.05)
+    synced = threading.Event()
+    fsync = os.fsync
+
+    def record_fsync(fd):
+        synced.set()
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", record_fsync)
+    drainer = SpoolDrainer(spool, lambda record: False)
+    drainer.start()
+    spool.append("0", {}, b"{}")
+    assert spool._unsynced == 1
+    # No other event comes in, the drainer syncs it while backing off.
+    assert synced.wait(5)
+    drainer.stop()
+    assert spool._unsynced == 0
+
+
+def test_command_line_spool_options(tmpdir, requests_mock, monkeypatch):
+    from click.testing import CliRunner
+
+    from zeroae.smee import cli
+
+    spools = []
+    monkeypatch.setattr(cli, "Spool", lambda *a, **kw: spools.append(kw) or Spool(*a))
+    requests_mock.get("mock://smee.io/channel", text="")
+    args = [
+        "--url=mock://smee.io/channel",
+        "--target=mock://target.io/events",
+        "--no-reconnect",
+        f"--spool={tmpdir}",
+        "--spool-compact-bytes=4096",
+    ]
+    result = CliRunner().invoke(cli.smee, args)
+    assert result.exit_code == 0, result.output
+    assert spools[0]["compact_bytes"] == 4096
@@ -0,0 +1,99 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from zeroae.smee.transport import Transport
+
+
+@pytest.fixture
+def target():
+    """A local keep-alive HTTP/1.1 target, replying with the queued status codes."""
+    statuses = []
+    bodies = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            bodies.append(self.rfile.read(int(self.headers["Content-Length"])))
+            self.send_response(statuses.pop(0) if statuses else HTTPStatus.OK)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/events"
+    server.statuses = statuses
+    server.bodies = bodies
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_connection_reuse(target):
+    transport = Transport(target.url)
+    for i in range(5):
+        r = transport.post(b"{}", {"X-GitHub-Event": "ping"})
+        assert r.status_code == HTTPStatus.OK
+
+    assert transport.stats == dict(requests=5, connections=1, reused=4)
+    assert target.bodies == [b"{}"] * 5
+    transport.close()
+
+
+def test_retry_statuses(target):
+    target.statuses += [HTTPStatus.SERVICE_UNAVAILABLE, HTTPStatus.BAD_GATEWAY]
+    transport = Transport(target.url, backoff_factor=0)
+    r = transport.post(b"{}", {})
+    assert r.status_code == HTTPStatus.OK
+    assert len(target.bodies) == 3
+
+    target.statuses += [HTTPStatus.SERVICE_UNAVAILABLE] * 2
+    transport = Transport(target.url, retries=1, backoff_factor=0)
+    r = transport.post(b"{}", {})
+    assert r.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+def test_unavailable_target_is_spooled(target, tmpdir, requests_mock):
+    from zeroae.smee import SmeeClient
+    from zeroae.smee.spool import Spool
+
+    requests_mock.real_http = True
+    url = "mock://smee.io/channel"
+    message = 'id:{}\ndata:{{"body":{{"id":{}}},"timestamp":1,"query":{{}}}}\n\n'
+    requests_mock.get(url, text="".join(message.format(i, i) for i in range(2)))
+    target.statuses += [HTTPStatus.SERVICE_UNAVAILABLE] * 100
+
+    spool = Spool(str(tmpdir))
+    transport = Transport(target.url, retries=2, backoff_factor=0)
+    client = SmeeClient(url, target.url, transport, spool=spool, reconnect=False)
+    for event in client.iter_events():
+        client.dispatch(event)
+
+    # The first event was retried, the second one went to the spool behind it.
+    assert len(target.bodies) == 3
+    assert client.stats["failed"] == 1
+    assert "delivered" not in client.stats
+    assert client.stats["spooled"] == 2
+    assert len(spool) == 2
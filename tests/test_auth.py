@@ -0,0 +1,143 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+import rsa
+from jose import jwt
+
+from zeroae.goblet.auth import TokenManager
+
+API = "https://api.github.test"
+
+
+@pytest.fixture(scope="module")
+def keys():
+    public, private = rsa.newkeys(1024)
+    return public.save_pkcs1().decode(), private.save_pkcs1().decode()
+
+
+@pytest.fixture
+def tokens(keys):
+    return TokenManager("42", keys[1], base_url=API)
+
+
+@pytest.fixture
+def access_tokens(requests_mock):
+    minted = []
+
+    def callback(request, context):
+        minted.append(request.headers["Authorization"])
+        time.sleep(0.01)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=callback.ttl)
+        return {"token": f"t{len(minted)}", "expires_at": expires_at.isoformat()}
+
+    callback.ttl = 3600
+    requests_mock.post(
+        f"{API}/app/installations/1/access_tokens", json=callback, status_code=201
+    )
+    return callback, minted
+
+
+def test_app_jwt(tokens, keys):
+    token = tokens.app_jwt()
+    assert jwt.decode(token, keys[0], algorithms=["RS256"])["iss"] == "42"
+    assert tokens.app_jwt() == token
+    stats = tokens.stats
+    assert (stats["jwt_hits"], stats["jwt_misses"]) == (1, 1)
+    assert stats["jwt_hit_ratio"] == 0.5
+
+
+def test_installation_token(tokens, access_tokens):
+    _, minted = access_tokens
+    assert tokens.installation_token(1) == "t1"
+    assert tokens.installation_token(1) == "t1"
+    assert minted == [f"Bearer {tokens.app_jwt()}"]
+    assert tokens.stats["token_hit_ratio"] == 0.5
+
+    tokens.invalidate(1)
+    assert tokens.installation_token(1) == "t2"
+
+
+def test_single_flight(tokens, access_tokens):
+    _, minted = access_tokens
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(tokens.installation_token(1)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["t1"] * 8
+    assert len(minted) == 1
+
+    # A caller that missed the cache before the token was minted does not mint it
+    # again.
+    def mint():
+        raise AssertionError("minted again")
+
+    assert tokens._single_flight(1, mint, lambda: tokens._cached_token(1)) == "t1"
+
+
+def test_proactive_refresh(tokens, access_tokens):
+    callback, minted = access_tokens
+    callback.ttl = 120
+    assert tokens.installation_token(1) == "t1"
+    # Close to its expiry, the token is still used while a new one is minted.
+    callback.ttl = 3600
+    assert tokens.installation_token(1) == "t1"
+    deadline = time.monotonic() + 1
+    while len(minted) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.01)
+    assert tokens.stats["token_refreshes"] == 1
+    assert tokens.installation_token(1) == "t2"
+
+    # Too close, the caller waits for the new token.
+    callback.ttl = 30
+    tokens.invalidate(1)
+    tokens.installation_token(1)
+    assert tokens.installation_token(1) == "t4"
+
+
+def test_refresh_registered(tokens, access_tokens, monkeypatch):
+    callback, minted = access_tokens
+    callback.ttl = 120
+    assert tokens.installation_token(1) == "t1"
+
+    started = []
+    monkeypatch.setattr(threading.Thread, "start", lambda t: started.append(t))
+    assert tokens.installation_token(1) == "t1"
+    monkeypatch.undo()
+    # The refresh is in flight before its thread even ran.
+    assert 1 in tokens._inflight
+    assert tokens.installation_token(1) == "t1"
+    assert tokens.stats["token_refreshes"] == 1
+
+    callback.ttl = 3600
+    started[0].run()
+    assert tokens.installation_token(1) == "t2"
+    assert 1 not in tokens._inflight
+
+
+def test_mint_timeout(keys, access_tokens, requests_mock):
+    session = requests.Session()
+    tokens = TokenManager("42", keys[1], base_url=API, session=session, timeout=3)
+    tokens.installation_token(1)
+    assert requests_mock.last_request.timeout == 3
+
+
+def test_lru(keys, requests_mock):
+    tokens = TokenManager("42", keys[1], base_url=API, max_installations=2)
+    expires_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    for i in range(3):
+        requests_mock.post(
+            f"{API}/app/installations/{i}/access_tokens",
+            json={"token": f"t{i}", "expires_at": expires_at},
+        )
+        tokens.installation_token(i)
+    assert tokens.stats["tokens"] == 2
+    assert tokens.stats["token_evictions"] == 1
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from zeroae.goblet.batching import Batcher
+from zeroae.goblet.timers import TimerQueue
+
+
+@pytest.fixture
+def timers():
+    timers = TimerQueue()
+    yield timers
+    timers.stop()
+
+
+def test_max_batch(timers):
+    batches = []
+    batcher = Batcher(batches.append, timers, max_batch=2, max_wait=60)
+    for i in range(5):
+        batcher.add(i)
+    assert batches == [[0, 1], [2, 3]]
+    assert len(batcher) == 1
+    batcher.flush()
+    assert batches[-1] == [4]
+    assert batcher.stats == {
+        "size_batches": 2,
+        "flush_batches": 1,
+        "payloads": 5,
+        "pending": 0,
+    }
+
+
+def test_max_wait(timers):
+    batches = []
+    done = threading.Event()
+
+    def handler(batch):
+        batches.append(batch)
+        done.set()
+
+    batcher = Batcher(handler, timers, max_batch=10, max_wait=0.05)
+    batcher.add(0)
+    batcher.add(1)
+    assert done.wait(1)
+    assert batches == [[0, 1]]
+    assert batcher.stats["time_batches"] == 1
+
+
+def test_stale_timer(timers):
+    batches = []
+    batcher = Batcher(batches.append, timers, max_batch=2, max_wait=0.05)
+    batcher.add(0)
+    batcher.add(1)
+    # The timer of the first batch must not flush the second one early.
+    batcher._expire(0)
+    batcher.add(2)
+    batcher._expire(0)
+    assert batches == [[0, 1]]
+    assert len(batcher) == 1
+
+
+def test_handler_errors(timers):
+    def handler(batch):
+        raise RuntimeError("broken")
+
+    batcher = Batcher(handler, timers, max_batch=1)
+    batcher.add(0)
+    assert batcher.stats["failed_batches"] == 1
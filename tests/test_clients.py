@@ -0,0 +1,65 @@
+import time
+
+import pytest
+import requests
+from octokit.errors import OctokitParameterError
+
+from zeroae.goblet.clients import ClientRegistry, PooledOctokit
+
+API = "https://api.github.test"
+
+
+@pytest.fixture
+def registry():
+    def factory(key, session):
+        return PooledOctokit(session, API, lambda: f"token {key}")
+
+    registry = ClientRegistry(factory, max_connections=2, idle_timeout=60)
+    yield registry
+    registry.close()
+
+
+def test_pooled_octokit(registry, requests_mock):
+    requests_mock.get(f"{API}/repos/zeroae/goblet", json={"id": 1})
+    requests_mock.get(f"{API}/repos/zeroae/goblet/pulls", json=[])
+    o = registry.get(7, API)
+
+    response = o.repos.get(owner="zeroae", repo="goblet")
+    assert response.json == {"id": 1}
+    assert response.session is o.session
+    assert requests_mock.last_request.headers["Authorization"] == "token 7"
+
+    # The path parameters are not remembered by the shared client.
+    with pytest.raises(OctokitParameterError):
+        o.pulls.list()
+    assert o.pulls.list(owner="zeroae", repo="goblet", state="open").json == []
+    assert requests_mock.last_request.qs["state"] == ["open"]
+
+
+def test_registry(registry):
+    o = registry.get(7, API)
+    assert registry.get(7, API) is o
+    assert registry.get(8, API) is not o
+    assert registry.get(8, API).session is o.session
+    assert registry.get(7, "https://ghe.test/api/v3").session is not o.session
+
+    adapter = o.session.get_adapter(API)
+    assert adapter._pool_maxsize == 2
+    assert adapter._pool_block
+    assert registry.stats == {
+        "created": 3,
+        "reused": 2,
+        "evicted": 0,
+        "clients": 3,
+        "sessions": 2,
+    }
+
+
+def test_idle_eviction(registry):
+    registry.idle_timeout = 0.02
+    o = registry.get(7, API)
+    time.sleep(0.05)
+    assert registry.get(8, API) is not o
+    assert len(registry) == 1
+    assert registry.stats["evicted"] == 1
+    assert isinstance(registry.session(API), requests.Session)
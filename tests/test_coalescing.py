@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from zeroae.goblet.coalescing import Coalescer
+from zeroae.goblet.timers import TimerQueue
+
+
+@pytest.fixture
+def timers():
+    timers = TimerQueue()
+    yield timers
+    timers.stop()
+
+
+def ref(payload):
+    return payload["ref"]
+
+
+def test_newest_wins(timers):
+    published = []
+    done = threading.Event()
+
+    def publish(topic, payload):
+        published.append((topic, payload))
+        done.set()
+
+    coalescer = Coalescer(publish, ref, timers, window=0.05)
+    for i in range(3):
+        coalescer.add("gh.push", {"ref": "main", "i": i})
+    coalescer.add("gh.push", {"ref": "dev", "i": 3})
+    assert published == []
+    assert len(coalescer) == 2
+
+    assert done.wait(1)
+    time.sleep(0.05)
+    assert sorted(p["i"] for _, p in published) == [2, 3]
+    assert coalescer.stats == {"coalesced": 2, "published": 2, "pending": 0}
+
+
+def test_max_wait(timers):
+    published = []
+    coalescer = Coalescer(
+        lambda t, p: published.append(p), ref, timers, window=0.05, max_wait=0.1
+    )
+    deadline = time.monotonic() + 0.5
+    while not published and time.monotonic() < deadline:
+        coalescer.add("gh.push", {"ref": "main"})
+        time.sleep(0.01)
+    assert published == [{"ref": "main"}]
+
+
+def test_without_key(timers):
+    published = []
+    coalescer = Coalescer(lambda t, p: published.append(p), ref, timers, window=60)
+    coalescer.add("gh.push", {})
+    assert published == [{}]
+    assert coalescer.stats["uncoalesced"] == 1
+
+
+def test_flush(timers):
+    published = []
+    coalescer = Coalescer(lambda t, p: published.append(p), ref, timers, window=60)
+    coalescer.add("gh.push", {"ref": "main"})
+    coalescer.flush()
+    assert published == [{"ref": "main"}]
+    assert len(coalescer) == 0
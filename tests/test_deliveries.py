@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from zeroae.goblet.deliveries import (
+    MemoryDeliveryCache,
+    SQLiteDeliveryCache,
+    open_cache,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmpdir):
+    caches = []
+
+    def make_cache(**kwargs):
+        if request.param == "memory":
+            cache = MemoryDeliveryCache(**kwargs)
+        else:
+            path = str(tmpdir.join("deliveries.db"))
+            cache = SQLiteDeliveryCache(path, prune_interval=1, **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make_cache
+    for cache in caches:
+        cache.close()
+
+
+def test_seen(make_cache):
+    cache = make_cache()
+    assert not cache.seen("a")
+    assert cache.seen("a")
+    assert not cache.seen("b")
+    assert len(cache) == 2
+    stats = cache.stats
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 2)
+    assert stats["hit_ratio"] == pytest.approx(1 / 3)
+
+
+def test_forget(make_cache):
+    cache = make_cache()
+    cache.seen("a")
+    cache.forget("a")
+    assert not cache.seen("a")
+
+
+def test_ttl(make_cache):
+    cache = make_cache(ttl=0.05)
+    cache.seen("a")
+    time.sleep(0.1)
+    assert not cache.seen("a")
+    assert cache.seen("a")
+
+
+def test_max_size(make_cache):
+    cache = make_cache(max_size=2)
+    for delivery_id in "abc":
+        cache.seen(delivery_id)
+    assert len(cache) == 2
+    assert cache.stats["evicted"] == 1
+    assert not cache.seen("a")
+
+
+def test_shared_sqlite(tmpdir):
+    path = str(tmpdir.join("deliveries.db"))
+    first, second = SQLiteDeliveryCache(path), SQLiteDeliveryCache(path)
+    assert not first.seen("a")
+    assert second.seen("a")
+    first.close()
+    second.close()
+
+
+def test_open_cache(tmpdir):
+    assert isinstance(open_cache("memory://"), MemoryDeliveryCache)
+    cache = open_cache(f"sqlite:///{tmpdir.join('deliveries.db')}", ttl=10)
+    assert isinstance(cache, SQLiteDeliveryCache)
+    assert cache.ttl == 10
+    cache.close()
+    with pytest.raises(ValueError):
+        open_cache("unknown://")
@@ -0,0 +1,66 @@
+import threading
+
+from zeroae.goblet.dispatch import Dispatcher
+
+
+def test_dispatch():
+    published = []
+    dispatcher = Dispatcher(lambda topic, payload: published.append((topic, payload)))
+    for i in range(10):
+        assert dispatcher.submit("gh.push", {"i": i})
+    dispatcher.join()
+
+    assert sorted(p["i"] for _, p in published) == list(range(10))
+    stats = dispatcher.stats
+    assert stats["published"] == 10
+    assert stats["queued"] == 0
+    assert stats["latency_count"] == 10
+    dispatcher.shutdown()
+
+
+def test_full_queue_is_rejected():
+    gate = threading.Event()
+    dispatcher = Dispatcher(lambda *args: gate.wait(), workers=1, queue_size=1)
+    assert dispatcher.submit("gh.push", {})
+    while dispatcher.stats["queued"]:
+        pass
+    assert dispatcher.submit("gh.push", {})
+    assert not dispatcher.submit("gh.push", {})
+    assert dispatcher.stats["rejected"] == 1
+
+    gate.set()
+    dispatcher.shutdown()
+    assert dispatcher.stats["published"] == 2
+
+
+def test_listener_errors_are_counted():
+    def publish(topic, payload):
+        raise RuntimeError()
+
+    dispatcher = Dispatcher(publish, workers=1)
+    dispatcher.submit("gh.push", {})
+    dispatcher.shutdown()
+    assert dispatcher.stats["failed"] == 1
+
+
+def test_tenant_concurrency():
+    gate = threading.Event()
+    published = []
+
+    def publish(topic, payload):
+        if payload == "a":
+            gate.wait()
+        published.append(payload)
+
+    dispatcher = Dispatcher(publish, workers=2, tenant_concurrency=1)
+    for _ in range(5):
+        dispatcher.submit("gh.push", "a", tenant=1)
+    dispatcher.submit("gh.push", "b", tenant=2)
+    # Tenant 1 may only block one of the two workers.
+    while not published:
+        pass
+    assert published == ["b"]
+    assert dispatcher.tenants[1]["running"] == 1
+    gate.set()
+    dispatcher.shutdown()
+    assert published.count("a") == 5
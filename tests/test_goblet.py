@@ -27,9 +27,21 @@ def test_content(response):
 def test_command_line_interface():
     """Test the CLI."""
     runner = CliRunner()
-    result = runner.invoke(cli.goblet)
-    assert result.exit_code == 0
-    assert "Replace this message" in result.output
     help_result = runner.invoke(cli.goblet, ["--help"])
     assert help_result.exit_code == 0
     assert "--help  Show this message and exit." in help_result.output
+    assert "worker" in help_result.output
+
+
+def test_worker_command_line_interface(monkeypatch):
+    """Test the worker CLI."""
+    calls = []
+    monkeypatch.setattr(cli, "run_workers", lambda *args: calls.append(args))
+    runner = CliRunner()
+    args = ["worker", "--app=app", "--queue=sqlite:///ingress.db", "-n", "2"]
+    result = runner.invoke(cli.goblet, args)
+    assert result.exit_code == 0
+    assert calls == [("app", "sqlite:///ingress.db", 2)]
+
+    result = runner.invoke(cli.goblet, ["worker", "--queue=memory://"])
+    assert result.exit_code != 0
@@ -0,0 +1,221 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from zeroae.goblet.clients import ClientRegistry, PooledOctokit
+from zeroae.goblet.http_cache import (
+    AUTH_CONTEXT_HEADER,
+    CachedResponse,
+    CachingAdapter,
+    ResponseCache,
+)
+
+API = "https://api.github.test"
+
+
+@pytest.fixture
+def github(monkeypatch):
+    """Answers like GitHub, 304 when the If-None-Match is the current ETag."""
+
+    class GitHub(object):
+        def __init__(self):
+            self.etag, self.body, self.sent = '"v1"', b'{"id": 1}', []
+
+        def send(self, request, **kwargs):
+            self.sent.append(request)
+            response = requests.Response()
+            response.request, response.url = request, request.url
+            response.headers["X-RateLimit-Remaining"] = str(5000 - len(self.sent))
+            response.headers["ETag"] = self.etag
+            if request.headers.get("If-None-Match") == self.etag:
+                response.status_code = 304
+                response._content = b""
+            else:
+                response.status_code = 200
+                response.headers["Content-Type"] = "application/json; charset=utf-8"
+                response._content = self.body
+            return response
+
+    gh = GitHub()
+    monkeypatch.setattr(HTTPAdapter, "send", gh.send)
+    return gh
+
+
+@pytest.fixture
+def session():
+    cache = ResponseCache(max_bytes=1024)
+    session = requests.Session()
+    session.mount("https://", CachingAdapter(cache, exclude=["/repos/*/*/contents/*"]))
+    yield session
+    session.close()
+
+
+def stats(session):
+    return session.get_adapter(API).cache.stats
+
+
+def test_not_modified(github, session):
+    first = session.get(f"{API}/repos/zeroae/goblet")
+    assert first.json() == {"id": 1}
+    assert "If-None-Match" not in github.sent[-1].headers
+
+    second = session.get(f"{API}/repos/zeroae/goblet")
+    assert github.sent[-1].headers["If-None-Match"] == '"v1"'
+    assert second.status_code == 200
+    assert second.from_cache
+    assert second.json() == {"id": 1}
+    assert second.encoding == "utf-8"
+    # The headers of the 304 are the fresher ones.
+    assert second.headers["X-RateLimit-Remaining"] == "4998"
+
+    github.etag, github.body = '"v2"', b'{"id": 2}'
+    assert session.get(f"{API}/repos/zeroae/goblet").json() == {"id": 2}
+    assert session.get(f"{API}/repos/zeroae/goblet").json() == {"id": 2}
+    assert stats(session)["hits"] == 2
+    assert stats(session)["misses"] == 2
+    assert stats(session)["hit_ratio"] == 0.5
+
+
+def test_uncached(github, session):
+    session.get(f"{API}/repos/zeroae/goblet/contents/setup.py")
+    session.get(f"{API}/repos/zeroae/goblet/contents/setup.py")
+    assert "If-None-Match" not in github.sent[-1].headers
+
+    session.get(f"{API}/repos/zeroae/goblet")
+    session.get(f"{API}/repos/zeroae/goblet", headers={"Cache-Control": "no-cache"})
+    assert "If-None-Match" not in github.sent[-1].headers
+
+    session.post(f"{API}/repos/zeroae/goblet/issues", json={"title": "Hi"})
+    assert "If-None-Match" not in github.sent[-1].headers
+
+    # The media types are cached apart.
+    session.get(f"{API}/repos/zeroae/goblet", headers={"Accept": "text/html"})
+    assert "If-None-Match" not in github.sent[-1].headers
+    assert stats(session)["entries"] == 2
+
+
+def test_memory_bound():
+    cache = ResponseCache(max_bytes=10)
+    cache.put("a", CachedResponse('"a"', None, {}, b"12345"))
+    cache.put("b", CachedResponse('"b"', None, {}, b"12345"))
+    assert cache.get("a") is not None
+    cache.put("c", CachedResponse('"c"', None, {}, b"123"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats["bytes"] == 8
+    assert cache.stats["evicted"] == 1
+
+    # Too large to be cached at all.
+    cache.put("d", CachedResponse('"d"', None, {}, b"12345678901"))
+    assert cache.get("d") is None
+    assert len(cache) == 2
+
+
+def test_sqlite_tier(tmp_path):
+    path = str(tmp_path / "responses.db")
+    cache = ResponseCache(path=path)
+    cache.put("a", CachedResponse(None, "Mon, 01 Jan 2024", {"X-A": "1"}, b"a"))
+    cache.close()
+
+    cache = ResponseCache(path=path)
+    assert cache.get("a") == CachedResponse(
+        None, "Mon, 01 Jan 2024", {"X-A": "1"}, b"a"
+    )
+    assert cache.stats["disk_reads"] == 1
+    assert cache.get("a") is not None
+    assert cache.stats["disk_reads"] == 1
+    cache.close()
+
+
+def test_sqlite_prune(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.db"), max_disk_bytes=500)
+    for i in range(100):
+        cache.put(f"{i}", CachedResponse(f'"{i}"', None, {}, b"0123456789"))
+    assert cache.stats["disk_evicted"] >= 50
+    assert cache._db.execute("SELECT SUM(size) FROM responses").fetchone()[0] <= 500
+    assert cache._db.execute("SELECT 1 FROM responses WHERE key = '99'").fetchone()
+    cache.close()
+
+
+def test_registry_cache(github):
+    def factory(key, session):
+        return PooledOctokit(session, API, lambda: f"token {key}", budget=key)
+
+    registry = ClientRegistry(factory, cache=ResponseCache())
+    o = registry.get(7, API)
+    o.repos.get(owner="zeroae", repo="goblet")
+    assert o.repos.get(owner="zeroae", repo="goblet").json == {"id": 1}
+    assert github.sent[-1].headers["If-None-Match"] == '"v1"'
+    assert github.sent[-1].headers["Authorization"] == "token 7"
+    assert registry.cache.stats["hits"] == 1
+    assert AUTH_CONTEXT_HEADER not in github.sent[-1].headers
+
+    # The responses of the other installations are cached apart.
+    registry.get(8, API).repos.get(owner="zeroae", repo="goblet")
+    assert "If-None-Match" not in github.sent[-1].headers
+    assert registry.cache.stats["entries"] == 2
+    registry.close()
+
+
+def test_authorization_key(github, session):
+    session.get(f"{API}/repos/zeroae/goblet", headers={"Authorization": "token a"})
+    session.get(f"{API}/repos/zeroae/goblet", headers={"Authorization": "token b"})
+    assert "If-None-Match" not in github.sent[-1].headers
+    session.get(f"{API}/repos/zeroae/goblet", headers={"Authorization": "token a"})
+    assert github.sent[-1].headers["If-None-Match"] == '"v1"'
+
+
+@pytest.fixture
+def server():
+    """A local keep-alive GitHub, 304 when the If-None-Match is its ETag."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "9")
+            self.end_headers()
+            self.wfile.write(b'{"id": 1}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/repos/zeroae/goblet"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_hits_release_connections(server):
+    session = requests.Session()
+    adapter = CachingAdapter(
+        ResponseCache(), pool_connections=1, pool_maxsize=1, pool_block=True
+    )
+    session.mount("http://", adapter)
+    bodies = []
+
+    def get():
+        for _ in range(5):
+            bodies.append(session.get(server.url).json())
+
+    # A leaked connection would block the next request forever.
+    thread = threading.Thread(target=get, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert bodies == [{"id": 1}] * 5
+    assert adapter.cache.stats["hits"] == 4
+    session.close()
@@ -0,0 +1,73 @@
+import threading
+
+import octokit
+import pytest
+import requests
+
+from zeroae.goblet.clients import PooledOctokit
+from zeroae.goblet.pagination import page_items, paginate
+
+API = "https://api.github.com"
+PULLS = f"{API}/repos/zeroae/goblet/pulls"
+
+
+@pytest.fixture
+def pulls(requests_mock):
+    """Three pages of 2 pulls."""
+
+    def page(request, context):
+        n = int(request.qs["page"][0])
+        if n < 3:
+            context.headers["Link"] = (
+                f'<{PULLS}?page={n + 1}&per_page=2>; rel="next", '
+                f'<{PULLS}?page=3&per_page=2>; rel="last"'
+            )
+        return [{"number": 2 * n - 1}, {"number": 2 * n}]
+
+    requests_mock.get(PULLS, json=page)
+    return requests_mock
+
+
+def test_paginate(pulls):
+    o = octokit.Octokit()
+    items = paginate(o.pulls.list, per_page=2, owner="zeroae", repo="goblet")
+    assert [p["number"] for p in items] == [1, 2, 3, 4, 5, 6]
+    assert pulls.call_count == 3
+    assert pulls.last_request.qs["per_page"] == ["2"]
+
+
+def test_max_items(pulls):
+    o = PooledOctokit(requests.Session(), API)
+    items = paginate(
+        o.pulls.list, max_items=3, per_page=2, owner="zeroae", repo="goblet"
+    )
+    assert [p["number"] for p in items] == [1, 2, 3]
+    assert pulls.call_count == 2
+
+    assert list(paginate(o.pulls.list, max_items=0, owner="zeroae")) == []
+
+
+def test_close_stops(pulls):
+    o = PooledOctokit(requests.Session(), API)
+    items = paginate(o.pulls.list, per_page=2, owner="zeroae", repo="goblet")
+    assert next(items)["number"] == 1
+    items.close()
+    for t in threading.enumerate():
+        if t.name == "goblet-paginate":
+            t.join(1)
+    # The first page, and at most the prefetched one.
+    assert pulls.call_count <= 2
+
+
+def test_errors(requests_mock):
+    requests_mock.get(PULLS, status_code=404, json={"message": "Not Found"})
+    o = PooledOctokit(requests.Session(), API)
+    with pytest.raises(requests.HTTPError):
+        list(paginate(o.pulls.list, owner="zeroae", repo="goblet"))
+
+
+def test_page_items():
+    assert page_items([1, 2]) == [1, 2]
+    assert page_items({"total_count": 2, "repositories": [1, 2]}) == [1, 2]
+    with pytest.raises(ValueError):
+        page_items({"message": "Not Found"})
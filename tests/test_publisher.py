@@ -0,0 +1,43 @@
+from zeroae.goblet.publisher import Publisher
+
+
+def test_send():
+    publisher = Publisher()
+    received = []
+    for topic in ["gh", "gh.pull_request", "gh.pull_request.opened", "gh.push"]:
+        publisher.subscribe(lambda p, topic=topic: received.append(topic), topic)
+
+    assert publisher.send("gh.pull_request.opened", {}) == 0
+    assert received == ["gh.pull_request.opened", "gh.pull_request", "gh"]
+    assert len(publisher.listeners("gh.issues")) == 1
+
+
+def test_subscribe_invalidates():
+    publisher = Publisher()
+    received = []
+
+    def listener(payload):
+        received.append(payload)
+
+    assert publisher.listeners("gh.push") == ()
+    publisher.subscribe(listener, "gh.push")
+    publisher.subscribe(listener, "gh.push")
+    assert publisher.listeners("gh.push") == (listener,)
+    publisher.unsubscribe(listener, "gh.push")
+    assert publisher.listeners("gh.push") == ()
+    publisher.send("gh.push", {})
+    assert received == []
+
+
+def test_exception_isolation():
+    publisher = Publisher()
+    received = []
+
+    def broken(payload):
+        raise RuntimeError("broken")
+
+    publisher.subscribe(broken, "gh.push")
+    publisher.subscribe(received.append, "gh")
+    assert publisher.send("gh.push", {"ref": "main"}) == 1
+    assert received == [{"ref": "main"}]
+    assert publisher.stats == {"sent": 1, "failed": 1}
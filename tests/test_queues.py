@@ -0,0 +1,95 @@
+import pytest
+
+from zeroae.goblet.queues import Delivery, MemoryQueue, SQLiteQueue, open_queue
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def ingress(request, tmpdir):
+    if request.param == "memory":
+        yield MemoryQueue()
+    else:
+        q = SQLiteQueue(str(tmpdir.join("ingress.db")), poll_interval=0.01)
+        yield q
+        q.close()
+
+
+def test_put_get_ack(ingress):
+    for i in range(3):
+        assert ingress.put(Delivery(str(i), "gh.push", b'{"i":%d}' % i))
+    assert len(ingress) == 3
+
+    delivery = ingress.get(timeout=0)
+    assert (delivery.id, delivery.topic, delivery.body) == ("0", "gh.push", b'{"i":0}')
+    assert delivery.attempts == 1
+    ingress.ack(delivery)
+    assert len(ingress) == 2
+    assert [ingress.get(timeout=0).id for _ in range(2)] == ["1", "2"]
+    assert ingress.get(timeout=0.05) is None
+
+
+def test_nack(ingress):
+    ingress.put(Delivery("0", "gh.push", b"{}"))
+    delivery = ingress.get(timeout=0)
+    ingress.nack(delivery)
+    delivery = ingress.get(timeout=0)
+    assert delivery.id == "0"
+    assert delivery.attempts == 2
+
+
+def test_nack_full_queue():
+    ingress = MemoryQueue(max_size=1)
+    ingress.put(Delivery("0", "gh.push", b"{}"))
+    delivery = ingress.get(timeout=0)
+    ingress.put(Delivery("1", "gh.push", b"{}"))
+    # Dropped rather than blocking the worker.
+    ingress.nack(delivery)
+    assert [ingress.get(timeout=0).id, ingress.get(timeout=0)] == ["1", None]
+
+
+def test_sqlite_visibility_timeout(tmpdir):
+    path = str(tmpdir.join("ingress.db"))
+    q = SQLiteQueue(path, visibility_timeout=0.05, max_attempts=2)
+    q.put(Delivery("0", "gh.push", b"{}"))
+    other = SQLiteQueue(path, max_attempts=2)
+
+    assert q.get(timeout=0).id == "0"
+    assert other.get(timeout=0) is None
+    # The first consumer died, the delivery is visible again after the timeout.
+    delivery = other.get(timeout=1)
+    assert delivery.attempts == 2
+
+    other.nack(delivery)
+    assert len(q) == 0
+
+
+def test_sqlite_poison_delivery(tmpdir):
+    q = SQLiteQueue(
+        str(tmpdir.join("ingress.db")), visibility_timeout=0, max_attempts=2
+    )
+    q.put(Delivery("0", "gh.push", b"{}"))
+    q.put(Delivery("1", "gh.push", b"{}"))
+    # The workers die before acknowledging delivery 0, it is never nacked.
+    assert q.get(timeout=0).id == "0"
+    assert q.get(timeout=0).id == "0"
+    assert q.get(timeout=0).id == "1"
+    assert len(q) == 1
+
+
+def test_sqlite_max_size(tmpdir):
+    q = SQLiteQueue(str(tmpdir.join("ingress.db")), max_size=1)
+    assert q.put(Delivery("0", "gh.push", b"{}"))
+    assert not q.put(Delivery("1", "gh.push", b"{}"))
+
+
+def test_open_queue(tmpdir):
+    assert open_queue("memory://a") is open_queue("memory://a")
+    assert open_queue("memory://a") is not open_queue("memory://b")
+
+    path = tmpdir.join("ingress.db")
+    q = open_queue(f"sqlite:///{path}")
+    assert isinstance(q, SQLiteQueue)
+    assert q.path == str(path)
+    q.close()
+
+    with pytest.raises(ValueError):
+        open_queue("sqs://localhost:9324/queue/goblet")
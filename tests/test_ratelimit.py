@@ -0,0 +1,151 @@
+import time
+
+import pytest
+import requests
+
+from zeroae.goblet.clients import PooledOctokit
+from zeroae.goblet.ratelimit import Priority, RateLimited, RateLimiter, resource
+
+API = "https://api.github.test"
+BUCKET = ("api.github.test", 7, "core")
+
+
+def response(status=200, remaining=None, limit=100, reset=None, **headers):
+    rv = requests.Response()
+    rv.status_code = status
+    rv._content = b"{}"
+    if remaining is not None:
+        rv.headers["X-RateLimit-Limit"] = str(limit)
+        rv.headers["X-RateLimit-Remaining"] = str(remaining)
+        rv.headers["X-RateLimit-Reset"] = str(reset or int(time.time()) + 3600)
+    rv.headers.update(headers)
+    return rv
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter(reserve=0.1, slow_start=0.5, max_wait=0.5)
+
+
+def test_resource():
+    assert resource(f"{API}/repos/zeroae/goblet") == "core"
+    assert resource(f"{API}/search/issues") == "search"
+    assert resource(f"{API}/graphql") == "graphql"
+
+
+def test_unknown_budget(limiter):
+    # Nothing to hold back the first calls on, nor on hosts without rate limits.
+    for _ in range(3):
+        limiter.call(7, f"{API}/repos", lambda: response())
+    assert limiter.stats["requests"] == 3
+    assert limiter.stats["hosts"] == {}
+
+
+def test_budget_counted(limiter):
+    limiter.update(BUCKET, response(remaining=60))
+    for _ in range(5):
+        limiter.acquire(BUCKET, Priority.INTERACTIVE)
+    budget = limiter.stats["hosts"]["api.github.test"]["budgets"]["7/core"]
+    assert budget["limit"] == 100
+    assert budget["remaining"] == 55
+
+    # An older response does not give back the calls sent since.
+    limiter.update(BUCKET, response(remaining=58, reset=limiter._budgets[BUCKET].reset))
+    assert limiter._budgets[BUCKET].remaining == 55
+
+
+def test_reserve(limiter):
+    limiter.update(BUCKET, response(remaining=10))
+    with pytest.raises(RateLimited) as e:
+        limiter.acquire(BUCKET, Priority.BACKGROUND)
+    assert e.value.retry_after > 3500
+    assert limiter.stats["rejected"] == 1
+
+    # The reserve is left to the interactive calls.
+    for _ in range(10):
+        limiter.acquire(BUCKET, Priority.INTERACTIVE)
+    with pytest.raises(RateLimited):
+        limiter.acquire(BUCKET, Priority.INTERACTIVE)
+
+
+def test_background_paced(limiter):
+    reset = time.time() + 0.4
+    limiter.update(BUCKET, response(remaining=30, reset=reset))
+
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire(BUCKET, Priority.BACKGROUND)
+    # Spread over the 20 calls left above the reserve, until the reset.
+    assert time.monotonic() - start >= 3 * 0.4 / 20 * 0.9
+    assert limiter.stats["throttled"] >= 3
+
+    # The interactive calls are not paced.
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire(BUCKET, Priority.INTERACTIVE)
+    assert time.monotonic() - start < 0.01
+
+
+def test_reset_refills(limiter):
+    limiter.update(BUCKET, response(remaining=0, reset=time.time() - 1))
+    limiter.acquire(BUCKET, Priority.BACKGROUND)
+    assert limiter._budgets[BUCKET].remaining == 99
+
+
+def test_secondary_limit(limiter):
+    answers = [response(403, **{"Retry-After": "0.2"}), response()]
+    start = time.monotonic()
+    rv = limiter.call(7, f"{API}/repos", lambda: answers.pop(0))
+    assert rv.status_code == 200
+    assert time.monotonic() - start >= 0.2
+    assert limiter.stats["retried"] == 1
+    assert limiter.stats["limited"] == 1
+
+    # The host is held back for every auth context.
+    limiter.update(BUCKET, response(429, **{"Retry-After": "30"}))
+    with pytest.raises(RateLimited):
+        limiter.acquire(("api.github.test", "app", "core"), Priority.INTERACTIVE)
+    assert limiter.stats["hosts"]["api.github.test"]["blocked_for"] > 29
+
+
+def test_secondary_limit_without_retry_after(limiter):
+    limiter.max_wait = 0.5
+    rv = response(403, remaining=50)
+    rv._content = b'{"message": "You have exceeded a secondary rate limit."}'
+    assert limiter.call(7, f"{API}/repos", lambda: rv) is rv
+    assert limiter.stats["limited"] == 1
+    assert limiter.stats["retried"] == 0
+    with pytest.raises(RateLimited) as e:
+        limiter.acquire(("api.github.test", 8, "core"), Priority.INTERACTIVE)
+    assert e.value.retry_after > 59
+
+    limiter = RateLimiter(secondary_wait=0.1, max_wait=0.5)
+    answers = [response(429), response()]
+    assert limiter.call(7, f"{API}/repos", lambda: answers.pop(0)).status_code == 200
+    assert limiter.stats["retried"] == 1
+
+
+def test_exhausted(limiter):
+    rv = limiter.call(7, f"{API}/repos", lambda: response(403, remaining=0))
+    assert rv.status_code == 403
+    assert limiter.stats["retried"] == 0
+    with pytest.raises(RateLimited):
+        limiter.acquire(BUCKET, Priority.INTERACTIVE)
+
+    # Forbidden for other reasons.
+    rv = limiter.call(8, f"{API}/repos", lambda: response(403, remaining=50))
+    assert rv.status_code == 403
+    assert limiter.stats["limited"] == 1
+
+
+def test_pooled_octokit(limiter, requests_mock):
+    headers = {"X-RateLimit-Limit": "100", "X-RateLimit-Remaining": "5"}
+    requests_mock.get(f"{API}/repos/zeroae/goblet", json={"id": 1}, headers=headers)
+    o = PooledOctokit(requests.Session(), API, limiter=limiter, budget=7)
+
+    assert o.repos.get(owner="zeroae", repo="goblet").json == {"id": 1}
+    assert o.repos.get(owner="zeroae", repo="goblet").json == {"id": 1}
+    with pytest.raises(RateLimited):
+        o.repos.get(owner="zeroae", repo="goblet", priority=Priority.BACKGROUND)
+    assert requests_mock.call_count == 2
+    assert "priority" not in requests_mock.last_request.qs
@@ -0,0 +1,74 @@
+import pytest
+
+from zeroae.goblet.routing import (
+    RoutingTable,
+    filtered,
+    labels,
+    parse_action,
+    predicate,
+    topic_name,
+)
+
+
+def test_topic_name():
+    assert topic_name("*") == "gh"
+    assert topic_name("pull_request") == "gh.pull_request"
+    assert topic_name("pull_request.opened") == "gh.pull_request.opened"
+
+
+@pytest.mark.parametrize(
+    "body, action",
+    [
+        (b'{"action":"opened","number":1}', "opened"),
+        (b'{\n  "action": "closed"\n}', "closed"),
+        (b'{"number": 1, "action": "labeled"}', "labeled"),
+        (b'{"ref": "refs/heads/main"}', None),
+        (b"[]", None),
+    ],
+)
+def test_parse_action(body, action):
+    assert parse_action(body) == action
+
+
+def test_routing_table():
+    routes = RoutingTable()
+    routes.add("gh")
+    routes.add("gh.push")
+    routes.add("gh.pull_request.opened")
+    routes.add("gh.pull_request.closed")
+
+    body = b'{"action": "opened"}'
+    assert routes.resolve("gh.pull_request", body) == "gh.pull_request.opened"
+    assert routes.resolve("gh.pull_request", b'{"action": "edited"}') == (
+        "gh.pull_request"
+    )
+    # Events without action listeners are not parsed.
+    assert routes.resolve("gh.push", b"not json") == "gh.push"
+
+
+def test_predicate():
+    payload = {
+        "repository": {"full_name": "zeroae/goblet"},
+        "label": {"name": "bug"},
+        "pull_request": {"labels": [{"name": "bug"}, {"name": "urgent"}]},
+    }
+    assert labels(payload) == {"bug", "urgent"}
+    assert predicate() is None
+    assert predicate(repository="zeroae/goblet")(payload)
+    assert not predicate(repository=["zeroae/other"])(payload)
+    assert predicate(label=["urgent", "docs"])(payload)
+    assert not predicate(label="docs")(payload)
+    assert not predicate(repository="zeroae/goblet", when=lambda p: False)(payload)
+    assert not predicate(label="bug")({"repository": None})
+
+
+def test_filtered():
+    payloads = []
+
+    def listener(payload):
+        payloads.append(payload)
+
+    listener = filtered(listener, lambda p: p["ok"])
+    listener({"ok": False})
+    listener({"ok": True})
+    assert payloads == [{"ok": True}]
@@ -0,0 +1,76 @@
+import json
+import queue
+
+import pytest
+
+from zeroae.goblet.scheduling import FairQueue, installation_id
+
+
+@pytest.mark.parametrize(
+    "payload, expected",
+    [
+        ({"action": "opened", "installation": {"id": 42, "node_id": "x"}}, 42),
+        ({"installation": {"id": 7}, "sender": {"installation": "spoof"}}, 7),
+        ({"action": "opened"}, None),
+    ],
+)
+def test_installation_id(payload, expected):
+    assert installation_id(json.dumps(payload).encode()) == expected
+
+
+def drain(fair: FairQueue):
+    order = []
+    while fair.qsize():
+        tenant, item = fair.get(timeout=0)
+        fair.task_done(tenant)
+        order.append(item)
+    return order
+
+
+def test_round_robin():
+    fair = FairQueue()
+    for i in range(4):
+        fair.put(f"a{i}", "a")
+    fair.put("b0", "b")
+    fair.put("c0", "c")
+    assert drain(fair) == ["a0", "b0", "c0", "a1", "a2", "a3"]
+
+
+def test_weights():
+    fair = FairQueue(weights={"a": 2, "c": 0.5})
+    for tenant in "abc":
+        for i in range(4):
+            fair.put(f"{tenant}{i}", tenant)
+    assert drain(fair)[:7] == ["a0", "a1", "b0", "a2", "a3", "b1", "c0"]
+
+
+def test_concurrency():
+    fair = FairQueue(concurrency=1)
+    fair.put("a0", "a")
+    fair.put("a1", "a")
+    fair.put("b0", "b")
+    assert fair.get(timeout=0) == ("a", "a0")
+    assert fair.get(timeout=0) == ("b", "b0")
+    with pytest.raises(queue.Empty):
+        fair.get(timeout=0.01)
+    fair.task_done("a")
+    assert fair.get(timeout=0) == ("a", "a1")
+    assert fair.tenants == {
+        "a": {"queued": 0, "running": 1, "served": 2},
+        "b": {"queued": 0, "running": 1, "served": 1},
+    }
+
+
+def test_limits():
+    fair = FairQueue(max_size=3, max_tenant_size=2)
+    fair.put("a0", "a")
+    fair.put("a1", "a")
+    with pytest.raises(queue.Full):
+        fair.put("a2", "a")
+    fair.put("b0", "b")
+    with pytest.raises(queue.Full):
+        fair.put("c0", "c")
+    fair.put("c0", "c", force=True)
+    assert fair.qsize() == 4
+    with pytest.raises(ValueError):
+        FairQueue(weights={"a": 0})
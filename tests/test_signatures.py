@@ -0,0 +1,56 @@
+import hmac
+
+import pytest
+
+from zeroae.goblet.signatures import WebhookVerifier
+
+BODY = b'{"action": "opened"}'
+
+
+def sign(secret: str, algorithm: str = "sha256", body: bytes = BODY) -> str:
+    return f"{algorithm}={hmac.new(secret.encode(), body, algorithm).hexdigest()}"
+
+
+@pytest.fixture
+def verifier() -> WebhookVerifier:
+    return WebhookVerifier(["new-secret", "old-secret"])
+
+
+def test_sha256(verifier):
+    headers = {"x-hub-signature-256": sign("new-secret")}
+    assert verifier.verify(headers, BODY)
+    assert not verifier.verify(headers, BODY + b" ")
+
+
+def test_sha1(verifier):
+    headers = {"x-hub-signature": sign("new-secret", "sha1")}
+    assert verifier.verify(headers, BODY)
+    assert not WebhookVerifier(["new-secret"], allow_sha1=False).verify(headers, BODY)
+
+
+def test_sha256_takes_precedence(verifier):
+    headers = {
+        "x-hub-signature-256": sign("wrong-secret"),
+        "x-hub-signature": sign("new-secret", "sha1"),
+    }
+    assert not verifier.verify(headers, BODY)
+
+
+def test_rotated_secrets(verifier):
+    assert len(verifier) == 2
+    assert verifier.verify({"x-hub-signature-256": sign("old-secret")}, BODY)
+    assert not verifier.verify({"x-hub-signature-256": sign("wrong-secret")}, BODY)
+
+
+def test_malformed_signature(verifier):
+    digest = sign("new-secret").split("=", 1)[1]
+    assert not verifier.verify({"x-hub-signature-256": f"sha1={digest}"}, BODY)
+    assert not verifier.verify({"x-hub-signature-256": digest}, BODY)
+    assert not verifier.verify({"x-hub-signature-256": "sha256=ünïcode"}, BODY)
+    assert not verifier.verify({}, BODY)
+
+
+def test_no_secrets():
+    verifier = WebhookVerifier([None, ""])
+    assert len(verifier) == 0
+    assert not verifier.verify({"x-hub-signature-256": sign("")}, BODY)
@@ -0,0 +1,29 @@
+import threading
+
+from zeroae.goblet.timers import TimerQueue
+
+
+def test_call_later():
+    timers = TimerQueue()
+    fired = []
+    done = threading.Event()
+    timers.call_later(0.02, lambda: (fired.append(2), done.set()))
+    timers.call_later(0.01, lambda: fired.append(1))
+    timers.call_later(0.01, lambda: fired.append("cancelled")).cancel()
+    assert done.wait(1)
+    assert fired == [1, 2]
+    timers.stop()
+
+
+def test_stop():
+    timers = TimerQueue()
+    fired = []
+    timers.call_later(60, lambda: fired.append(1))
+    timers.stop()
+    assert len(timers) == 0
+
+    # The thread is started again.
+    done = threading.Event()
+    timers.call_later(0, done.set)
+    assert done.wait(1)
+    timers.stop()
@@ -80,3 +80,47 @@ def test_get_create_app_url(mock_app_organization, default_config):
     else:
         assert "organization" not in app_url
     assert app_url.endswith("settings/apps/new")
+
+
+def test_get_installation_octokit(monkeypatch, requests_mock, default_config):
+    from urllib.parse import urlparse
+
+    import rsa
+
+    from zeroae.goblet import config, utils
+
+    _, private = rsa.newkeys(512)
+    monkeypatch.setattr(config, "APP_ID", "42")
+    monkeypatch.setattr(config, "APP_PEM", private.save_pkcs1().decode())
+    monkeypatch.setattr(config, "GHE_API_URL", urlparse("https://api.github.test"))
+    monkeypatch.setattr(config, "GHE_API_SPEC", "api.github.com")
+    monkeypatch.setattr(utils, "_client_registry", None)
+    requests_mock.post(
+        "https://api.github.test/app/installations/1/access_tokens",
+        json={"token": "abc", "expires_at": "2999-01-01T00:00:00Z"},
+    )
+    requests_mock.get("https://api.github.test/repos/zeroae/goblet", json={"id": 1})
+
+    o = utils.get_installation_octokit(1)
+    assert utils.get_installation_octokit(1) is o
+    assert o.repos.get(owner="zeroae", repo="goblet").json == {"id": 1}
+    assert o.repos.get(owner="zeroae", repo="goblet").json == {"id": 1}
+    assert requests_mock.last_request.headers["Authorization"] == "token abc"
+    assert utils.get_token_manager().stats["token_misses"] == 1
+    assert utils.get_client_registry().stats["reused"] == 1
+
+
+def test_get_configured_octokit(monkeypatch, requests_mock, default_config):
+    from urllib.parse import urlparse
+
+    from zeroae.goblet import config, utils
+
+    monkeypatch.setattr(config, "GHE_API_URL", urlparse("https://api.github.test"))
+    monkeypatch.setattr(utils, "_client_registry", None)
+    requests_mock.get("https://api.github.test/repos/zeroae/goblet", json={"id": 1})
+
+    o = utils.get_configured_octokit()
+    assert utils.get_configured_octokit() is o
+    assert o.repos.get(owner="zeroae", repo="goblet").json == {"id": 1}
+    assert "Authorization" not in requests_mock.last_request.headers
+    assert utils.get_client_registry().stats["ratelimit"]["requests"] == 1
@@ -0,0 +1,68 @@
+import threading
+
+from zeroae.goblet.queues import Delivery, MemoryQueue
+from zeroae.goblet.worker import Worker
+
+
+def test_worker():
+    queue = MemoryQueue()
+    for i in range(3):
+        queue.put(Delivery(str(i), "gh.push", b'{"i":%d}' % i))
+
+    delivered = []
+    worker = Worker(queue, lambda topic, body: delivered.append((topic, body)))
+    assert worker.run(max_deliveries=3) == 3
+    assert delivered == [("gh.push", b'{"i":%d}' % i) for i in range(3)]
+    assert len(queue) == 0
+
+
+def test_failed_listeners_are_not_retried(default_config):
+    from zeroae.goblet.chalice import bp
+
+    queue = MemoryQueue(max_attempts=3)
+    queue.put(Delivery("0", "gh.worker_retry", b"{}"))
+    calls = []
+
+    @bp.on_gh_event("worker_retry")
+    def working(payload):
+        calls.append("working")
+
+    @bp.on_gh_event("worker_retry")
+    def broken(payload):
+        calls.append("broken")
+        raise RuntimeError()
+
+    worker = Worker(queue, bp.deliver)
+    try:
+        assert worker.run(max_deliveries=1) == 1
+    finally:
+        bp.publisher.unsubscribe(working, "gh.worker_retry")
+        bp.publisher.unsubscribe(broken, "gh.worker_retry")
+    assert sorted(calls) == ["broken", "working"]
+    assert worker.counters["failed_listeners"] == 1
+    assert len(queue) == 0
+
+
+def test_failed_deliveries_are_dropped(default_config):
+    from zeroae.goblet.chalice import bp
+
+    queue = MemoryQueue(max_attempts=3)
+    queue.put(Delivery("0", "gh.worker_broken", b"not json"))
+
+    @bp.on_gh_event("worker_broken")
+    def listener(payload):
+        pass
+
+    worker = Worker(queue, bp.deliver)
+    try:
+        assert worker.run(max_deliveries=3) == 3
+    finally:
+        bp.publisher.unsubscribe(listener, "gh.worker_broken")
+    assert worker.counters["retried"] == 3
+    assert len(queue) == 0
+
+
+def test_stop():
+    stop = threading.Event()
+    stop.set()
+    assert Worker(MemoryQueue(), lambda *args: None).run(stop) == 0
@@ -0,0 +1,202 @@
+"""Caches of the GitHub App JWT, and of its installation access tokens."""
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import requests
+from dateutil.parser import isoparse
+from jose import jwt
+
+logger = logging.getLogger(__name__)
+
+#: GitHub rejects the app JWTs expiring more than 10 minutes from now.
+JWT_TTL = 9 * 60
+
+
+class TokenManager(object):
+    """
+    Mints the app JWT and the installation access tokens, and reuses them.
+
+    - The app JWT (an RSA signature) is reused until ``jwt_leeway`` seconds before
+      it expires.
+    - The installation tokens are kept in a bounded LRU, per installation id. Within
+      ``refresh_margin`` seconds of their expiry the cached token is still returned,
+      but a new one is minted in the background; within ``min_validity`` seconds
+      the caller waits for the new one.
+    - Concurrent callers missing the same token share a single minting request.
+    """
+
+    def __init__(
+        self,
+        app_id: str,
+        private_key: str,
+        base_url: str = "https://api.github.com",
+        max_installations: int = 1024,
+        jwt_leeway: float = 60.0,
+        refresh_margin: float = 300.0,
+        min_validity: float = 60.0,
+        session: requests.Session = None,
+        timeout: float = 10.0,
+    ):
+        """
+        :param app_id: The GitHub App id, i.e. config.APP_ID
+        :param private_key: The GitHub App PEM, i.e. config.APP_PEM
+        :param base_url: The GitHub API url, i.e. config.GHE_API_URL
+        :param max_installations: The maximum number of installation tokens kept
+        :param session: Sends the minting requests, i.e. the pooled one of the host
+        :param timeout: Seconds before a minting request is given up
+        """
+        self.app_id = app_id
+        self.private_key = private_key
+        self.base_url = base_url.rstrip("/")
+        self.max_installations = max_installations
+        self.jwt_leeway = jwt_leeway
+        self.refresh_margin = refresh_margin
+        self.min_validity = min_validity
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.counters = Counter()
+
+        self._jwt: Tuple[str, float] = (None, 0.0)
+        self._tokens: "OrderedDict[Hashable, Tuple[str, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def app_jwt(self) -> str:
+        """The app JWT, to authenticate as the GitHub App."""
+        token = self._cached_jwt()
+        if token is not None:
+            self._count("jwt_hits")
+            return token
+        self._count("jwt_misses")
+        return self._single_flight("jwt", self._mint_jwt, self._cached_jwt)
+
+    def installation_token(self, installation_id: int) -> str:
+        """The access token of the installation, to act on its repositories."""
+        with self._lock:
+            token, expires_at = self._tokens.get(installation_id, (None, 0.0))
+            if token is not None:
+                self._tokens.move_to_end(installation_id)
+        remaining = expires_at - time.time()
+        if remaining > self.refresh_margin:
+            self._count("token_hits")
+            return token
+        if remaining > self.min_validity:
+            # Still good for a while, it is replaced in the background.
+            self._count("token_hits")
+            self._refresh(installation_id)
+            return token
+        self._count("token_misses")
+        return self._single_flight(
+            installation_id,
+            lambda: self._mint_token(installation_id),
+            lambda: self._cached_token(installation_id),
+        )
+
+    def invalidate(self, installation_id: int):
+        """Forgets the installation token, i.e. after GitHub rejected it."""
+        with self._lock:
+            self._tokens.pop(installation_id, None)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """The hit and miss counters and ratios of the JWT and installation tokens."""
+        with self._lock:
+            stats = dict(self.counters, tokens=len(self._tokens))
+        for kind in ["jwt", "token"]:
+            hits = stats.setdefault(f"{kind}_hits", 0)
+            lookups = hits + stats.setdefault(f"{kind}_misses", 0)
+            stats[f"{kind}_hit_ratio"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def _single_flight(
+        self,
+        key: Hashable,
+        mint: Callable[[], str],
+        cached: Callable[[], Optional[str]],
+    ) -> str:
+        with self._lock:
+            # Minted by another caller since the cache was looked up.
+            token = cached()
+            if token is not None:
+                return token
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if leader:
+            self._settle(key, future, mint)
+        return future.result()
+
+    def _settle(self, key: Hashable, future: Future, mint: Callable[[], str]):
+        try:
+            future.set_result(mint())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _refresh(self, installation_id: int):
+        with self._lock:
+            if installation_id in self._inflight:
+                return
+            # Registered before the thread starts, the callers share its minting.
+            future = self._inflight[installation_id] = Future()
+
+        def refresh():
+            self._settle(
+                installation_id, future, lambda: self._mint_token(installation_id)
+            )
+            if future.exception() is not None:
+                logger.error(
+                    f"Could not refresh the token of {installation_id}",
+                    exc_info=future.exception(),
+                )
+
+        self._count("token_refreshes")
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _cached_jwt(self) -> Optional[str]:
+        token, expires_at = self._jwt
+        return token if expires_at - time.time() > self.jwt_leeway else None
+
+    def _cached_token(self, installation_id: int) -> Optional[str]:
+        # Called with the lock held.
+        token, expires_at = self._tokens.get(installation_id, (None, 0.0))
+        return token if expires_at - time.time() > self.min_validity else None
+
+    def _mint_jwt(self) -> str:
+        now = int(time.time())
+        # Backdated, in case the GitHub clock is behind ours.
+        payload = {"iat": now - 60, "exp": now + JWT_TTL, "iss": self.app_id}
+        token = jwt.encode(payload, self.private_key, algorithm="RS256")
+        self._jwt = (token, now + JWT_TTL)
+        return token
+
+    def _mint_token(self, installation_id: int) -> str:
+        response = self.session.post(
+            f"{self.base_url}/app/installations/{installation_id}/access_tokens",
+            headers={
+                "Authorization": f"Bearer {self.app_jwt()}",
+                "Accept": "application/vnd.github.machine-man-preview+json",
+            },
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        body = response.json()
+        token, expires_at = body["token"], isoparse(body["expires_at"]).timestamp()
+        with self._lock:
+            self._tokens[installation_id] = (token, expires_at)
+            self._tokens.move_to_end(installation_id)
+            while len(self._tokens) > self.max_installations:
+                self._tokens.popitem(last=False)
+                self.counters["token_evictions"] += 1
+        return token
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
@@ -0,0 +1,101 @@
+"""Buffers the webhook payloads of the on_gh_events handlers."""
+import functools
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from .timers import Timer, TimerQueue
+
+logger = logging.getLogger(__name__)
+
+
+class Batcher(object):
+    """
+    Calls the handler with lists of payloads.
+
+    A batch is handed over when it holds ``max_batch`` payloads, ``max_wait`` seconds
+    after its first payload, or on :meth:`flush`. The size flushes run on the thread
+    adding the last payload, the time flushes on the timer thread.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], None],
+        timers: TimerQueue,
+        max_batch: int = 100,
+        max_wait: float = 1.0,
+    ):
+        """
+        :param handler: Called with the list of payloads
+        :param timers: Runs the max_wait flushes
+        :param max_batch: The maximum number of payloads in a batch
+        :param max_wait: The maximum seconds a payload waits for its batch
+        """
+        self.handler = handler
+        self.timers = timers
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.counters = Counter()
+
+        self._batch: List[Any] = []
+        self._timer: Optional[Timer] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def add(self, payload: Any):
+        with self._lock:
+            self._batch.append(payload)
+            if len(self._batch) >= self.max_batch:
+                batch = self._take("size")
+            else:
+                batch = None
+                if len(self._batch) == 1:
+                    expire = functools.partial(self._expire, self._generation)
+                    self._timer = self.timers.call_later(self.max_wait, expire)
+        if batch:
+            self._handle(batch)
+
+    def flush(self):
+        """Hands the pending payloads over, i.e. on shutdown."""
+        with self._lock:
+            batch = self._take("flush")
+        if batch:
+            self._handle(batch)
+
+    def __len__(self) -> int:
+        return len(self._batch)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """The payload and batch counters, per flush reason."""
+        with self._lock:
+            return dict(self.counters, pending=len(self._batch))
+
+    def _expire(self, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                # The batch was already handed over.
+                return
+            batch = self._take("time")
+        if batch:
+            self._handle(batch)
+
+    def _take(self, reason: str) -> List[Any]:
+        batch, self._batch = self._batch, []
+        self._generation += 1
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if batch:
+            self.counters[f"{reason}_batches"] += 1
+            self.counters["payloads"] += len(batch)
+        return batch
+
+    def _handle(self, batch: List[Any]):
+        try:
+            self.handler(batch)
+        except Exception:
+            logger.exception(f"Unhandled error in {self.handler!r}")
+            with self._lock:
+                self.counters["failed_batches"] += 1
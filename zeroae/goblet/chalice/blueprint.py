@@ -1,9 +1,13 @@
+import functools
+import json
+import threading
+from collections import Counter
 from http import HTTPStatus
+from typing import Any, Callable, Dict, List, Optional
 from urllib.parse import urljoin
 
 from chalice import Blueprint, Response
-from chalice.app import Request, ForbiddenError
-from octokit import webhook
+from chalice.app import BadRequestError, Request, ForbiddenError
 from pubsub import pub
 from pubsub.utils import ExcPublisher
 
@@ -14,6 +18,17 @@ from zeroae.goblet.utils import (
     get_configured_octokit,
 )
 from .. import config
+from ..batching import Batcher
+from ..coalescing import Coalescer
+from ..deliveries import DeliveryCache, open_cache
+from ..dispatch import Dispatcher
+from ..payload import LazyPayload, Receivers
+from ..publisher import Publisher
+from ..queues import Delivery, IngressQueue, open_queue
+from ..routing import RoutingTable, filtered, predicate, topic_name
+from ..scheduling import installation_id
+from ..signatures import GITHUB_EVENTS, WebhookVerifier, valid_delivery, valid_event
+from ..timers import TimerQueue
 from ..views import render_setup_html
 
 
@@ -22,21 +37,319 @@ class GitHubAppBlueprint(Blueprint):
         """Creates the Chalice GitHubApp Blueprint."""
         super().__init__(import_name)
         pub.setListenerExcHandler(ExcPublisher(pub.getDefaultTopicMgr()))
+        self._dispatcher = None
+        self._ingress = None
+        self._deliveries = None
+        self._receivers: Dict[str, Receivers] = {}
+        self.routes = RoutingTable()
+        self.publisher = Publisher()
+        self.timers = TimerQueue(run=self._run_later)
+        self._batchers: List[Batcher] = []
+        self._coalescers: Dict[str, Coalescer] = {}
+        self._verifier = self._secrets = None
+        self.counters = Counter()
+        self._lock = threading.Lock()
 
-    @staticmethod
-    def on_gh_event(topic):
+    @property
+    def verifier(self) -> WebhookVerifier:
         """
-        :param topic: The GitHub webhook topic
+        Verifies the webhooks with APP_WEBHOOK_SECRET and APP_WEBHOOK_SECRETS.
+
+        It is rebuilt whenever the secrets change, i.e. after the app registration.
+        """
+        secrets = (config.APP_WEBHOOK_SECRET, *(config.APP_WEBHOOK_SECRETS or ()))
+        if secrets != self._secrets:
+            self._verifier, self._secrets = WebhookVerifier(secrets), secrets
+        return self._verifier
+
+    @property
+    def dispatcher(self) -> Dispatcher:
+        """The worker pool of the async DISPATCH_MODE, created on first use."""
+        if self._dispatcher is None:
+            self._dispatcher = Dispatcher(
+                self.deliver,
+                workers=config.DISPATCH_WORKERS,
+                queue_size=config.DISPATCH_QUEUE_SIZE,
+                tenant_queue_size=config.DISPATCH_TENANT_QUEUE_SIZE,
+                tenant_concurrency=config.DISPATCH_TENANT_CONCURRENCY,
+                tenant_weights=config.DISPATCH_TENANT_WEIGHTS,
+            )
+        return self._dispatcher
+
+    @property
+    def ingress(self) -> IngressQueue:
+        """The INGRESS_QUEUE_URL queue of the queue DISPATCH_MODE, opened on first use."""
+        if self._ingress is None:
+            self._ingress = open_queue(config.INGRESS_QUEUE_URL)
+        return self._ingress
+
+    @property
+    def deliveries(self) -> Optional[DeliveryCache]:
+        """The DELIVERY_CACHE_URL cache of the delivery ids, None if disabled."""
+        if self._deliveries is None and config.DELIVERY_CACHE_URL:
+            self._deliveries = open_cache(
+                config.DELIVERY_CACHE_URL,
+                max_size=config.DELIVERY_CACHE_SIZE,
+                ttl=config.DELIVERY_CACHE_TTL,
+            )
+        return self._deliveries
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """The counters and latencies of the webhook processing stages."""
+        with self._lock:
+            stats = {"events": dict(self.counters)}
+        stats["publisher"] = self.publisher.stats
+        if self._coalescers:
+            stats["coalesce"] = {t: c.stats for t, c in self._coalescers.items()}
+        if self._batchers:
+            stats["batches"] = {b.handler.__qualname__: b.stats for b in self._batchers}
+        if self._dispatcher is not None:
+            stats["dispatch"] = self._dispatcher.stats
+            stats["tenants"] = self._dispatcher.tenants
+        if self._ingress is not None:
+            stats["ingress"] = {"queued": len(self._ingress)}
+        if self._deliveries is not None:
+            stats["deliveries"] = self._deliveries.stats
+        return stats
+
+    def dispatch(self, topic: str, body: bytes, delivery_id: str = None) -> bool:
+        """
+        Delivers the webhook now, or queues it depending on the DISPATCH_MODE.
+
+        - sync: the listeners run before the response is returned, the coalesced and
+          batched payloads are flushed too (i.e. AWS Lambda freezes the process).
+        - async: the listeners run on the :attr:`dispatcher` worker threads.
+        - queue: the webhook is left in the :attr:`ingress` queue for ``goblet worker``.
+
+        :param topic: The PyPubSub topic of the event, i.e. gh.push
+        :param body: The (verified) webhook body
+        :param delivery_id: The X-GitHub-Delivery header, redeliveries are skipped
+        :return: False if the webhook could not be queued
+        """
+        topic = self.routes.resolve(topic, body)
+        if self.receivers(topic) is Receivers.NONE:
+            # Nobody is listening, acknowledge it without even decoding it.
+            self.count("skipped")
+            return True
+        deliveries = self.deliveries if delivery_id else None
+        if deliveries is not None and deliveries.seen(delivery_id):
+            self.count("duplicate")
+            return True
+        queued = False
+        try:
+            queued = self._dispatch(topic, body, delivery_id)
+            return queued
+        finally:
+            if not queued and deliveries is not None:
+                # Let GitHub's retry of the failed delivery through.
+                deliveries.forget(delivery_id)
+
+    def _dispatch(self, topic: str, body: bytes, delivery_id: str) -> bool:
+        if config.DISPATCH_MODE == "queue":
+            return self.ingress.put(Delivery(delivery_id, topic, body))
+        if config.DISPATCH_MODE == "async":
+            return self.dispatcher.submit(topic, body, installation_id(body))
+        self.deliver(topic, body)
+        # i.e. on AWS Lambda, nothing runs once the response is returned.
+        self.flush()
+        return True
+
+    def deliver(self, topic: str, body: bytes) -> int:
+        """
+        Decodes the webhook body, when needed, and publishes it to the listeners.
+
+        :return: The number of listeners that raised, 0 if the payload was coalesced
+        """
+        receivers = self.receivers(topic)
+        if receivers is Receivers.NONE:
+            self.count("skipped")
+            return 0
+        if receivers is Receivers.LAZY:
+            self.count("lazy")
+            payload = LazyPayload(body)
+        else:
+            self.count("decoded")
+            payload = json.loads(body)
+        coalescer = self._coalescer(topic) if self._coalescers else None
+        if coalescer is not None:
+            coalescer.add(topic, payload)
+            return 0
+        return self.publish(topic, payload)
+
+    def coalesce(self, topic, key, window=5.0, max_wait=None):
+        """
+        Publishes only the newest webhook of the topic per key, once no newer one
+        came for ``window`` seconds. The older ones are dropped, and counted.
+
+        Only the async and queue DISPATCH_MODEs coalesce across webhooks, the sync
+        one publishes the payload before its response.
+
+        :param topic: The GitHub webhook topic, or event action (pull_request.opened)
+        :param key: The key of a payload, i.e. its repository and ref; None (or a
+            missing field) publishes the payload right away
+        :param window: Seconds without a newer webhook before publishing
+        :param max_wait: The maximum seconds a key stays pending, no limit if None
+        """
+        name = topic_name(topic)
+        self._coalescers[name] = Coalescer(
+            self.publish, key, self.timers, window=window, max_wait=max_wait
+        )
+        # The action topic is routed even if only its event has listeners.
+        self.routes.add(name)
+
+    def _coalescer(self, topic: str) -> Optional[Coalescer]:
+        coalescer = self._coalescers.get(topic)
+        if coalescer is None:
+            # The coalescer of the event, for its action topics.
+            coalescer = self._coalescers.get(".".join(topic.split(".", 2)[:2]))
+        return coalescer
+
+    def _run_later(self, callback: Callable[[], None]):
+        # The coalescer and batcher timers publish on the dispatcher workers, the
+        # timer thread is left to keep time. In the sync DISPATCH_MODE there are no
+        # workers, the payloads are flushed before the responses.
+        if config.DISPATCH_MODE not in ("async", "queue"):
+            callback()
+        elif not self.dispatcher.submit("gh.timers", callback, publish=_call):
+            # The queue is full, the payloads are published late rather than dropped.
+            callback()
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self.counters[key] += n
+
+    def publish(self, topic: str, payload: Any) -> int:
+        """
+        Sends the payload to the on_gh_event listeners.
+
+        With DISPATCH_PUBSUB, it is then sent to the PyPubSub topic too, for the
+        listeners subscribed with ``pub.subscribe``.
+
+        :return: The number of on_gh_event listeners that raised
+        """
+        failed = self.publisher.send(topic, payload)
+        if config.DISPATCH_PUBSUB:
+            pub.sendMessage(topic, payload=payload)
+        return failed
+
+    def flush(self):
+        """Publishes the coalesced and batched webhooks now."""
+        for coalescer in self._coalescers.values():
+            coalescer.flush()
+        for batcher in self._batchers:
+            batcher.flush()
+
+    def shutdown(self):
+        """Publishes the queued, coalesced and batched webhooks, and stops the workers."""
+        self.timers.stop()
+        if self._dispatcher is not None:
+            self._dispatcher.shutdown()
+            self._dispatcher = None
+        self.flush()
+        self.timers.stop()
+        if self._deliveries is not None:
+            self._deliveries.close()
+            self._deliveries = None
+
+    def on_gh_event(self, topic, lazy=False, repository=None, label=None, when=None):
+        """
+        :param topic: The GitHub webhook topic, or event action (pull_request.opened)
+        :param lazy: The listener accepts a LazyPayload, decoded on first access
+        :param repository: Only the payloads of the repository full name(s)
+        :param label: Only the payloads with (any of) the label name(s)
+        :param when: Only the payloads passing this test
         :return: decorator
         """
+        test = predicate(repository=repository, label=label, when=when)
 
         def decorator(f):
-            l, _ = pub.subscribe(f, "gh" if topic == "*" else f"gh.{topic}")
-            f.listener = l
+            f.lazy_payload = lazy
+            f.listener = f if test is None else filtered(f, test)
+            name = topic_name(topic)
+            self.publisher.subscribe(f.listener, name)
+            self.routes.add(name)
+            self._receivers.clear()
             return f
 
         return decorator
 
+    def on_gh_events(
+        self,
+        topic,
+        max_batch=100,
+        max_wait=1.0,
+        lazy=False,
+        repository=None,
+        label=None,
+        when=None,
+    ):
+        """
+        Like on_gh_event, but the listener is called with lists of payloads.
+
+        A batch is handed over when it holds ``max_batch`` payloads, ``max_wait``
+        seconds after its first payload, or on shutdown. In the sync DISPATCH_MODE,
+        before every response.
+
+        :param topic: The GitHub webhook topic, or event action (pull_request.opened)
+        :param max_batch: The maximum number of payloads in a batch
+        :param max_wait: The maximum seconds a payload waits for its batch
+        :return: decorator
+        """
+
+        def decorator(f):
+            f.batcher = Batcher(f, self.timers, max_batch=max_batch, max_wait=max_wait)
+            self._batchers.append(f.batcher)
+
+            @functools.wraps(f)
+            def add(payload):
+                f.batcher.add(payload)
+
+            self.on_gh_event(
+                topic, lazy=lazy, repository=repository, label=label, when=when
+            )(add)
+            f.listener = add.listener
+            return f
+
+        return decorator
+
+    def receivers(self, topic: str) -> Receivers:
+        """
+        Who would receive the topic, the listeners of its parents included.
+
+        The answer is cached until the next on_gh_event registration. The PyPubSub
+        listeners are unknown, with DISPATCH_PUBSUB every payload is decoded.
+        """
+        if config.DISPATCH_PUBSUB:
+            return Receivers.EAGER
+        receivers = self._receivers.get(topic)
+        if receivers is None:
+            receivers = self._receivers[topic] = self._find_receivers(topic)
+        return receivers
+
+    def known_event(self, event: Optional[str]) -> bool:
+        """
+        :param event: The X-GitHub-Event header
+        :return: True if it is a GitHub event, or a newer one the app listens to
+        """
+        if not valid_event(event):
+            return False
+        if event in GITHUB_EVENTS:
+            return True
+        return self.receivers(f"gh.{event}") is not Receivers.NONE
+
+    def _find_receivers(self, topic: str) -> Receivers:
+        receivers = Receivers.NONE
+        for listener in self.publisher.listeners(topic):
+            if not getattr(listener, "lazy_payload", False):
+                return Receivers.EAGER
+            receivers = Receivers.LAZY
+        return receivers
+
+
+def _call(topic: str, callback: Callable[[], None]):
+    callback()
+
 
 bp: GitHubAppBlueprint = GitHubAppBlueprint(__name__)
 
@@ -94,17 +407,29 @@ def register_callback():
 
 @bp.route("/events", methods=["POST"])
 def events():
-    if not webhook.verify(
-        bp.current_request.headers,
-        bp.current_request.raw_body.decode("utf-8"),
-        config.APP_WEBHOOK_SECRET,
-        events=["*"],
-    ):
+    if not bp.verifier.verify(bp.current_request.headers, bp.current_request.raw_body):
         raise ForbiddenError(
             f"Error validating the event: {bp.current_request.to_dict()}"
         )
 
     r: Request = bp.current_request
-    event_topic = r.headers["x-github-event"]
-    pub.sendMessage(f"gh.{event_topic}", payload=r.json_body)
+    if not valid_delivery(r.headers.get("x-github-delivery")):
+        raise BadRequestError("The X-GitHub-Delivery header is missing or invalid.")
+    event_topic = r.headers.get("x-github-event")
+    if not bp.known_event(event_topic):
+        raise BadRequestError("The X-GitHub-Event header is missing or unknown.")
+    try:
+        queued = bp.dispatch(
+            f"gh.{event_topic}", r.raw_body, r.headers.get("x-github-delivery")
+        )
+    except ValueError:
+        raise BadRequestError("The webhook body is not valid JSON.")
+    if not queued:
+        return Response(
+            body='{"error": "Too many webhooks are waiting to be processed."}',
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            headers={"Content-Type": "application/json", "Retry-After": "1"},
+        )
+    if config.DISPATCH_MODE != "sync":
+        return Response(body={}, status_code=HTTPStatus.ACCEPTED)
     return {}
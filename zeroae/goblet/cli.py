@@ -1,19 +1,55 @@
 """Console script for zeroae-goblet."""
 
+import os
 import sys
 
 import click
 
+from .worker import run_workers
 
-@click.command()
+
+@click.group()
 def goblet(args=None):
     """Console script for zeroae-goblet."""
-    # fmt: off
-    click.echo("Replace this message by putting your code into "
-               "goblet.cli.main")
-    click.echo("See click documentation at https://click.palletsprojects.com/")
-    # fmt: on
-    return 0
+
+
+@goblet.command()
+@click.option(
+    "-a",
+    "--app",
+    help="Module of the Chalice application, where the listeners are registered.",
+    default="app",
+    show_default=True,
+)
+@click.option(
+    "-q",
+    "--queue",
+    "queue_url",
+    help="URL of the ingress queue the /events route writes to.",
+    default="sqlite:///goblet-ingress.db",
+    show_default=True,
+    envvar="INGRESS_QUEUE_URL",
+)
+@click.option(
+    "-n",
+    "--processes",
+    help="Number of worker processes.",
+    default=os.cpu_count() or 1,
+    show_default=True,
+)
+def worker(app, queue_url, processes):
+    """
+    Runs the on_gh_event listeners of the deliveries in the ingress queue.
+
+    Requires DISPATCH_MODE=queue in the web application.
+    """
+    if queue_url.startswith("memory:"):
+        raise click.BadParameter(
+            "the memory queue is only shared by threads of the web process.",
+            param_hint="--queue",
+        )
+    click.echo(f"Starting {processes} workers on {queue_url}")
+    run_workers(app, queue_url, processes)
 
 
 if __name__ == "__main__":
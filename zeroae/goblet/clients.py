@@ -0,0 +1,230 @@
+"""Octokit clients shared between the handlers, over pooled connections per API host."""
+import copy
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Iterable, List
+from urllib.parse import urlparse
+
+import octokit
+import requests
+from requests.adapters import HTTPAdapter
+
+from .http_cache import AUTH_CONTEXT_HEADER, CachingAdapter, ResponseCache
+from .ratelimit import Priority, RateLimiter
+
+
+class PooledOctokit(octokit.Octokit):
+    """
+    An Octokit sending its requests through a shared ``requests.Session``.
+
+    Unlike Octokit, the path parameters are not remembered between calls, so that a
+    client can be used by several threads at once. The Authorization header is
+    asked to ``authorization`` on every request, i.e. from a token cache.
+
+    With a ``limiter``, the calls go through the rate limit budget of ``budget``;
+    a ``priority=Priority.BACKGROUND`` argument marks the calls that can wait.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        base_url: str,
+        authorization: Callable[[], str] = None,
+        limiter: RateLimiter = None,
+        budget: Hashable = None,
+        **kwargs,
+    ):
+        """
+        :param session: The session of the API host
+        :param base_url: The GitHub API url
+        :param authorization: Returns the Authorization header value
+        :param limiter: Paces the calls by their rate limit budget
+        :param budget: The auth context of the budget, i.e. the installation id
+        """
+        self.session = session
+        self.base_url = base_url
+        self.authorization = authorization
+        self.limiter = limiter
+        self.budget = budget
+        super().__init__(**kwargs)
+        self.headers["accept"] = "application/vnd.github.machine-man-preview+json"
+
+    def __deepcopy__(self, memo):
+        # Octokit copies the client into every response, the session is shared.
+        rv = copy.copy(self)
+        rv.headers = dict(self.headers)
+        rv._attribute_cache = copy.deepcopy(self._attribute_cache, memo)
+        return rv
+
+    def _create_method(self, name, definition, method, path):
+        def _api_call(*args, **kwargs):
+            method_headers = kwargs.pop("headers") if kwargs.get("headers") else {}
+            priority = kwargs.pop("priority", Priority.INTERACTIVE)
+            self.validate(kwargs, definition)
+            headers = self._get_headers(method_headers)
+            if self.authorization is not None:
+                headers["Authorization"] = self.authorization()
+            parameter_map = self._get_parameters(definition, method)
+            url, data_kwargs = self._form_url(kwargs, path, parameter_map)
+            requests_kwargs = self._data(data_kwargs, parameter_map, method)
+            if self.budget is not None and isinstance(
+                self.session.get_adapter(url), CachingAdapter
+            ):
+                headers[AUTH_CONTEXT_HEADER] = str(self.budget)
+
+            def send():
+                return self.session.request(
+                    method, url, headers=headers, **requests_kwargs
+                )
+
+            if self.limiter is not None:
+                _response = self.limiter.call(self.budget, url, send, priority)
+            else:
+                _response = send()
+            try:
+                attributes = _response.json()
+            except ValueError:
+                attributes = _response.text
+            new_self = copy.deepcopy(self)
+            setattr(new_self, "_response", _response)
+            setattr(new_self, "json", attributes)
+            setattr(new_self, "response", new_self._convert_to_object(attributes))
+            return new_self
+
+        _api_call.__name__ = name
+        _api_call.__doc__ = definition["description"]
+        return _api_call
+
+    def _form_url(self, values, _url, params):
+        data_values = {k: v for k, v in values.items() if params.get(k)}
+        for name, value in list(data_values.items()):
+            _url, subs = re.subn(fr"{{{name}}}", str(value), _url)
+            if subs != 0:
+                del data_values[name]
+        return f"{self.base_url}{_url}", data_values
+
+
+class ClientRegistry(object):
+    """
+    The PooledOctokit clients, per auth context (i.e. installation id).
+
+    The clients of a host share one session, with at most ``max_connections``
+    connections to it; the threads wait for a free connection beyond that. Clients
+    unused for ``idle_timeout`` seconds are evicted. With a ``cache``, the GET
+    requests are conditional on the validators of their cached response.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[Hashable, requests.Session], PooledOctokit],
+        max_connections: int = 10,
+        idle_timeout: float = 300.0,
+        cache: ResponseCache = None,
+        cache_exclude: Iterable[str] = (),
+        limiter: RateLimiter = None,
+    ):
+        """
+        :param factory: Creates the client of an auth context, given its session
+        :param max_connections: The maximum number of connections per API host
+        :param idle_timeout: Seconds before an unused client is evicted
+        :param cache: The responses served on 304 Not Modified, none if None
+        :param cache_exclude: The path globs never served from the cache
+        :param limiter: The rate limit budgets, given to the factory's clients
+        """
+        self.factory = factory
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.cache = cache
+        self.cache_exclude = tuple(cache_exclude)
+        self.limiter = limiter
+        self.counters = Counter()
+
+        self._clients: Dict[Hashable, List] = {}
+        self._sessions: Dict[str, requests.Session] = {}
+        self._swept = time.monotonic()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, base_url: str) -> PooledOctokit:
+        """
+        :param key: The auth context, i.e. an installation id or "app"
+        :param base_url: The GitHub API url
+        :return: The client of the auth context, created on first use
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._swept > self.idle_timeout / 2:
+                self._evict(now)
+            entry = self._clients.get((key, base_url))
+            if entry is not None:
+                entry[1] = now
+                self.counters["reused"] += 1
+                return entry[0]
+        # Creating a client takes a few ms, outside of the lock.
+        client = self.factory(key, self.session(base_url))
+        with self._lock:
+            entry = self._clients.setdefault((key, base_url), [client, now])
+            self.counters["created"] += 1
+        return entry[0]
+
+    def session(self, base_url: str) -> requests.Session:
+        """The session of the API host, created on first use."""
+        host = urlparse(base_url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = requests.Session()
+                pool = dict(
+                    pool_connections=1,
+                    pool_maxsize=self.max_connections,
+                    pool_block=True,
+                )
+                if self.cache is not None:
+                    adapter = CachingAdapter(self.cache, self.cache_exclude, **pool)
+                else:
+                    adapter = HTTPAdapter(**pool)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+        return session
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """The clients, and the statistics of the response cache and rate limits."""
+        with self._lock:
+            stats = {
+                "created": 0,
+                "reused": 0,
+                "evicted": 0,
+                **self.counters,
+                "clients": len(self._clients),
+                "sessions": len(self._sessions),
+            }
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats
+        if self.limiter is not None:
+            stats["ratelimit"] = self.limiter.stats
+        return stats
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+            self._clients.clear()
+        for session in sessions.values():
+            session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _evict(self, now: float):
+        self._swept = now
+        idle = [
+            k
+            for k, (_, used) in self._clients.items()
+            if now - used > self.idle_timeout
+        ]
+        for k in idle:
+            del self._clients[k]
+        self.counters["evicted"] += len(idle)
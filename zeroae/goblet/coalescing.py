@@ -0,0 +1,123 @@
+"""Debounces the webhooks of a topic per key, only the newest one is published."""
+import functools
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .timers import Timer, TimerQueue
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending(object):
+    def __init__(self, first: float):
+        self.first = first
+        self.generation = 0
+        self.topic: str = None
+        self.payload: Any = None
+        self.timer: Optional[Timer] = None
+
+
+class Coalescer(object):
+    """
+    Holds the newest payload of every key until no other came for ``window`` seconds.
+
+    The older payloads of the key are dropped (coalesced). With ``max_wait``, a key
+    kept busy is still published that long after its first pending payload.
+    Payloads without a key are published right away.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str, Any], None],
+        key: Callable[[Any], Optional[Hashable]],
+        timers: TimerQueue,
+        window: float = 5.0,
+        max_wait: float = None,
+    ):
+        """
+        :param publish: Called with the topic and payload to publish
+        :param key: The key of a payload, i.e. its repository and ref
+        :param timers: Runs the publications
+        :param window: Seconds without a newer payload before publishing
+        :param max_wait: The maximum seconds a key stays pending, no limit if None
+        """
+        self.publish = publish
+        self.key = key
+        self.timers = timers
+        self.window = window
+        self.max_wait = max_wait
+        self.counters = Counter()
+
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._lock = threading.Lock()
+
+    def add(self, topic: str, payload: Any):
+        try:
+            key = self.key(payload)
+        except (KeyError, TypeError):
+            key = None
+        if key is None:
+            self._count("uncoalesced")
+            self.publish(topic, payload)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Pending(now)
+            else:
+                pending.timer.cancel()
+                self.counters["coalesced"] += 1
+            pending.generation += 1
+            pending.topic, pending.payload = topic, payload
+            delay = self.window
+            if self.max_wait is not None:
+                delay = min(delay, pending.first + self.max_wait - now)
+            expire = functools.partial(self._expire, key, pending.generation)
+            pending.timer = self.timers.call_later(delay, expire)
+
+    def flush(self):
+        """Publishes every pending payload, i.e. on shutdown."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for p in pending.values():
+            p.timer.cancel()
+            self._publish(p)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """The coalesced (dropped), published and pending payloads."""
+        with self._lock:
+            return {
+                "coalesced": 0,
+                "published": 0,
+                **self.counters,
+                "pending": len(self._pending),
+            }
+
+    def _expire(self, key: Hashable, generation: int):
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or pending.generation != generation:
+                # A newer payload came in, or it was flushed.
+                return
+            del self._pending[key]
+        self._publish(pending)
+
+    def _publish(self, pending: _Pending):
+        self._count("published")
+        try:
+            self.publish(pending.topic, pending.payload)
+        except Exception:
+            logger.exception(f"Unhandled error while publishing {pending.topic}")
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
@@ -26,6 +26,13 @@ GHE_HOST = None
 GHE_PROTO = None
 GHE_API_URL = None
 GHE_API_SPEC = None
+GHE_MAX_CONNECTIONS = None
+GHE_CLIENT_IDLE_TIMEOUT = None
+GHE_CACHE_MAX_BYTES = None
+GHE_CACHE_PATH = None
+GHE_CACHE_EXCLUDE = None
+GHE_RATELIMIT_RESERVE = None
+GHE_RATELIMIT_MAX_WAIT = None
 
 # GitHub Application Manifest Config
 APP_NAME = None
@@ -41,6 +48,20 @@ APP_CLIENT_ID = None
 APP_CLIENT_SECRET = None
 APP_PEM = None
 APP_WEBHOOK_SECRET = None
+APP_WEBHOOK_SECRETS = None
+
+# Webhook Dispatch Config
+DISPATCH_MODE = None
+DISPATCH_WORKERS = None
+DISPATCH_QUEUE_SIZE = None
+DISPATCH_PUBSUB = None
+DISPATCH_TENANT_QUEUE_SIZE = None
+DISPATCH_TENANT_CONCURRENCY = None
+DISPATCH_TENANT_WEIGHTS = None
+INGRESS_QUEUE_URL = None
+DELIVERY_CACHE_URL = None
+DELIVERY_CACHE_SIZE = None
+DELIVERY_CACHE_TTL = None
 
 # Other Options
 WEBHOOK_PROXY_URL = None
@@ -50,6 +71,7 @@ def configure(env: Env):
     _load_ghe_options(env)
     _load_app_options(env)
     _load_app_registration_options(env)
+    _load_dispatch_options(env)
     _load_other_options(env)
 
 
@@ -58,8 +80,45 @@ def _load_other_options(env: Env):
     WEBHOOK_PROXY_URL = env.url("WEBHOOK_PROXY_URL", None)
 
 
+def _load_dispatch_options(env: Env):
+    global DISPATCH_MODE, DISPATCH_WORKERS, DISPATCH_QUEUE_SIZE, INGRESS_QUEUE_URL
+    global DISPATCH_PUBSUB, DISPATCH_TENANT_QUEUE_SIZE, DISPATCH_TENANT_CONCURRENCY
+    global DISPATCH_TENANT_WEIGHTS
+    with env.prefixed("DISPATCH_"):
+        DISPATCH_MODE = env.str(
+            "MODE",
+            "sync",
+            validate=OneOf(
+                ["sync", "async", "queue"],
+                error="DISPATCH_MODE must be one of: {choices}",
+            ),
+        )
+        DISPATCH_WORKERS = env.int("WORKERS", 4)
+        DISPATCH_QUEUE_SIZE = env.int("QUEUE_SIZE", 1000)
+        # Also publish the webhooks to PyPubSub, for the pub.subscribe listeners.
+        DISPATCH_PUBSUB = env.bool("PUBSUB", False)
+        # The fair share of the async workers per installation, 0 is no limit.
+        with env.prefixed("TENANT_"):
+            DISPATCH_TENANT_QUEUE_SIZE = env.int("QUEUE_SIZE", 0)
+            DISPATCH_TENANT_CONCURRENCY = env.int("CONCURRENCY", 0)
+            DISPATCH_TENANT_WEIGHTS = env.dict(
+                "WEIGHTS", {}, subcast_keys=int, subcast_values=float
+            )
+    INGRESS_QUEUE_URL = env.str("INGRESS_QUEUE_URL", "sqlite:///goblet-ingress.db")
+
+    # Redeliveries are skipped, an empty DELIVERY_CACHE_URL disables the cache.
+    global DELIVERY_CACHE_URL, DELIVERY_CACHE_SIZE, DELIVERY_CACHE_TTL
+    with env.prefixed("DELIVERY_CACHE_"):
+        DELIVERY_CACHE_URL = env.str("URL", "memory://")
+        DELIVERY_CACHE_SIZE = env.int("SIZE", 10000)
+        DELIVERY_CACHE_TTL = env.float("TTL", 3600.0)
+
+
 def _load_ghe_options(env: Env):
     global GHE_HOST, GHE_PROTO, GHE_API_URL, GHE_API_SPEC
+    global GHE_MAX_CONNECTIONS, GHE_CLIENT_IDLE_TIMEOUT
+    global GHE_CACHE_MAX_BYTES, GHE_CACHE_PATH, GHE_CACHE_EXCLUDE
+    global GHE_RATELIMIT_RESERVE, GHE_RATELIMIT_MAX_WAIT
     with env.prefixed("GHE_"):
         GHE_API_SPEC = env.str(
             "API_SPEC",
@@ -82,6 +141,20 @@ def _load_ghe_options(env: Env):
             )
             GHE_HOST = env.str("HOST")
             GHE_API_URL = env.url("GHE_API_URL", f"{GHE_PROTO}://{GHE_HOST}/api/v3")
+        # The shared Octokit clients, at most MAX_CONNECTIONS to the API host.
+        GHE_MAX_CONNECTIONS = env.int("MAX_CONNECTIONS", 10)
+        GHE_CLIENT_IDLE_TIMEOUT = env.float("CLIENT_IDLE_TIMEOUT", 300.0)
+        # The GET responses revalidated with their ETag, a CACHE_MAX_BYTES of 0
+        # disables the cache, a CACHE_PATH also keeps them in a SQLite database.
+        with env.prefixed("CACHE_"):
+            GHE_CACHE_MAX_BYTES = env.int("MAX_BYTES", 32 << 20)
+            GHE_CACHE_PATH = env.str("PATH", "")
+            GHE_CACHE_EXCLUDE = env.list("EXCLUDE", [])
+        # The share of the rate limit the background calls leave to the others, and
+        # the longest a call waits for its budget.
+        with env.prefixed("RATELIMIT_"):
+            GHE_RATELIMIT_RESERVE = env.float("RESERVE", 0.1)
+            GHE_RATELIMIT_MAX_WAIT = env.float("MAX_WAIT", 60.0)
 
 
 def _load_app_options(env: Env):
@@ -114,12 +187,15 @@ def _load_app_registration_options(env: Env):
     :return:
     """
     global APP_ID, APP_CLIENT_ID, APP_CLIENT_SECRET, APP_PEM, APP_WEBHOOK_SECRET
+    global APP_WEBHOOK_SECRETS
     with env.prefixed("APP_"):
         APP_ID = env.str("ID", None)
         APP_CLIENT_ID = env.str("CLIENT_ID", None)
         APP_CLIENT_SECRET = env.str("CLIENT_SECRET", None)
         APP_PEM = env.str("PEM", None)
         APP_WEBHOOK_SECRET = env.str("WEBHOOK_SECRET", None)
+        # Extra secrets accepted while the webhook secret is rotated.
+        APP_WEBHOOK_SECRETS = env.list("WEBHOOK_SECRETS", [])
 
 
 def save_app_registration(registration: Dict):
@@ -0,0 +1,204 @@
+"""Caches of the X-GitHub-Delivery ids already seen, to skip GitHub's redeliveries."""
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Callable, Dict
+from urllib.parse import urlparse
+
+import entrypoints
+
+#: The entry point group of third-party backends, a factory taking the cache URL.
+BACKENDS_GROUP = "zeroae.goblet.deliveries"
+
+
+class DeliveryCache(ABC):
+    """
+    A bounded set of delivery ids, each forgotten ``ttl`` seconds after it was added.
+
+    Hits are the deliveries seen before (the duplicates), misses the new ones.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600.0):
+        """
+        :param max_size: The maximum number of ids, the oldest are evicted first
+        :param ttl: Seconds to remember an id for
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def seen(self, delivery_id: str) -> bool:
+        """
+        Adds the delivery id to the cache, in a single atomic step.
+
+        :return: True if the id was already in the cache
+        """
+        hit = self._add(delivery_id, time.time())
+        with self._lock:
+            self.counters["hits" if hit else "misses"] += 1
+        return hit
+
+    @abstractmethod
+    def _add(self, delivery_id: str, now: float) -> bool:
+        pass
+
+    @abstractmethod
+    def forget(self, delivery_id: str):
+        """Removes the id, i.e. the delivery failed and GitHub's retry is welcome."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """The hit and miss counters, the hit ratio and the cache size."""
+        with self._lock:
+            stats = {"hits": 0, "misses": 0, **self.counters}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["size"] = len(self)
+        return stats
+
+    def close(self):
+        pass
+
+
+class MemoryDeliveryCache(DeliveryCache):
+    """An in-process LRU cache, duplicates sent to other processes are not detected."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600.0):
+        super().__init__(max_size, ttl)
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+
+    def _add(self, delivery_id: str, now: float) -> bool:
+        with self._lock:
+            expires = self._expires.get(delivery_id)
+            if expires is not None and expires > now:
+                self._expires.move_to_end(delivery_id)
+                return True
+            self._expires[delivery_id] = now + self.ttl
+            self._expires.move_to_end(delivery_id)
+            self._evict(now)
+        return False
+
+    def _evict(self, now: float):
+        while self._expires:
+            delivery_id, expires = next(iter(self._expires.items()))
+            if expires > now and len(self._expires) <= self.max_size:
+                return
+            del self._expires[delivery_id]
+            self.counters["evicted" if expires > now else "expired"] += 1
+
+    def forget(self, delivery_id: str):
+        with self._lock:
+            self._expires.pop(delivery_id, None)
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+
+class SQLiteDeliveryCache(DeliveryCache):
+    """
+    A cache in a SQLite database (in WAL mode), shared by the local processes.
+
+    The expired and the excess ids are pruned every ``prune_interval`` additions.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 100000,
+        ttl: float = 3600.0,
+        prune_interval: int = 1000,
+    ):
+        super().__init__(max_size, ttl)
+        self.path = path
+        self.prune_interval = prune_interval
+        self._added = 0
+
+        self._db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            " id TEXT PRIMARY KEY, expires_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS deliveries_expires_at ON deliveries (expires_at)"
+        )
+
+    def _add(self, delivery_id: str, now: float) -> bool:
+        with self._lock:
+            # Inserts a new id, or revives an expired one; a live id is left alone.
+            added = self._db.execute(
+                "INSERT INTO deliveries (id, expires_at) VALUES (?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET expires_at = excluded.expires_at"
+                " WHERE deliveries.expires_at <= ?",
+                (delivery_id, now + self.ttl, now),
+            ).rowcount
+            if added:
+                self._added += 1
+                if self._added % self.prune_interval == 0:
+                    self._prune(now)
+        return not added
+
+    def _prune(self, now: float):
+        expired = self._db.execute(
+            "DELETE FROM deliveries WHERE expires_at <= ?", (now,)
+        ).rowcount
+        excess = self._count() - self.max_size
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM deliveries WHERE id IN"
+                " (SELECT id FROM deliveries ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            )
+            self.counters["evicted"] += excess
+        self.counters["expired"] += expired
+
+    def forget(self, delivery_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM deliveries WHERE id = ?", (delivery_id,))
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_cache(url: str, max_size: int = 10000, ttl: float = 3600.0) -> DeliveryCache:
+    """
+    Opens the delivery cache at the URL.
+
+    - ``memory://``, an in-process cache.
+    - ``sqlite:///relative/path.db`` or ``sqlite:////absolute/path.db``.
+    - Any other scheme registered in the ``zeroae.goblet.deliveries`` entry point group.
+
+    :param url: The cache URL, i.e. config.DELIVERY_CACHE_URL
+    :param max_size: The maximum number of delivery ids
+    :param ttl: Seconds to remember a delivery id for
+    """
+    u = urlparse(url)
+    if u.scheme == "memory":
+        return MemoryDeliveryCache(max_size, ttl)
+    if u.scheme == "sqlite":
+        return SQLiteDeliveryCache(url.split("sqlite:///", 1)[1], max_size, ttl)
+    try:
+        factory: Callable[..., DeliveryCache] = entrypoints.get_single(
+            BACKENDS_GROUP, u.scheme
+        ).load()
+    except entrypoints.NoSuchEntryPoint:
+        raise ValueError(f"Unknown delivery cache backend: {u.scheme}")
+    return factory(url, max_size=max_size, ttl=ttl)
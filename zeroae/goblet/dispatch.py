@@ -0,0 +1,141 @@
+"""Bounded worker pool running the webhook listeners outside of the HTTP request."""
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List, Mapping
+
+from zeroae.smee.metrics import LatencyStats
+
+from .scheduling import FairQueue
+
+logger = logging.getLogger(__name__)
+
+
+class Dispatcher(object):
+    """
+    Publishes the webhooks from a bounded queue, on a pool of worker threads.
+
+    The webhooks are queued per tenant (installation), and the tenants are served in
+    turn, so that one of them flooding the queue does not starve the others. The
+    workers are started on the first submit. Not suitable for AWS Lambda, where
+    the process is frozen as soon as the response is returned.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str, Any], None],
+        workers: int = 4,
+        queue_size: int = 1000,
+        tenant_queue_size: int = 0,
+        tenant_concurrency: int = 0,
+        tenant_weights: Mapping[Hashable, float] = None,
+    ):
+        """
+        :param publish: Called with the topic and payload of every submitted webhook
+        :param workers: The number of worker threads
+        :param queue_size: The maximum number of webhooks waiting for a worker
+        :param tenant_queue_size: The maximum number of webhooks waiting per tenant
+        :param tenant_concurrency: The maximum number of workers busy with a tenant
+        :param tenant_weights: The share of the workers per tenant, relative to 1
+        """
+        self.publish = publish
+        self.workers = workers
+        self.counters = Counter()
+        self.wait = LatencyStats()
+        self.latency = LatencyStats()
+
+        self._queue = FairQueue(
+            queue_size, tenant_queue_size, tenant_concurrency, tenant_weights
+        )
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def submit(
+        self,
+        topic: str,
+        payload: Any,
+        tenant: Hashable = None,
+        publish: Callable[[str, Any], Any] = None,
+    ) -> bool:
+        """
+        Queues the webhook without blocking.
+
+        :param tenant: The installation id of the webhook
+        :param publish: Called instead of :attr:`publish`, i.e. by the timer flushes
+        :return: False if the queue, or the tenant queue, is full
+        """
+        self._start()
+        item = (time.perf_counter(), topic, payload, publish or self.publish)
+        try:
+            self._queue.put(item, tenant)
+        except queue.Full:
+            self._count("rejected")
+            return False
+        self._count("submitted")
+        return True
+
+    def join(self):
+        """Waits until every submitted webhook was published."""
+        self._queue.join()
+
+    def shutdown(self, wait: bool = True):
+        """Stops the workers, after the queued webhooks were published if ``wait``."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if wait:
+            self._queue.join()
+        for _ in threads:
+            self._queue.put((0.0, None, None, None), force=True)
+        for t in threads:
+            t.join()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Queue depth, counters, and the queue wait and handler latencies (seconds)."""
+        with self._lock:
+            stats = dict(self.counters, queued=self._queue.qsize())
+        stats.update({f"wait_{k}": v for k, v in self.wait.stats.items()})
+        stats.update({f"latency_{k}": v for k, v in self.latency.stats.items()})
+        return stats
+
+    @property
+    def tenants(self) -> Dict[Hashable, Dict[str, int]]:
+        """The queued, running and served webhooks per tenant."""
+        return self._queue.tenants
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _start(self):
+        if self._threads:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(
+                    target=self._run,
+                    name=f"goblet-dispatch-{len(self._threads)}",
+                    daemon=True,
+                )
+                t.start()
+                self._threads.append(t)
+
+    def _run(self):
+        while True:
+            tenant, (submitted, topic, payload, publish) = self._queue.get()
+            if topic is None:
+                self._queue.task_done(tenant)
+                return
+            start = time.perf_counter()
+            self.wait.record(start - submitted)
+            try:
+                publish(topic, payload)
+                self._count("published")
+            except Exception:
+                logger.exception(f"Unhandled error while publishing {topic}")
+                self._count("failed")
+            finally:
+                self.latency.record(time.perf_counter() - start)
+                self._queue.task_done(tenant)
@@ -0,0 +1,248 @@
+"""Conditional requests (ETag / Last-Modified) for the GitHub API reads."""
+import fnmatch
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+#: The auth context of a request (i.e. its installation id), set by the PooledOctokit
+#: clients; the cached responses are kept apart per context. It is not sent.
+AUTH_CONTEXT_HEADER = "X-Goblet-Auth-Context"
+
+#: Not replayed from the cache, the body was already decoded by requests.
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+@dataclass
+class CachedResponse:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    headers: Dict[str, str]
+    body: bytes
+
+    def __len__(self) -> int:
+        return len(self.body)
+
+
+class ResponseCache(object):
+    """
+    The validated responses, in a memory LRU bounded to ``max_bytes`` of bodies.
+
+    With a ``path``, the responses are also kept in a SQLite database, shared by the
+    local processes and surviving their restarts, bounded to ``max_disk_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 << 20,
+        path: str = None,
+        max_disk_bytes: int = 256 << 20,
+    ):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.counters = Counter()
+
+        self._memory: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(
+                path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,"
+                " headers TEXT NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL,"
+                " used_at INTEGER NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)"
+            )
+            self._disk_writes = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT etag, last_modified, headers, body FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.counters["disk_reads"] += 1
+            entry = CachedResponse(row[0], row[1], json.loads(row[2]), bytes(row[3]))
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?,"
+                    " (SELECT COALESCE(MAX(used_at), 0) + 1 FROM responses))",
+                    (
+                        key,
+                        entry.etag,
+                        entry.last_modified,
+                        json.dumps(entry.headers),
+                        entry.body,
+                        len(entry),
+                    ),
+                )
+                self._disk_writes += 1
+                if self._disk_writes % 100 == 0:
+                    self._prune_disk()
+
+    def count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """The hits (304) and misses, the hit ratio and the memory tier size."""
+        with self._lock:
+            stats = {"hits": 0, "misses": 0, **self.counters}
+            stats.update(entries=len(self._memory), bytes=self._bytes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, entry: CachedResponse):
+        if len(entry) > self.max_bytes:
+            return
+        self._memory[key] = entry
+        self._bytes += len(entry)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.counters["evicted"] += 1
+
+    def _prune_disk(self):
+        total = self._db.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+        while total and total > self.max_disk_bytes:
+            # Drops the least recently stored tenth of the responses.
+            rows = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY used_at"
+                " LIMIT (SELECT COUNT(*) / 10 + 1 FROM responses)"
+            ).fetchall()
+            self._db.executemany(
+                "DELETE FROM responses WHERE key = ?", [(k,) for k, _ in rows]
+            )
+            total -= sum(size for _, size in rows)
+            self.counters["disk_evicted"] += len(rows)
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    Sends the GET requests with the validators of their cached response, and serves
+    the cached body when GitHub answers 304 Not Modified (not counted against the
+    rate limit).
+
+    The responses are cached per auth context, the AUTH_CONTEXT_HEADER of the request
+    or else a digest of its Authorization header, and GitHub varies the validators
+    with the Authorization header too, so a cached body is only served after GitHub
+    validated it for the current credentials. The requests
+    with a ``Cache-Control: no-cache`` header, or to a path matching one of the
+    ``exclude`` globs (i.e. ``/repos/*/*/contents/*``), are not cached.
+    """
+
+    def __init__(self, cache: ResponseCache, exclude: Iterable[str] = (), **kwargs):
+        self.cache = cache
+        self.exclude = tuple(exclude)
+        super().__init__(**kwargs)
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        context = request.headers.pop(AUTH_CONTEXT_HEADER, None)
+        if request.method != "GET" or kwargs.get("stream") or self._excluded(request):
+            return super().send(request, **kwargs)
+
+        key = self._key(request, context)
+        entry = self.cache.get(key)
+        if entry is not None:
+            if entry.etag:
+                request.headers.setdefault("If-None-Match", entry.etag)
+            elif entry.last_modified:
+                request.headers.setdefault("If-Modified-Since", entry.last_modified)
+
+        response = super().send(request, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            # The (empty) body is read, the connection goes back to the pool.
+            response.content
+            response.close()
+            self.cache.count("hits")
+            return self._cached_response(request, response, entry)
+        self.cache.count("misses")
+        if response.status_code == 200:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                headers = {
+                    k: v
+                    for k, v in response.headers.items()
+                    if k.lower() not in _DROPPED_HEADERS
+                }
+                self.cache.put(
+                    key, CachedResponse(etag, last_modified, headers, response.content)
+                )
+        return response
+
+    def _excluded(self, request: PreparedRequest) -> bool:
+        if "no-cache" in request.headers.get("Cache-Control", ""):
+            return True
+        path = urlparse(request.url).path
+        return any(fnmatch.fnmatchcase(path, pattern) for pattern in self.exclude)
+
+    @staticmethod
+    def _key(request: PreparedRequest, context: Optional[str]) -> str:
+        if context is None:
+            authorization = request.headers.get("Authorization", "").encode("utf-8")
+            context = hashlib.sha256(authorization).hexdigest()[:16]
+        return f"{context} {request.headers.get('Accept', '')} {request.url}"
+
+    def _cached_response(
+        self, request: PreparedRequest, response: Response, entry: CachedResponse
+    ) -> Response:
+        cached = Response()
+        cached.status_code = 200
+        cached.reason = "OK"
+        # The 304 headers are fresher, i.e. the rate limit ones.
+        cached.headers = CaseInsensitiveDict(entry.headers)
+        for k, v in response.headers.items():
+            if k.lower() not in _DROPPED_HEADERS:
+                cached.headers[k] = v
+        cached._content = entry.body
+        cached.encoding = get_encoding_from_headers(cached.headers)
+        cached.url = response.url
+        cached.request = request
+        cached.connection = self
+        cached.elapsed = response.elapsed
+        cached.from_cache = True
+        return cached
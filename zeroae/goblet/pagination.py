@@ -0,0 +1,115 @@
+"""Lazily iterates over the items of the GitHub API list endpoints."""
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import octokit
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def next_page(response: octokit.Octokit) -> Optional[int]:
+    """The page number of the Link rel="next" of an Octokit response, if any."""
+    link = response._response.links.get("next")
+    if link is None:
+        return None
+    page = parse_qs(urlparse(link["url"]).query).get("page")
+    if page is None:
+        logger.warning(f"Stopped at {link['url']}, it is not page-numbered.")
+        return None
+    return int(page[0])
+
+
+def page_items(body: Any) -> List[Any]:
+    """
+    The items of a page, also of the endpoints wrapping them with their total_count.
+
+    i.e. {"total_count": 2, "repositories": [...]}
+    """
+    if isinstance(body, list):
+        return body
+    lists = [v for v in body.values() if isinstance(v, list)]
+    if len(lists) != 1:
+        raise ValueError(f"The page has no single list of items: {list(body)}.")
+    return lists[0]
+
+
+def paginate(
+    method: Callable[..., octokit.Octokit],
+    max_items: int = None,
+    per_page: int = 100,
+    prefetch: int = 1,
+    **kwargs,
+) -> Iterator[Any]:
+    """
+    Yields the items of a list endpoint as they arrive, following its Link headers.
+
+    The next pages are requested in a background thread while the current one is
+    consumed, at most ``prefetch`` pages ahead, so only those are held in memory.
+    Closing the generator, i.e. breaking out of the loop, stops the requests.
+
+    The standalone Octokit clients remember the last path parameters, they must not
+    be used by other threads during the iteration; the PooledOctokit ones can.
+
+    :param method: The Octokit list method, i.e. ``octokit.apps.list_repos``
+    :param max_items: Stop after that many items, no limit if None
+    :param per_page: The items per request, GitHub allows up to 100
+    :param prefetch: The number of pages requested ahead of the consumer
+    :param kwargs: The parameters of the method, i.e. ``owner`` and ``repo``
+    :return: The items, i.e. the decoded repository objects
+    """
+    if max_items is not None:
+        if max_items <= 0:
+            return
+        per_page = min(per_page, max_items)
+    pages: "queue.Queue[Tuple[Any, Any]]" = queue.Queue(maxsize=max(prefetch, 1))
+    stop = threading.Event()
+
+    def put(kind, value):
+        while not stop.is_set():
+            try:
+                pages.put((kind, value), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch():
+        page, fetched = 1, 0
+        try:
+            while page is not None and not stop.is_set():
+                response = method(page=page, per_page=per_page, **kwargs)
+                response._response.raise_for_status()
+                items = page_items(response.json)
+                fetched += len(items)
+                page = next_page(response)
+                if max_items is not None and fetched >= max_items:
+                    page = None
+                if not put("items", items):
+                    return
+            put("done", _DONE)
+        except Exception as e:
+            put("error", e)
+
+    fetcher = threading.Thread(target=fetch, name="goblet-paginate", daemon=True)
+    fetcher.start()
+    remaining = max_items
+    try:
+        while True:
+            kind, value = pages.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            if remaining is not None:
+                value = value[:remaining]
+                remaining -= len(value)
+            yield from value
+            if remaining == 0:
+                return
+    finally:
+        stop.set()
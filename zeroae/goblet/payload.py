@@ -0,0 +1,53 @@
+"""Webhook payloads decoded on demand, for listeners that may not read them."""
+import json
+from collections.abc import Mapping
+from enum import Enum
+from typing import Any, Iterator
+
+
+class Receivers(Enum):
+    """Who would receive a webhook topic, see GitHubAppBlueprint.receivers."""
+
+    #: No listener, the webhook does not even need to be decoded.
+    NONE = 0
+    #: Only listeners accepting a LazyPayload.
+    LAZY = 1
+    #: At least one listener expecting a dict.
+    EAGER = 2
+
+
+class LazyPayload(Mapping):
+    """
+    A read-only webhook payload, the body is only decoded on first access.
+
+    :attr:`raw` gives the listeners the undecoded body, i.e. to forward it as is.
+    """
+
+    __slots__ = ("raw", "_data")
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self._data = None
+
+    @property
+    def decoded(self) -> bool:
+        return self._data is not None
+
+    def _decode(self) -> dict:
+        if self._data is None:
+            self._data = json.loads(self.raw)
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self._decode()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._decode())
+
+    def __len__(self) -> int:
+        return len(self._decode())
+
+    def __repr__(self) -> str:
+        if self._data is None:
+            return f"LazyPayload(<{len(self.raw)} bytes>)"
+        return f"LazyPayload({self._data!r})"
@@ -0,0 +1,76 @@
+"""The listeners of the webhook topics, called without PyPubSub on the hot path."""
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+Listener = Callable[[Any], None]
+
+
+class Publisher(object):
+    """
+    Sends the payloads to the listeners of a topic, and of its parent topics.
+
+    Topics are dotted names, i.e. ``gh.pull_request.opened`` is sent to the
+    listeners of ``gh.pull_request.opened``, ``gh.pull_request`` and ``gh``, in
+    that order. The listener tuple of every topic is computed once, until the next
+    subscription. A listener raising does not keep the others from the payload.
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self._listeners: Dict[str, List[Listener]] = {}
+        self._table: Dict[str, Tuple[Listener, ...]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Listener, topic: str):
+        with self._lock:
+            listeners = self._listeners.setdefault(topic, [])
+            if listener not in listeners:
+                listeners.append(listener)
+            self._table = {}
+
+    def unsubscribe(self, listener: Listener, topic: str):
+        with self._lock:
+            listeners = self._listeners.get(topic, [])
+            if listener in listeners:
+                listeners.remove(listener)
+            self._table = {}
+
+    def listeners(self, topic: str) -> Tuple[Listener, ...]:
+        """The listeners of the topic, and of its parent topics."""
+        listeners = self._table.get(topic)
+        if listeners is None:
+            with self._lock:
+                listeners = []
+                names = topic.split(".")
+                for i in range(len(names), 0, -1):
+                    listeners.extend(self._listeners.get(".".join(names[:i]), []))
+                listeners = self._table[topic] = tuple(listeners)
+        return listeners
+
+    def send(self, topic: str, payload: Any) -> int:
+        """
+        Calls the listeners of the topic with the payload.
+
+        :return: The number of listeners that raised
+        """
+        failed = 0
+        for listener in self.listeners(topic):
+            try:
+                listener(payload)
+            except Exception:
+                logger.exception(f"Unhandled error in {listener!r} for {topic}")
+                failed += 1
+        with self._lock:
+            self.counters["sent"] += 1
+            if failed:
+                self.counters["failed"] += failed
+        return failed
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sent": 0, "failed": 0, **self.counters}
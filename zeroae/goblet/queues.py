@@ -0,0 +1,270 @@
+"""Ingress queues, where /events leaves verified deliveries for the goblet workers."""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import entrypoints
+
+logger = logging.getLogger(__name__)
+
+#: The entry point group of third-party backends, a factory taking the queue URL.
+BACKENDS_GROUP = "zeroae.goblet.queues"
+
+
+@dataclass
+class Delivery:
+    id: str
+    topic: str
+    body: bytes
+    receipt: Any = None
+    attempts: int = 0
+
+
+class IngressQueue(ABC):
+    """
+    A queue of verified webhook deliveries.
+
+    Deliveries returned by ``get`` are hidden from the other consumers until they
+    are acknowledged (deleted) with ``ack``, or given back with ``nack``. A local
+    SQS stand-in, for example, implements these with ``ReceiveMessage``,
+    ``DeleteMessage`` and ``ChangeMessageVisibility``.
+    """
+
+    @abstractmethod
+    def put(self, delivery: Delivery) -> bool:
+        """
+        :return: False if the queue is full
+        """
+
+    @abstractmethod
+    def get(self, timeout: float = None) -> Optional[Delivery]:
+        """
+        :param timeout: Seconds to wait for a delivery, forever if None
+        :return: The oldest visible delivery, or None on timeout
+        """
+
+    @abstractmethod
+    def ack(self, delivery: Delivery):
+        """Deletes the delivery, it was processed."""
+
+    @abstractmethod
+    def nack(self, delivery: Delivery):
+        """Makes the delivery visible again, to be retried."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """The number of deliveries in the queue, including the hidden ones."""
+
+    def close(self):
+        pass
+
+
+class MemoryQueue(IngressQueue):
+    """
+    A bounded in-process queue, its workers must be threads of the web process.
+
+    Deliveries given back with ``nack`` are retried up to ``max_attempts`` times.
+    """
+
+    def __init__(self, max_size: int = 0, max_attempts: int = 5):
+        self.max_attempts = max_attempts
+        self._queue: "queue.Queue[Delivery]" = queue.Queue(max_size)
+        self._hidden = 0
+        self._lock = threading.Lock()
+
+    def put(self, delivery: Delivery) -> bool:
+        try:
+            self._queue.put_nowait(delivery)
+        except queue.Full:
+            return False
+        return True
+
+    def get(self, timeout: float = None) -> Optional[Delivery]:
+        try:
+            delivery = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._lock:
+            self._hidden += 1
+        delivery.attempts += 1
+        return delivery
+
+    def ack(self, delivery: Delivery):
+        with self._lock:
+            self._hidden -= 1
+
+    def nack(self, delivery: Delivery):
+        self.ack(delivery)
+        if delivery.attempts >= self.max_attempts:
+            _dropped(delivery, f"after {delivery.attempts} attempts")
+            return
+        try:
+            # Never blocks, the caller is the worker that would empty the queue.
+            self._queue.put_nowait(delivery)
+        except queue.Full:
+            _dropped(delivery, "the queue is full")
+
+    def __len__(self) -> int:
+        return self._queue.qsize() + self._hidden
+
+
+class SQLiteQueue(IngressQueue):
+    """
+    A durable queue in a SQLite database (in WAL mode), shared by local processes.
+
+    Deliveries that were not acknowledged within ``visibility_timeout`` seconds (the
+    worker died) are delivered again, up to ``max_attempts`` times.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 0,
+        visibility_timeout: float = 300.0,
+        max_attempts: int = 5,
+        poll_interval: float = 0.5,
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " id TEXT, topic TEXT NOT NULL, body BLOB NOT NULL,"
+            " visible_at REAL NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS deliveries_visible_at"
+            " ON deliveries (visible_at, seq)"
+        )
+
+    def put(self, delivery: Delivery) -> bool:
+        with self._lock:
+            if self.max_size and self._count() >= self.max_size:
+                return False
+            self._db.execute(
+                "INSERT INTO deliveries (id, topic, body) VALUES (?, ?, ?)",
+                (delivery.id, delivery.topic, delivery.body),
+            )
+        return True
+
+    def get(self, timeout: float = None) -> Optional[Delivery]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delivery = self._receive()
+            if delivery is not None:
+                return delivery
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                time.sleep(min(self.poll_interval, remaining))
+            else:
+                time.sleep(self.poll_interval)
+
+    def _receive(self) -> Optional[Delivery]:
+        now = time.time()
+        poisoned = []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._db.execute(
+                        "SELECT seq, id, topic, body, attempts FROM deliveries"
+                        " WHERE visible_at <= ? ORDER BY seq LIMIT 1",
+                        (now,),
+                    ).fetchone()
+                    if row is None or row[4] < self.max_attempts:
+                        break
+                    # Its workers kept dying (i.e. it crashes them), drop it.
+                    self._db.execute("DELETE FROM deliveries WHERE seq = ?", (row[0],))
+                    poisoned.append(row)
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE deliveries SET visible_at = ?, attempts = attempts + 1"
+                        " WHERE seq = ?",
+                        (now + self.visibility_timeout, row[0]),
+                    )
+            finally:
+                self._db.execute("COMMIT")
+        for seq, delivery_id, topic, _, attempts in poisoned:
+            delivery = Delivery(delivery_id, topic, b"", seq, attempts)
+            _dropped(delivery, f"after {attempts} attempts")
+        if row is None:
+            return None
+        seq, delivery_id, topic, body, attempts = row
+        return Delivery(delivery_id, topic, bytes(body), seq, attempts + 1)
+
+    def ack(self, delivery: Delivery):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM deliveries WHERE seq = ?", (delivery.receipt,)
+            )
+
+    def nack(self, delivery: Delivery):
+        if delivery.attempts >= self.max_attempts:
+            _dropped(delivery, f"after {delivery.attempts} attempts")
+            self.ack(delivery)
+            return
+        with self._lock:
+            self._db.execute(
+                "UPDATE deliveries SET visible_at = 0 WHERE seq = ?",
+                (delivery.receipt,),
+            )
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _dropped(delivery: Delivery, reason: str):
+    logger.error(f"Dropped delivery {delivery.id} ({delivery.topic}), {reason}.")
+
+
+_memory_queues: Dict[str, MemoryQueue] = {}
+
+
+def open_queue(url: str) -> IngressQueue:
+    """
+    Opens the ingress queue at the URL.
+
+    - ``memory://[name]``, the same in-process queue for every call with that name.
+    - ``sqlite:///relative/path.db`` or ``sqlite:////absolute/path.db``.
+    - Any other scheme registered in the ``zeroae.goblet.queues`` entry point group.
+
+    :param url: The queue URL, i.e. config.INGRESS_QUEUE_URL
+    """
+    u = urlparse(url)
+    if u.scheme == "memory":
+        return _memory_queues.setdefault(u.netloc, MemoryQueue())
+    if u.scheme == "sqlite":
+        return SQLiteQueue(url.split("sqlite:///", 1)[1])
+    try:
+        factory: Callable[[str], IngressQueue] = entrypoints.get_single(
+            BACKENDS_GROUP, u.scheme
+        ).load()
+    except entrypoints.NoSuchEntryPoint:
+        raise ValueError(f"Unknown ingress queue backend: {u.scheme}")
+    return factory(url)
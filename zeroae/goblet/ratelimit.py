@@ -0,0 +1,262 @@
+"""Paces the GitHub API calls by their rate limit budget, interactive calls first."""
+import threading
+import time
+from collections import Counter
+from enum import Enum
+from typing import Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlparse
+
+from requests import Response
+
+
+class Priority(Enum):
+    """How long a call may be held back, see RateLimiter."""
+
+    #: i.e. check runs and comments, only held back once the budget is exhausted.
+    INTERACTIVE = 0
+    #: i.e. scans, paced as the budget runs low and keeping a reserve untouched.
+    BACKGROUND = 1
+
+
+class RateLimited(Exception):
+    """The call would have to wait longer than the RateLimiter max_wait."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Budget(object):
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining = 0
+        self.reset = 0.0
+        self.blocked_until = 0.0
+        self.next_at = 0.0
+
+
+def resource(url: str) -> str:
+    """The rate limit resource (bucket) of a GitHub API url."""
+    path = urlparse(url).path
+    if "/search/" in path:
+        return "search"
+    if path.endswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+def _secondary(response: Response) -> bool:
+    # A secondary rate limit only says so in its message, i.e. "You have exceeded
+    # a secondary rate limit.", when there is no Retry-After.
+    if response.status_code == 429:
+        return True
+    return b"secondary rate limit" in response.content.lower()
+
+
+class RateLimiter(object):
+    """
+    The rate limit budget of every auth context (i.e. installation) and API host.
+
+    The budgets are learned from the X-RateLimit-* response headers, and the calls
+    are counted against them until the next response:
+
+    - The background calls leave ``reserve`` of the limit to the interactive ones,
+      and are spread evenly until the reset once below ``slow_start`` of it.
+    - No call is sent on an exhausted budget, until its reset.
+    - A secondary rate limit (Retry-After) holds back every call to the host, for
+      ``secondary_wait`` seconds when GitHub does not say how long.
+
+    A call held back longer than ``max_wait`` seconds raises RateLimited instead.
+    """
+
+    def __init__(
+        self,
+        reserve: float = 0.1,
+        slow_start: float = 0.5,
+        max_wait: float = 60.0,
+        retries: int = 2,
+        max_budgets: int = 4096,
+        secondary_wait: float = 60.0,
+    ):
+        """
+        :param reserve: The share of the limit kept for the interactive calls
+        :param slow_start: The share of the limit below which background calls are paced
+        :param max_wait: The maximum seconds a call is held back
+        :param retries: The retries of a call answered with a rate limit error
+        :param max_budgets: The budgets kept before the refilled ones are dropped
+        :param secondary_wait: The pause of a secondary rate limit without Retry-After
+        """
+        self.reserve = reserve
+        self.slow_start = slow_start
+        self.max_wait = max_wait
+        self.retries = retries
+        self.max_budgets = max_budgets
+        self.secondary_wait = secondary_wait
+        self.counters = Counter()
+
+        self._budgets: Dict[Tuple[str, Hashable, str], _Budget] = {}
+        self._hosts: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def call(
+        self,
+        key: Hashable,
+        url: str,
+        send: Callable[[], Response],
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Response:
+        """
+        Sends the call once the budget allows it, and retries it when GitHub answers
+        with a rate limit error that clears within ``max_wait``.
+
+        :param key: The auth context, i.e. an installation id or "app"
+        :param url: The url of the call
+        :param send: Sends the call
+        :raises RateLimited: If the call would be held back too long
+        """
+        host = urlparse(url).netloc
+        bucket = (host, key, resource(url))
+        for attempt in range(self.retries + 1):
+            self.acquire(bucket, priority)
+            response = send()
+            retry_after = self.update(bucket, response)
+            if retry_after is None or retry_after > self.max_wait:
+                break
+            if attempt < self.retries:
+                self._count("retried")
+        return response
+
+    def acquire(self, bucket: Tuple[str, Hashable, str], priority: Priority):
+        """Waits until the budget of the (host, key, resource) allows one more call."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                delay = self._delay(bucket, priority, time.time())
+                if delay <= 0:
+                    self.counters["requests"] += 1
+                    if waited:
+                        self.counters["throttled"] += 1
+                        self.counters["waited"] += waited
+                    return
+                if waited + delay > self.max_wait:
+                    self.counters["rejected"] += 1
+                    raise RateLimited(
+                        f"The {bucket[2]} rate limit of {bucket[1]} on {bucket[0]} "
+                        f"clears in {delay:.0f}s.",
+                        delay,
+                    )
+            time.sleep(delay)
+            waited += delay
+
+    def update(
+        self, bucket: Tuple[str, Hashable, str], response: Response
+    ) -> Optional[float]:
+        """
+        Learns the budget from the response headers.
+
+        :return: The seconds before retrying, if it was a rate limit error
+        """
+        headers = response.headers
+        now = time.time()
+        with self._lock:
+            budget = self._budget(bucket, now)
+            if "X-RateLimit-Remaining" in headers:
+                remaining = int(headers["X-RateLimit-Remaining"])
+                reset = float(headers.get("X-RateLimit-Reset", now + 3600))
+                if reset == budget.reset:
+                    # The calls sent since this response are already counted.
+                    remaining = min(remaining, budget.remaining)
+                budget.limit = int(headers.get("X-RateLimit-Limit", remaining))
+                budget.remaining, budget.reset = remaining, reset
+
+            if response.status_code not in (403, 429):
+                return None
+            secondary = True
+            if "Retry-After" in headers:
+                # A secondary rate limit, GitHub asks to pause all the calls.
+                until = now + float(headers["Retry-After"])
+            elif budget.limit is not None and budget.remaining <= 0:
+                until, secondary = budget.reset, False
+            elif _secondary(response):
+                # Without saying how long, at least a minute.
+                until = now + self.secondary_wait
+            else:
+                # Forbidden, not rate limited.
+                return None
+            if secondary:
+                host = bucket[0]
+                self._hosts[host] = max(self._hosts.get(host, 0.0), until)
+            budget.blocked_until = max(budget.blocked_until, until)
+            self.counters["limited"] += 1
+            return max(until - now, 0.0)
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        """The counters, and the remaining budgets per host and auth context."""
+        now = time.time()
+        with self._lock:
+            hosts = {
+                host: {"blocked_for": max(until - now, 0.0), "budgets": {}}
+                for host, until in self._hosts.items()
+            }
+            for (host, key, kind), b in self._budgets.items():
+                if b.limit is None:
+                    continue
+                budgets = hosts.setdefault(host, {"blocked_for": 0.0, "budgets": {}})
+                budgets["budgets"][f"{key}/{kind}"] = {
+                    "limit": b.limit,
+                    "remaining": b.remaining if b.reset > now else b.limit,
+                    "reset_in": max(b.reset - now, 0.0),
+                }
+            return {
+                "requests": 0,
+                "throttled": 0,
+                "retried": 0,
+                "rejected": 0,
+                "limited": 0,
+                "waited": 0.0,
+                **self.counters,
+                "hosts": hosts,
+            }
+
+    def _delay(
+        self, bucket: Tuple[str, Hashable, str], priority: Priority, now: float
+    ) -> float:
+        budget = self._budget(bucket, now)
+        blocked = max(self._hosts.get(bucket[0], 0.0), budget.blocked_until) - now
+        if blocked > 0:
+            return blocked
+        if budget.limit is None:
+            # Not learned yet, i.e. the first call or a host without rate limits.
+            return 0.0
+        if budget.reset <= now:
+            budget.remaining = budget.limit
+            budget.reset = now + 3600
+
+        available = budget.remaining
+        if priority is Priority.BACKGROUND:
+            available -= self.reserve * budget.limit
+            if available <= 0:
+                return budget.reset - now
+            if budget.remaining < self.slow_start * budget.limit:
+                if budget.next_at > now:
+                    return budget.next_at - now
+                budget.next_at = now + (budget.reset - now) / available
+        elif available <= 0:
+            return budget.reset - now
+        budget.remaining -= 1
+        return 0.0
+
+    def _budget(self, bucket: Tuple[str, Hashable, str], now: float) -> _Budget:
+        budget = self._budgets.get(bucket)
+        if budget is None:
+            if len(self._budgets) >= self.max_budgets:
+                # The refilled budgets are learned again on their next response.
+                for k in [k for k, b in self._budgets.items() if b.reset <= now]:
+                    del self._budgets[k]
+            budget = self._budgets[bucket] = _Budget()
+        return budget
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
@@ -0,0 +1,124 @@
+"""Action-level webhook topics, and the payload predicates of the listeners."""
+import functools
+import json
+import re
+from typing import Callable, Collection, Dict, FrozenSet, Mapping, Optional, Set, Union
+
+Predicate = Callable[[Mapping], bool]
+
+#: The action of a webhook body, GitHub sends it as the first key.
+_ACTION = re.compile(rb'\s*\{\s*"action"\s*:\s*"([^"\\]*)"')
+
+
+def topic_name(topic: str) -> str:
+    """
+    The PyPubSub topic of an on_gh_event topic.
+
+    :param topic: ``*``, an event (``pull_request``), or an event action
+        (``pull_request.opened``)
+    """
+    return "gh" if topic == "*" else f"gh.{topic}"
+
+
+def parse_action(body: bytes) -> Optional[str]:
+    """
+    The ``action`` of a webhook body.
+
+    It is matched at the start of the body, the body is only decoded if the action
+    is somewhere else.
+    """
+    m = _ACTION.match(body)
+    if m is not None:
+        return m.group(1).decode("utf-8")
+    payload = json.loads(body)
+    return payload.get("action") if isinstance(payload, dict) else None
+
+
+class RoutingTable(object):
+    """
+    The actions with listeners, per event topic.
+
+    Deliveries of an event nobody listens to per action keep the event topic, and
+    their body is not even looked at.
+    """
+
+    def __init__(self):
+        self._actions: Dict[str, FrozenSet[str]] = {}
+
+    def add(self, topic: str):
+        """:param topic: The PyPubSub topic of a listener, i.e. gh.pull_request.opened"""
+        names = topic.split(".")
+        if len(names) == 3:
+            event = ".".join(names[:2])
+            self._actions[event] = self._actions.get(event, frozenset()) | {names[2]}
+
+    def resolve(self, topic: str, body: bytes) -> str:
+        """
+        :param topic: The event topic, i.e. gh.pull_request
+        :param body: The webhook body
+        :return: The action topic if it has listeners, otherwise the event topic
+        """
+        actions = self._actions.get(topic)
+        if not actions:
+            return topic
+        action = parse_action(body)
+        return f"{topic}.{action}" if action in actions else topic
+
+
+def labels(payload: Mapping) -> Set[str]:
+    """The names of the payload label, and of its issue or pull request labels."""
+    names = set()
+    label = payload.get("label")
+    if label:
+        names.add(label["name"])
+    for key in ["pull_request", "issue"]:
+        subject = payload.get(key)
+        if subject:
+            names.update(label["name"] for label in subject.get("labels", []))
+    return names
+
+
+def predicate(
+    repository: Union[str, Collection[str]] = None,
+    label: Union[str, Collection[str]] = None,
+    when: Predicate = None,
+) -> Optional[Predicate]:
+    """
+    Compiles the on_gh_event filters into a single predicate.
+
+    :param repository: The full name(s) of the repository, i.e. zeroae/goblet
+    :param label: The label name(s), any of them matches
+    :param when: Any other test of the payload
+    :return: None if there are no filters
+    """
+    checks = []
+    if repository is not None:
+        repositories = _as_set(repository)
+        checks.append(
+            lambda p: (p.get("repository") or {}).get("full_name") in repositories
+        )
+    if label is not None:
+        names = _as_set(label)
+        checks.append(lambda p: not names.isdisjoint(labels(p)))
+    if when is not None:
+        checks.append(when)
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda p: all(check(p) for check in checks)
+
+
+def filtered(listener: Callable, test: Predicate) -> Callable:
+    """The listener, only called with the payloads passing the test."""
+
+    @functools.wraps(listener)
+    def wrapper(payload):
+        if test(payload):
+            listener(payload)
+
+    return wrapper
+
+
+def _as_set(value: Union[str, Collection[str]]) -> FrozenSet[str]:
+    return frozenset([value] if isinstance(value, str) else value)
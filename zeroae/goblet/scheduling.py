@@ -0,0 +1,161 @@
+"""Fair scheduling of the webhooks between the GitHub App installations (tenants)."""
+import queue
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Hashable, Mapping, Optional, Tuple
+
+#: The id of the webhook installation, GitHub sends it among the last keys.
+_INSTALLATION = re.compile(rb'"installation"\s*:\s*\{\s*"id"\s*:\s*(\d+)')
+
+
+def installation_id(body: bytes) -> Optional[int]:
+    """The installation id of a webhook body, without decoding it."""
+    start = body.rfind(b'"installation"')
+    if start == -1:
+        return None
+    m = _INSTALLATION.match(body, start) or _INSTALLATION.search(body)
+    return int(m.group(1)) if m is not None else None
+
+
+class FairQueue(object):
+    """
+    A queue per tenant, served by deficit round-robin.
+
+    Every round, a tenant may take ``weight`` items (its weight defaults to 1, the
+    fractions carry over to the next rounds). Tenants running ``concurrency`` items
+    already are skipped until one of them is done.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 0,
+        max_tenant_size: int = 0,
+        concurrency: int = 0,
+        weights: Mapping[Hashable, float] = None,
+    ):
+        """
+        :param max_size: The maximum number of queued items, no limit if 0
+        :param max_tenant_size: The maximum number of queued items per tenant
+        :param concurrency: The maximum number of running items per tenant
+        :param weights: The share of the tenants, relative to the default 1
+        """
+        self.max_size = max_size
+        self.max_tenant_size = max_tenant_size
+        self.concurrency = concurrency
+        self.weights = dict(weights or {})
+        if any(w <= 0 for w in self.weights.values()):
+            raise ValueError("The tenant weights must be positive.")
+
+        self._queues: Dict[Hashable, Deque[Any]] = {}
+        self._active: Deque[Hashable] = deque()
+        self._deficit: Dict[Hashable, float] = {}
+        self._running = Counter()
+        self._served = Counter()
+        self._size = 0
+        self._unfinished = 0
+        self._cond = threading.Condition()
+        self._all_done = threading.Condition(self._cond)
+
+    def put(self, item: Any, tenant: Hashable = None, force: bool = False):
+        """
+        Queues the item without blocking.
+
+        :param force: Ignore the size limits
+        :raises queue.Full: If the queue, or the tenant queue, is full
+        """
+        with self._cond:
+            items = self._queues.get(tenant)
+            if not force:
+                if self.max_size and self._size >= self.max_size:
+                    raise queue.Full
+                if self.max_tenant_size and len(items or ()) >= self.max_tenant_size:
+                    raise queue.Full
+            if items is None:
+                items = self._queues[tenant] = deque()
+                self._deficit[tenant] = 0.0
+                self._active.append(tenant)
+            items.append(item)
+            self._size += 1
+            self._unfinished += 1
+            self._cond.notify()
+
+    def get(self, timeout: float = None) -> Tuple[Hashable, Any]:
+        """
+        :return: The tenant and item to run next, task_done must be called with it
+        :raises queue.Empty: If there was none within the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                picked = self._pick()
+                if picked is not None:
+                    return picked
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._cond.wait(remaining)
+
+    def task_done(self, tenant: Hashable = None):
+        with self._cond:
+            self._running[tenant] -= 1
+            if not self._running[tenant]:
+                del self._running[tenant]
+            self._unfinished -= 1
+            if not self._unfinished:
+                self._all_done.notify_all()
+            # The tenant may be below its concurrency cap again.
+            self._cond.notify()
+
+    def join(self):
+        """Waits until task_done was called for every item."""
+        with self._cond:
+            while self._unfinished:
+                self._all_done.wait()
+
+    def qsize(self) -> int:
+        return self._size
+
+    @property
+    def tenants(self) -> Dict[Hashable, Dict[str, int]]:
+        """The queued, running and served items of every tenant seen."""
+        with self._cond:
+            return {
+                tenant: {
+                    "queued": len(self._queues.get(tenant, ())),
+                    "running": self._running[tenant],
+                    "served": self._served[tenant],
+                }
+                for tenant in set(self._served) | set(self._queues)
+            }
+
+    def _pick(self) -> Optional[Tuple[Hashable, Any]]:
+        skipped = 0
+        while skipped < len(self._active):
+            tenant = self._active[0]
+            if self.concurrency and self._running[tenant] >= self.concurrency:
+                self._active.rotate(-1)
+                skipped += 1
+                continue
+            skipped = 0
+            if self._deficit[tenant] < 1:
+                # The tenant's turn, it gets its quantum.
+                self._deficit[tenant] += self.weights.get(tenant, 1.0)
+                if self._deficit[tenant] < 1:
+                    self._active.rotate(-1)
+                    continue
+            self._deficit[tenant] -= 1
+            items = self._queues[tenant]
+            item = items.popleft()
+            self._size -= 1
+            self._running[tenant] += 1
+            self._served[tenant] += 1
+            if not items:
+                # Idle tenants do not keep their deficit.
+                self._active.popleft()
+                del self._queues[tenant], self._deficit[tenant]
+            elif self._deficit[tenant] < 1:
+                self._active.rotate(-1)
+            return tenant, item
+        return None
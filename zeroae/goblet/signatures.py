@@ -0,0 +1,105 @@
+"""Webhook signature verification on the raw request body."""
+
+import hmac
+import re
+from typing import Iterable, Mapping, Optional
+from uuid import UUID
+
+from octokit import utils
+
+_HEADERS = {"sha256": "x-hub-signature-256", "sha1": "x-hub-signature"}
+
+_EVENT = re.compile(r"[a-z][a-z0-9_]*")
+
+#: The X-GitHub-Event names, octokit's and those GitHub added since.
+GITHUB_EVENTS = frozenset(
+    e for e in utils.get_json_data("events.json") if "." not in e and e != "*"
+) | {
+    "branch_protection_rule",
+    "check_run",
+    "check_suite",
+    "code_scanning_alert",
+    "content_reference",
+    "dependabot_alert",
+    "deploy_key",
+    "discussion",
+    "discussion_comment",
+    "github_app_authorization",
+    "installation_target",
+    "merge_group",
+    "meta",
+    "package",
+    "pull_request_review_thread",
+    "registry_package",
+    "repository_dispatch",
+    "repository_import",
+    "repository_vulnerability_alert",
+    "secret_scanning_alert",
+    "security_advisory",
+    "sponsorship",
+    "star",
+    "workflow_dispatch",
+    "workflow_job",
+    "workflow_run",
+}
+
+
+def valid_delivery(guid: Optional[str]) -> bool:
+    """:return: True if the X-GitHub-Delivery header is a GUID"""
+    try:
+        return guid is not None and str(UUID(guid)) == guid
+    except ValueError:
+        return False
+
+
+def valid_event(event: Optional[str]) -> bool:
+    """:return: True if the X-GitHub-Event header is an event name, known or not"""
+    return event is not None and _EVENT.fullmatch(event) is not None
+
+
+class WebhookVerifier(object):
+    """
+    Verifies the ``X-Hub-Signature-256`` (or the legacy sha1 ``X-Hub-Signature``)
+    HMAC of webhook bodies, in constant time.
+
+    The HMAC key objects are built once per secret and copied for every request.
+    Several secrets can be active at once, i.e. while the webhook secret is rotated.
+    """
+
+    def __init__(self, secrets: Iterable[str], allow_sha1: bool = True):
+        """
+        :param secrets: The active webhook secrets, empty values are ignored
+        :param allow_sha1: Accept requests only signed with X-Hub-Signature
+        """
+        secrets = [s.encode("utf-8") for s in secrets if s]
+        algorithms = ["sha256", "sha1"] if allow_sha1 else ["sha256"]
+        self._schemes = [
+            (_HEADERS[a], a, [hmac.new(s, None, a) for s in secrets])
+            for a in algorithms
+        ]
+
+    def __len__(self) -> int:
+        """The number of active secrets."""
+        return len(self._schemes[0][2])
+
+    def verify(self, headers: Mapping[str, str], body: bytes) -> bool:
+        """
+        :param headers: The request headers, with lower-case names
+        :param body: The raw request body
+        :return: True if one of the secrets signed the body
+        """
+        for header, algorithm, keys in self._schemes:
+            signature = headers.get(header)
+            if signature is None:
+                continue
+            prefix, _, signature = signature.partition("=")
+            if prefix != algorithm:
+                return False
+            signature = signature.encode("ascii", "replace")
+            for key in keys:
+                h = key.copy()
+                h.update(body)
+                if hmac.compare_digest(h.hexdigest().encode("ascii"), signature):
+                    return True
+            return False
+        return False
@@ -0,0 +1,98 @@
+"""A single thread running the callbacks scheduled by the batching stages."""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Timer(object):
+    def __init__(self, deadline: float, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerQueue(object):
+    """
+    Runs the callbacks at their deadline, one at a time, on a single daemon thread.
+
+    The thread is started by the first call_later after a stop.
+    """
+
+    def __init__(
+        self,
+        name: str = "goblet-timers",
+        run: Callable[[Callable[[], None]], None] = None,
+    ):
+        """
+        :param name: The name of the thread
+        :param run: Runs the due callbacks, i.e. on a worker pool; on the thread if None
+        """
+        self.name = name
+        self.run = run
+        self._heap: List[Tuple[float, int, Timer]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """
+        :param delay: Seconds from now
+        :param callback: Called without arguments, see ``run``
+        :return: The timer, to cancel it
+        """
+        timer = Timer(time.monotonic() + delay, callback)
+        with self._cond:
+            heapq.heappush(self._heap, (timer.deadline, next(self._seq), timer))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+        return timer
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def stop(self):
+        """Stops the thread, the pending timers are dropped."""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._heap.clear()
+            self._cond.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self):
+        me = threading.current_thread()
+        while True:
+            with self._cond:
+                timer = None
+                while self._thread is me:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    remaining = self._heap[0][0] - time.monotonic()
+                    if remaining <= 0:
+                        timer = heapq.heappop(self._heap)[2]
+                        break
+                    self._cond.wait(remaining)
+                if timer is None:
+                    return
+            if timer.cancelled:
+                continue
+            try:
+                if self.run is not None:
+                    self.run(timer.callback)
+                else:
+                    timer.callback()
+            except Exception:
+                logger.exception(f"Unhandled error in timer {timer.callback!r}")
@@ -1,18 +1,127 @@
-from typing import Dict, Any
+import warnings
+from typing import Dict, Any, Hashable, Tuple
 from urllib.parse import urljoin
 
 import octokit
+import requests
 
 from zeroae.goblet import config
+from zeroae.goblet.auth import TokenManager
+from zeroae.goblet.clients import ClientRegistry, PooledOctokit
+from zeroae.goblet.http_cache import ResponseCache
+from zeroae.goblet.ratelimit import RateLimiter
+
+_token_manager: Tuple[Tuple[str, str, str], TokenManager] = (None, None)
+_client_registry: ClientRegistry = None
 
 
 def get_configured_octokit(*args, **kwargs) -> octokit.Octokit:
+    """
+    Returns an unauthenticated Octokit of the configured GitHub API.
+
+    It is the shared client of the registry, with its pooled connections, response
+    cache and rate limits. The octokit arguments (i.e. ``auth``) still create a
+    standalone Octokit without them, get_app_octokit and get_installation_octokit
+    are the authenticated shared clients.
+    :return:
+    """
+    if not args and not kwargs:
+        return get_client_registry().get(None, config.GHE_API_URL.geturl())
+    warnings.warn(
+        "Use get_app_octokit or get_installation_octokit for authenticated clients.",
+        DeprecationWarning,
+        stacklevel=2,
+    )
     kwargs["specification"] = config.GHE_API_SPEC
     rv = octokit.Octokit(*args, **kwargs)
     rv.base_url = config.GHE_API_URL.geturl()
     return rv
 
 
+def get_token_manager() -> TokenManager:
+    """
+    Returns the token cache of the configured GitHub App.
+
+    It is replaced when the App or GHE configuration changes.
+    :return:
+    """
+    global _token_manager
+    key = (config.APP_ID, config.APP_PEM, config.GHE_API_URL.geturl())
+    if _token_manager[0] != key:
+        # The tokens are minted over the pooled connections of the API host.
+        session = get_client_registry().session(key[2])
+        _token_manager = (key, TokenManager(*key, session=session))
+    return _token_manager[1]
+
+
+def get_client_registry() -> ClientRegistry:
+    """
+    Returns the registry of the shared Octokit clients, per auth context.
+    :return:
+    """
+    global _client_registry
+    if _client_registry is None:
+        cache = None
+        if config.GHE_CACHE_MAX_BYTES:
+            cache = ResponseCache(
+                config.GHE_CACHE_MAX_BYTES, path=config.GHE_CACHE_PATH or None
+            )
+        _client_registry = ClientRegistry(
+            _create_client,
+            max_connections=config.GHE_MAX_CONNECTIONS,
+            idle_timeout=config.GHE_CLIENT_IDLE_TIMEOUT,
+            cache=cache,
+            cache_exclude=config.GHE_CACHE_EXCLUDE,
+            limiter=RateLimiter(
+                reserve=config.GHE_RATELIMIT_RESERVE,
+                max_wait=config.GHE_RATELIMIT_MAX_WAIT,
+            ),
+        )
+    return _client_registry
+
+
+def _create_client(key: Hashable, session: requests.Session) -> PooledOctokit:
+    if key is None:
+        authorization = None
+    elif key == "app":
+
+        def authorization():
+            return f"Bearer {get_token_manager().app_jwt()}"
+
+    else:
+
+        def authorization():
+            return f"token {get_token_manager().installation_token(key)}"
+
+    return PooledOctokit(
+        session,
+        config.GHE_API_URL.geturl(),
+        authorization,
+        limiter=get_client_registry().limiter,
+        budget=key,
+        routes=config.GHE_API_SPEC,
+    )
+
+
+def get_app_octokit() -> PooledOctokit:
+    """
+    Returns the shared Octokit authenticated as the GitHub App, with the cached JWT.
+    :return:
+    """
+    return get_client_registry().get("app", config.GHE_API_URL.geturl())
+
+
+def get_installation_octokit(installation_id: int) -> PooledOctokit:
+    """
+    Returns the shared Octokit authenticated as the installation, with its cached
+    access token.
+
+    :param installation_id: The payload["installation"]["id"] of the webhook
+    :return:
+    """
+    return get_client_registry().get(installation_id, config.GHE_API_URL.geturl())
+
+
 def create_app_manifest(app_url: str) -> Dict[str, Any]:
     """
     Returns the GitHub Application Manifest based on the chalice application settings.
@@ -0,0 +1,104 @@
+"""Worker processes, publishing the ingress queue deliveries to the listeners."""
+import importlib
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from collections import Counter
+from typing import Callable, Optional
+
+from .queues import IngressQueue, open_queue
+
+logger = logging.getLogger(__name__)
+
+
+class Worker(object):
+    """Pulls deliveries from the ingress queue, and hands them to ``deliver``."""
+
+    def __init__(
+        self, queue: IngressQueue, deliver: Callable[[str, bytes], Optional[int]]
+    ):
+        """
+        :param queue: The ingress queue
+        :param deliver: Called with the topic and body of every delivery, returns
+            the number of listeners that failed
+        """
+        self.queue = queue
+        self.deliver = deliver
+        self.counters = Counter()
+
+    def run(self, stop: threading.Event = None, max_deliveries: int = None) -> int:
+        """
+        Processes deliveries until ``stop`` is set, or ``max_deliveries`` were done.
+
+        Deliveries that could not be published (i.e. ``deliver`` raised) are given
+        back to the queue, to be retried up to its ``max_attempts``. Those with
+        failed listeners are acknowledged and counted, the listeners that succeeded
+        are not run again.
+
+        :return: The number of deliveries processed
+        """
+        stop = threading.Event() if stop is None else stop
+        n = 0
+        while not stop.is_set() and (max_deliveries is None or n < max_deliveries):
+            delivery = self.queue.get(timeout=1.0)
+            if delivery is None:
+                continue
+            try:
+                failed = self.deliver(delivery.topic, delivery.body)
+            except Exception:
+                logger.exception(f"Unhandled error while processing {delivery.id}")
+                self.queue.nack(delivery)
+                self.counters["retried"] += 1
+            else:
+                if failed:
+                    logger.warning(f"{failed} listener(s) failed on {delivery.id}.")
+                    self.counters["failed_listeners"] += failed
+                self.queue.ack(delivery)
+            n += 1
+        return n
+
+
+def work(app: str, queue_url: str):
+    """
+    The worker process, imports the Chalice ``app`` module then processes deliveries.
+
+    SIGINT and SIGTERM stop the worker once the current delivery is done.
+    """
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+
+    # Importing the application registers its on_gh_event listeners.
+    sys.path.insert(0, os.getcwd())
+    importlib.import_module(app)
+    from .chalice import bp
+
+    queue = open_queue(queue_url)
+    try:
+        Worker(queue, bp.deliver).run(stop)
+    finally:
+        # Hands the pending on_gh_events batches over.
+        bp.shutdown()
+        queue.close()
+
+
+def run_workers(app: str, queue_url: str, processes: int):
+    """Runs the worker processes until they are interrupted."""
+    workers = [
+        multiprocessing.Process(
+            target=work, args=(app, queue_url), name=f"goblet-worker-{i}"
+        )
+        for i in range(processes)
+    ]
+    for p in workers:
+        p.start()
+    try:
+        for p in workers:
+            p.join()
+    except KeyboardInterrupt:
+        # The workers got the SIGINT too, wait for their current delivery.
+        for p in workers:
+            p.join()
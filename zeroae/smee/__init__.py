@@ -15,13 +15,21 @@
 # ------------------------------------------------------------------------------
 
 """Webhook data delivery client. Please visit https://smee.io for more information."""
-import json
+import http.client
 import logging
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass
+from typing import Dict, Iterator, Tuple
 
 import requests
 
-from . import event_stream
+from . import envelope, event_stream
+from .spool import Record, Spool, SpoolDrainer
+from .transport import Transport, failed
 
 logger = logging.getLogger(__name__)
 
@@ -31,34 +39,234 @@ class SmeeClient(object):
     source: str
     target: str
 
+    transport: Transport
+    spool: Spool
+    passthrough: bool
+    stats: Counter
+
+    reconnect: bool
+    max_backoff: float
+    stream_timeout: float
+    last_event_id: str
+    retry: int
+
     _events: requests.Response
+    _seen: OrderedDict
 
-    def __init__(self, source, target):
+    #: How many event ids are remembered to drop replayed events after a reconnect.
+    SEEN_EVENTS = 4096
+
+    def __init__(
+        self,
+        source,
+        target,
+        transport: Transport = None,
+        spool: Spool = None,
+        passthrough: bool = False,
+        reconnect: bool = True,
+        max_backoff: float = 60.0,
+        stream_timeout: float = 120.0,
+    ):
         self.target = target
+        self.transport = Transport(target) if transport is None else transport
+        self.spool = spool
+        self.passthrough = passthrough
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+        self.reconnect = reconnect
+        self.max_backoff = max_backoff
+        self.stream_timeout = stream_timeout
+        self.last_event_id = None
+        self.retry = event_stream.Event.retry
+        self._seen = OrderedDict()
 
-        self._events = event_stream.get(source)
-        self._events.raise_for_status()
+        self._events = self._connect(source)
 
+        # smee.io/new redirects to a new channel, reconnect to that channel instead.
         self.source = self._events.url
 
+    def _connect(self, url: str) -> requests.Response:
+        headers = {}
+        if self.last_event_id is not None:
+            headers["Last-Event-ID"] = self.last_event_id
+        r = event_stream.get(url, headers=headers, timeout=(10, self.stream_timeout))
+        r.raise_for_status()
+        return r
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before the reconnect attempt, never less than ``retry``."""
+        retry = self.retry / 1_000
+        # Clamped, 2**attempt overflows a float after days of failed attempts.
+        delay = min(retry * 2 ** min(attempt, 32), max(retry, self.max_backoff))
+        return delay + random.uniform(0, delay / 2)
+
     def run(self):
-        for event in self._events.iter_events():
-            self.__getattribute__(f"on_{event.type}")(event)
+        with self.running():
+            for event in self.iter_events():
+                self.dispatch(event)
+
+    @contextmanager
+    def running(self):
+        """Replays the spool in the background for the duration of a run."""
+        drainer = None
+        if self.spool is not None:
+            drainer = SpoolDrainer(self.spool, self._replay)
+            drainer.start()
+        try:
+            yield self
+        finally:
+            self.transport.flush()
+            if drainer is not None:
+                drainer.stop()
+                self.spool.flush()
+            self.log_stats()
+
+    def close(self):
+        """Closes the event-stream, the transport and the spool."""
+        self._events.close()
+        self.transport.close()
+        if self.spool is not None:
+            self.spool.close()
+
+    def count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def log_stats(self):
+        transport = self.transport.stats
+        logger.debug(
+            f"{self.source}: "
+            f"{self.stats['delivered']} delivered, {self.stats['failed']} failed; "
+            f"{transport['reused']} of {transport['requests']} requests "
+            f"reused one of {transport['connections']} connections."
+        )
+        if self.spool is not None:
+            logger.debug(f"{len(self.spool)} events waiting in {self.spool.path}")
+        for url, stats in getattr(self.transport, "target_stats", {}).items():
+            logger.debug(
+                f"{url}: {stats.get('delivered', 0)} delivered, "
+                f"{stats.get('dropped', 0)} dropped, {stats['queued']} queued; "
+                f"p50 {stats['latency_p50'] * 1000:.1f}ms, "
+                f"p99 {stats['latency_p99'] * 1000:.1f}ms."
+            )
+
+    def iter_events(self) -> Iterator[event_stream.Event]:
+        """
+        Iterates over the source events, reconnecting when the stream is lost.
+
+        Reconnects send the ``Last-Event-ID`` header, and message events whose id was
+        already seen are dropped.
+        """
+        attempt = 0
+        while True:
+            try:
+                for event in self._events.iter_events(retry=self.retry):
+                    attempt = 0
+                    self.retry = event.retry
+                    if event.id is not None:
+                        self.last_event_id = event.id
+                        if event.type == "message" and self._replayed(event.id):
+                            self.count("duplicates")
+                            continue
+                    yield event
+            except (
+                requests.exceptions.RequestException,
+                http.client.HTTPException,
+                OSError,
+            ) as e:
+                logger.warning(f"Lost connection to {self.source}: {e}")
+            finally:
+                self._events.close()
+
+            if not self.reconnect:
+                return
+
+            while True:
+                delay = self.backoff(attempt)
+                attempt += 1
+                logger.info(f"Reconnecting to {self.source} in {delay:.1f}s...")
+                time.sleep(delay)
+                try:
+                    self._events = self._connect(self.source)
+                    self.count("reconnects")
+                    break
+                except requests.exceptions.RequestException as e:
+                    logger.warning(f"Could not reconnect to {self.source}: {e}")
+
+    def _replayed(self, event_id: str) -> bool:
+        if event_id in self._seen:
+            return True
+        self._seen[event_id] = None
+        if len(self._seen) > self.SEEN_EVENTS:
+            self._seen.popitem(last=False)
+        return False
+
+    def dispatch(self, event: event_stream.Event):
+        self.__getattribute__(f"on_{event.type}")(event)
 
     def on_ping(self, event):
         logger.debug(f"{self.source} is still alive...")
+        self.log_stats()
 
     def on_ready(self, event):
         logger.info(f"Connected {self.source}")
 
     def on_message(self, event: event_stream.Event):
-        smee_event = event.json()
-        body = json.dumps(smee_event.pop("body"), separators=(",", ":"))
-        _ = smee_event.pop("query")
-        _ = smee_event.pop("timestamp")
+        headers, body = self.unwrap(event)
+        self.deliver(event, headers, body)
+
+    def unwrap(self, event: event_stream.Event) -> Tuple[Dict[str, str], bytes]:
+        """Splits the smee envelope into the webhook headers and its compact body.
+
+        In passthrough mode the body is sliced out of the envelope instead of being
+        decoded and re-serialized, falling back to the latter for unexpected layouts.
+        """
+        if self.passthrough:
+            rv = envelope.split(event.data)
+            if rv is not None:
+                return rv
+            self.count("unsplit")
+        return envelope.parse(event.data)
+
+    def deliver(
+        self, event: event_stream.Event, headers: Dict[str, str], body: bytes
+    ) -> bool:
+        """Forwards the webhook to the target, returns True if it was delivered.
+
+        Events the target did not accept are appended to the spool, if there is one.
+        """
+        if self.spool is not None and len(self.spool):
+            # Keep the delivery order, the backlog must be replayed first.
+            self._spool(event.id, headers, body)
+            return False
+        if self.post(event.id, headers, body):
+            return True
+        if self.spool is not None:
+            self._spool(event.id, headers, body)
+        return False
+
+    def post(self, event_id: str, headers: Dict[str, str], body: bytes) -> bool:
         try:
-            requests.post(self.target, data=body, headers=smee_event)
-        except requests.exceptions.ConnectionError:
+            r = self.transport.post(body, headers)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            logger.warning(
+                f"Event {event_id} was not delivered. Target did not respond."
+            )
+            self.count("failed")
+            return False
+        if failed(r):
             logger.warning(
-                f"Event {event.id} was not delivered. Target did not respond."
+                f"Event {event_id} was not delivered. Target answered {r.status_code}."
             )
+            self.count("failed")
+            return False
+        self.count("delivered")
+        return True
+
+    def _spool(self, event_id: str, headers: Dict[str, str], body: bytes):
+        if self.spool.append(event_id, headers, body):
+            self.count("spooled")
+
+    def _replay(self, record: Record) -> bool:
+        return self.post(record.event_id, record.headers, record.body)
@@ -0,0 +1,159 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""asyncio SmeeClient, keeps reading the event-stream while events are forwarded."""
+
+import asyncio
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set
+
+from . import SmeeClient, logger
+
+_REPOSITORY_ID = re.compile(rb'"repository":\{"id":(\d+)')
+
+
+def repository_key(headers: Dict[str, str], body: bytes) -> Optional[bytes]:
+    """Orders deliveries per repository, using the payload's ``repository.id``."""
+    match = _REPOSITORY_ID.search(body)
+    return match.group(1) if match else None
+
+
+class KeyedDispatcher(object):
+    """
+    Runs the handler with bounded concurrency, in submission order per key.
+
+    Each key with pending work gets its own lane (a deque drained by a single task),
+    so ordering is only enforced between items sharing a key.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Awaitable[Any]],
+        concurrency: int = 8,
+        max_pending: int = None,
+    ):
+        self._handler = handler
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending = asyncio.Semaphore(max_pending or 64 * concurrency)
+        self._lanes: Dict[Hashable, Deque[tuple]] = {}
+        self._tasks: Set[asyncio.Future] = set()
+
+    @property
+    def lanes(self) -> int:
+        return len(self._lanes)
+
+    async def submit(self, key: Hashable, *args):
+        """Queues the handler call, waits while too many calls are pending."""
+        await self._pending.acquire()
+        lane = self._lanes.get(key)
+        if lane is not None:
+            lane.append(args)
+            return
+
+        self._lanes[key] = deque([args])
+        task = asyncio.ensure_future(self._drain(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def join(self):
+        """Waits until every submitted call has completed."""
+        while self._tasks:
+            await asyncio.wait(list(self._tasks))
+
+    async def _drain(self, key: Hashable):
+        lane = self._lanes[key]
+        try:
+            while lane:
+                args = lane.popleft()
+                try:
+                    async with self._slots:
+                        await self._handler(*args)
+                except Exception:
+                    logger.exception(f"Unhandled error while processing {key}")
+                finally:
+                    self._pending.release()
+        finally:
+            del self._lanes[key]
+
+
+@dataclass
+class AsyncSmeeClient(SmeeClient):
+    """
+    SmeeClient variant that forwards up to ``concurrency`` events at a time.
+
+    Events sharing the same ``key(headers, body)`` are delivered in order, by default
+    the key is the repository the webhook refers to.
+    """
+
+    concurrency: int
+    key: Callable[[Dict[str, str], bytes], Hashable]
+
+    def __init__(
+        self,
+        source,
+        target,
+        transport=None,
+        concurrency=8,
+        key=repository_key,
+        **kwargs,
+    ):
+        super().__init__(source, target, transport, **kwargs)
+        self.concurrency = concurrency
+        self.key = key
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            with self.running():
+                loop.run_until_complete(self.arun())
+        finally:
+            loop.close()
+
+    async def arun(self):
+        loop = asyncio.get_event_loop()
+        with ThreadPoolExecutor(1, "smee-reader") as reader, ThreadPoolExecutor(
+            self.concurrency, "smee-deliver"
+        ) as executor:
+
+            async def deliver(client, *args):
+                await loop.run_in_executor(executor, client.deliver, *args)
+
+            dispatcher = KeyedDispatcher(deliver, self.concurrency)
+            await pump(self, dispatcher, reader, self.key)
+            await dispatcher.join()
+
+
+async def pump(
+    client: SmeeClient,
+    dispatcher: KeyedDispatcher,
+    reader: ThreadPoolExecutor,
+    key: Callable[[Dict[str, str], bytes], Hashable],
+):
+    """Reads the client's events on the reader, and submits messages for delivery."""
+    loop = asyncio.get_event_loop()
+    events = client.iter_events()
+    while True:
+        event = await loop.run_in_executor(reader, next, events, None)
+        if event is None:
+            return
+        if event.type != "message":
+            client.dispatch(event)
+            continue
+        headers, body = client.unwrap(event)
+        await dispatcher.submit(key(headers, body), client, event, headers, body)
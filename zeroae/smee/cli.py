@@ -14,12 +14,24 @@
 #  limitations under the License.
 # ------------------------------------------------------------------------------
 
-from urllib.parse import urljoin
+import asyncio
+import json
+import os
+import re
+from urllib.parse import urljoin, urlparse
 
 import click
 import click_log
 
 from zeroae.smee import SmeeClient, logger
+from zeroae.smee.aio import AsyncSmeeClient
+from zeroae.smee.fanout import DROP, POLICIES, SPOOL, FanOut, Target
+from zeroae.smee.mux import MultiSmeeClient
+from zeroae.smee.recording import Recorder
+from zeroae.smee.relay import Relay
+from zeroae.smee.replay import AsyncReplayClient, ReplayClient, speed
+from zeroae.smee.spool import Spool
+from zeroae.smee.transport import Transport
 
 click_log.basic_config(logger)
 
@@ -38,7 +50,17 @@ click_log.basic_config(logger)
     "-t",
     "--target",
     help="Full URL (including protocol and path) of the target service the events will be "
-    "forwarded to. [default: http://127.0.0.1:{port}/{path}]",
+    "forwarded to, repeat it to fan-out every event to several targets. "
+    "[default: http://127.0.0.1:{port}/{path}]",
+    multiple=True,
+)
+@click.option(
+    "-C",
+    "--channels",
+    help="JSON file mapping each webhook proxy URL to its target URL (or a list of "
+    'target URLs and {"url": ..., "policy": ...} objects), all the channels are '
+    "forwarded asynchronously by this process.",
+    type=click.File("r"),
 )
 @click.option(
     "-p", "--port", help="Local HTTP server port", default=3000, show_default=True
@@ -50,16 +72,372 @@ click_log.basic_config(logger)
     default="/",
     show_default=True,
 )
+@click.option(
+    "--async/--no-async",
+    "use_async",
+    help="Keep reading events while forwarding them concurrently.",
+    default=False,
+    show_default=True,
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    help="Maximum number of events forwarded at once (per channel with --channels), "
+    "requires --async.",
+    default=8,
+    show_default=True,
+)
+@click.option(
+    "--pool-size",
+    help="Maximum number of keep-alive connections to the target.",
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--connect-timeout",
+    help="Seconds to wait for a connection to the target.",
+    default=3.05,
+    show_default=True,
+)
+@click.option(
+    "--read-timeout",
+    help="Seconds to wait for the target's response.",
+    default=30.0,
+    show_default=True,
+)
+@click.option(
+    "--retries",
+    help="Retries for failed connections and 502/503/504 responses.",
+    default=3,
+    show_default=True,
+)
+@click.option(
+    "--retry-backoff",
+    help="Exponential backoff factor (in seconds) between retries.",
+    default=0.3,
+    show_default=True,
+)
+@click.option(
+    "--reconnect/--no-reconnect",
+    help="Resume the event-stream (with Last-Event-ID) when the connection drops.",
+    default=True,
+    show_default=True,
+)
+@click.option(
+    "--max-backoff",
+    help="Maximum seconds between reconnect attempts.",
+    default=60.0,
+    show_default=True,
+)
+@click.option(
+    "--spool",
+    "spool_path",
+    help="Directory where undelivered events are kept until the target is back.",
+    type=click.Path(file_okay=False, writable=True),
+)
+@click.option(
+    "--spool-max-bytes",
+    help="Maximum disk usage of the spool, the oldest events are dropped beyond it.",
+    default=1 << 30,
+    show_default=True,
+)
+@click.option(
+    "--spool-segment-bytes",
+    help="Size of each spool segment, acknowledged segments are deleted.",
+    default=16 << 20,
+    show_default=True,
+)
+@click.option(
+    "--spool-compact-bytes",
+    help="Size past which a drained spool segment is rotated and deleted.",
+    default=1 << 20,
+    show_default=True,
+)
+@click.option(
+    "--spool-fsync-every",
+    help="Number of spooled events written between two fsync calls.",
+    default=64,
+    show_default=True,
+)
+@click.option(
+    "--on-failure",
+    help="What fan-out targets do with undelivered events. [default: spool with "
+    "--spool, drop otherwise]",
+    type=click.Choice(POLICIES),
+)
+@click.option(
+    "--target-queue-size",
+    help="Maximum number of events waiting for each fan-out target.",
+    default=1024,
+    show_default=True,
+)
+@click.option(
+    "--record",
+    "record_path",
+    help="Also write every event to this recording file (a directory of recordings "
+    "with --channels), replay it with smee-replay.",
+    type=click.Path(writable=True),
+)
+@click.option(
+    "--passthrough/--no-passthrough",
+    help="Forward the webhook body without decoding and re-encoding it.",
+    default=False,
+    show_default=True,
+)
 @click_log.simple_verbosity_option(logger, "-l", "--logging", show_default=True)
-def smee(url, target, port, path):
+def smee(
+    url,
+    target,
+    channels,
+    port,
+    path,
+    use_async,
+    concurrency,
+    pool_size,
+    connect_timeout,
+    read_timeout,
+    retries,
+    retry_backoff,
+    reconnect,
+    max_backoff,
+    spool_path,
+    spool_max_bytes,
+    spool_segment_bytes,
+    spool_compact_bytes,
+    spool_fsync_every,
+    on_failure,
+    target_queue_size,
+    record_path,
+    passthrough,
+):
     """
     Webhook data delivery client.
 
     Please visit https://smee.io for more information.
     """
-    if target is None:
-        target = urljoin(f"http://127.0.0.1:{port}/", path)
+    if not target:
+        target = [urljoin(f"http://127.0.0.1:{port}/", path)]
+    if on_failure is None:
+        on_failure = DROP if spool_path is None else SPOOL
+
+    def make_transport(target):
+        return Transport(
+            target,
+            pool_size=max(pool_size, concurrency) if use_async else pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries=retries,
+            backoff_factor=retry_backoff,
+        )
+
+    def make_spool(spool_path):
+        if spool_path is None:
+            return None
+        return Spool(
+            spool_path,
+            max_bytes=spool_max_bytes,
+            segment_bytes=spool_segment_bytes,
+            compact_bytes=spool_compact_bytes,
+            fsync_every=spool_fsync_every,
+        )
+
+    def make_fanout(targets, spool_path, record_path):
+        fanout = []
+        if record_path is not None:
+            recorder = Recorder(record_path)
+            fanout.append(Target(recorder, DROP, queue_size=target_queue_size))
+        for t in targets:
+            t = t if isinstance(t, dict) else {"url": t}
+            url, policy = t["url"], t.get("policy", on_failure)
+            spool = None
+            if spool_path is not None:
+                spool = make_spool(os.path.join(spool_path, slug(url)))
+            try:
+                fanout.append(
+                    Target(make_transport(url), policy, spool, target_queue_size)
+                )
+            except ValueError as e:
+                raise click.UsageError(f"{url}: {e}")
+        return FanOut(fanout)
+
+    def make_client(
+        source,
+        target,
+        spool_path=spool_path,
+        record_path=record_path,
+        cls=SmeeClient,
+        **kwargs,
+    ):
+        targets = [target] if isinstance(target, str) else list(target)
+        if len(targets) == 1 and isinstance(targets[0], str) and record_path is None:
+            transport, spool = make_transport(targets[0]), make_spool(spool_path)
+        else:
+            transport, spool = make_fanout(targets, spool_path, record_path), None
+        client = cls(
+            source,
+            transport.url,
+            transport,
+            spool=spool,
+            passthrough=passthrough,
+            reconnect=reconnect,
+            max_backoff=max_backoff,
+            **kwargs,
+        )
+        logger.info(f"Forwarding {client.source} to {transport.url}")
+        return client
+
+    if channels is not None:
+        use_async = True
+
+        def make_channel(source, target):
+            kwargs = {}
+            if spool_path is not None:
+                kwargs["spool_path"] = os.path.join(spool_path, slug(source))
+            if record_path is not None:
+                os.makedirs(record_path, exist_ok=True)
+                kwargs["record_path"] = os.path.join(record_path, f"{slug(source)}.rec")
+            return make_client(source, target, **kwargs)
+
+        client = MultiSmeeClient.connect(
+            json.load(channels), make_channel, concurrency=concurrency
+        )
+    elif use_async:
+        client = make_client(url, target, cls=AsyncSmeeClient, concurrency=concurrency)
+    else:
+        client = make_client(url, target)
+    try:
+        client.run()
+    finally:
+        client.close()
+
+
+@click.command(name="smee-relay")
+@click.version_option("0.0.1")
+@click.option(
+    "-h", "--host", help="Address to listen on.", default="127.0.0.1", show_default=True
+)
+@click.option(
+    "-p", "--port", help="Port to listen on.", default=3300, show_default=True
+)
+@click.option(
+    "--buffer-size",
+    help="Events kept per channel for reconnecting clients (Last-Event-ID).",
+    default=1024,
+    show_default=True,
+)
+@click.option(
+    "--ping-interval",
+    help="Seconds between ping events.",
+    default=30.0,
+    show_default=True,
+)
+@click.option(
+    "--max-subscriber-buffer",
+    help="Bytes a subscriber may lag behind before it is disconnected.",
+    default=4 << 20,
+    show_default=True,
+)
+@click.option(
+    "--channel-ttl",
+    help="Seconds a channel without subscribers keeps its buffered events.",
+    default=60.0,
+    show_default=True,
+)
+@click_log.simple_verbosity_option(logger, "-l", "--logging", show_default=True)
+def relay(host, port, buffer_size, ping_interval, max_subscriber_buffer, channel_ttl):
+    """
+    Local smee.io compatible webhook relay.
+
+    POST webhooks to http://{host}:{port}/{channel}, and forward them with
+    ``smee --url http://{host}:{port}/{channel}``.
+    """
+    server = Relay(
+        host,
+        port,
+        buffer_size=buffer_size,
+        ping_interval=ping_interval,
+        max_subscriber_buffer=max_subscriber_buffer,
+        channel_ttl=channel_ttl,
+    )
+    loop = asyncio.get_event_loop()
+    try:
+        loop.run_until_complete(server.serve_forever())
+    except KeyboardInterrupt:
+        loop.run_until_complete(server.close())
+
+
+@click.command(name="smee-replay")
+@click.version_option("0.0.1")
+@click.argument("recording", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-t",
+    "--target",
+    help="Full URL (including protocol and path) of the target service.",
+    default="http://127.0.0.1:3000/",
+    show_default=True,
+)
+@click.option(
+    "-s",
+    "--speed",
+    "replay_speed",
+    help="Replay speed, 1x is the recorded pace, 10x is ten times faster, and max "
+    "is as fast as possible.",
+    default="1x",
+    show_default=True,
+)
+@click.option(
+    "--async/--no-async",
+    "use_async",
+    help="Forward the events concurrently.",
+    default=False,
+    show_default=True,
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    help="Maximum number of events forwarded at once, requires --async.",
+    default=8,
+    show_default=True,
+)
+@click_log.simple_verbosity_option(logger, "-l", "--logging", show_default=True)
+def replay(recording, target, replay_speed, use_async, concurrency):
+    """
+    Replays a recording made with ``smee --record`` against the target.
+
+    Prints the throughput, and the delivery latency percentiles.
+    """
+    try:
+        replay_speed = speed(replay_speed)
+    except ValueError:
+        raise click.BadParameter(f"{replay_speed!r}", param_hint="--speed")
+
+    transport = Transport(target, pool_size=max(10, concurrency))
+    kwargs = dict(speed=replay_speed)
+    cls = ReplayClient
+    if use_async:
+        cls, kwargs["concurrency"] = AsyncReplayClient, concurrency
+    client = cls(recording, target, transport, **kwargs)
+    try:
+        client.run()
+    finally:
+        client.close()
+
+    report = client.report()
+    click.echo(
+        f"{report['events']} events in {report['elapsed']:.2f}s "
+        f"({report['throughput']:,.1f} events/s), "
+        f"{report['delivered']} delivered, {report['failed']} failed."
+    )
+    latency = ", ".join(
+        f"{k} {report[f'latency_{k}'] * 1000:.1f}ms"
+        for k in ["mean", "p50", "p90", "p99", "max"]
+    )
+    click.echo(f"latency {latency}")
+    if report["lag"]:
+        click.echo(f"fell up to {report['lag']:.2f}s behind the recorded pace.")
+
 
-    client = SmeeClient(source=url, target=target)
-    logger.info(f"Forwarding {client.source} to {target}")
-    client.run()
+def slug(url: str) -> str:
+    """A file-system friendly name for the channel URL."""
+    u = urlparse(url)
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{u.netloc}{u.path}").strip("_")
@@ -0,0 +1,95 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""
+Splits smee envelopes into the webhook headers and body.
+
+smee.io wraps every webhook in one JSON object, the request headers followed by
+``body``, ``query`` and ``timestamp``, serialized with ``JSON.stringify``.
+"""
+
+import codecs
+import json
+from typing import Dict, Optional, Tuple
+
+_BODY = '"body":'
+_QUERY = ',"query":'
+_WHITESPACE = " \t\n\r"
+
+
+def _escape_non_ascii(e: UnicodeEncodeError):
+    """Escapes non-ASCII characters the way ``json.dumps(ensure_ascii=True)`` does."""
+    escaped = []
+    start, end = e.start, e.end
+    for c in e.object[start:end]:
+        n = ord(c)
+        if n > 0xFFFF:
+            n -= 0x10000
+            escaped.append(f"\\u{0xD800 | (n >> 10):04x}\\u{0xDC00 | (n & 0x3FF):04x}")
+        else:
+            escaped.append(f"\\u{n:04x}")
+    return "".join(escaped), e.end
+
+
+codecs.register_error("zeroae.smee.json", _escape_non_ascii)
+
+
+def parse(data: str) -> Tuple[Dict[str, str], bytes]:
+    """Decodes the whole envelope, and re-serializes the body as compact JSON."""
+    envelope = json.loads(data)
+    body = json.dumps(envelope.pop("body"), separators=(",", ":"))
+    _ = envelope.pop("query")
+    _ = envelope.pop("timestamp")
+    return envelope, body.encode("utf-8")
+
+
+def split(data: str) -> Optional[Tuple[Dict[str, str], bytes]]:
+    """
+    Slices the body out of the envelope text, without decoding it.
+
+    Only the (small) headers and the ``query``/``timestamp`` tail are decoded. The
+    body is returned as the same compact, ASCII-only JSON ``parse`` would produce.
+
+    :return: None if the envelope is not compact JSON in the smee.io field order.
+    """
+    start = data.find(_BODY)
+    if start < 1 or data[start - 1] not in "{,":
+        return None
+
+    # The last ',"query":' that starts a valid JSON tail is the top-level one,
+    # later matches belong to the query itself.
+    end = len(data)
+    while True:
+        end = data.rfind(_QUERY, start, end)
+        if end == -1:
+            return None
+        try:
+            tail = json.loads("{" + data[end:].lstrip(","))
+        except ValueError:
+            continue
+        if isinstance(tail, dict) and "timestamp" in tail:
+            break
+
+    body_start = start + len(_BODY)
+    body = data[body_start:end]
+    if not body or body[0] in _WHITESPACE or body[-1] in _WHITESPACE:
+        return None
+
+    headers = json.loads(data[: start - 1] + "}") if start > 1 else {}
+    for k, v in tail.items():
+        if k not in ("query", "timestamp"):
+            headers[k] = v
+    return headers, body.encode("ascii", "zeroae.smee.json")
@@ -15,10 +15,17 @@
 # ------------------------------------------------------------------------------
 
 from dataclasses import dataclass
+from typing import Iterator, List
 
 import requests
 from requests.compat import json as complexjson
 
+#: Default number of bytes requested per read from the event-stream.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_LF, _COLON, _SPACE = 0x0A, 0x3A, 0x20
+_BOM = b"\xef\xbb\xbf"
+
 
 @dataclass
 class Event:
@@ -63,29 +70,157 @@ def get(url: str, **kwargs):
         return s.get(url, **kwargs)
 
 
-def iter_events(r: requests.models.Response) -> Event:
+class EventStreamParser(object):
+    """
+    Incremental text/event-stream parser working on raw byte chunks.
+
+    Lines are delimited by CR, LF or CRLF, and are located in the internal
+    buffer by offset; only the ``data``, ``event`` and ``id`` values are ever
+    decoded, and ``data`` is decoded once per dispatched event.
+
+    ref: https://html.spec.whatwg.org/multipage/server-sent-events.html
+    """
+
+    def __init__(self, retry: int = None, encoding: str = "utf-8"):
+        self.encoding = encoding
+        self.last_event_id: str = None
+        self.retry: int = Event.retry if retry is None else retry
+
+        self._buffer = bytearray()
+        self._skip_lf = False
+        self._first = True
+        self._reset()
+
+    def _reset(self):
+        self._id = None
+        self._event = None
+        self._data = None
+
+    def feed(self, chunk: bytes) -> List[Event]:
+        """Consumes a chunk of bytes, returns the Events it completed."""
+        buf = self._buffer
+        buf += chunk
+        events = []
+
+        pos, end = 0, len(buf)
+        if self._first:
+            if end < len(_BOM) and _BOM.startswith(buf):
+                return events
+            self._first = False
+            if buf.startswith(_BOM):
+                pos = len(_BOM)
+        if self._skip_lf and pos < end:
+            self._skip_lf = False
+            if buf[pos] == _LF:
+                pos += 1
+
+        if buf.find(b"\r", pos) == -1:
+            # Fast path, the overwhelmingly common LF-only stream.
+            while True:
+                eol = buf.find(b"\n", pos)
+                if eol == -1:
+                    break
+                self._process(buf, pos, eol, events)
+                pos = eol + 1
+        else:
+            while pos < end:
+                lf = buf.find(b"\n", pos)
+                cr = buf.find(b"\r", pos, end if lf == -1 else lf)
+                if cr != -1:
+                    eol, nxt = cr, cr + 1
+                    if nxt == end:
+                        self._skip_lf = True
+                    elif buf[nxt] == _LF:
+                        nxt += 1
+                elif lf != -1:
+                    eol, nxt = lf, lf + 1
+                else:
+                    break
+                self._process(buf, pos, eol, events)
+                pos = nxt
+
+        del buf[:pos]
+        return events
+
+    def _process(self, buf: bytearray, pos: int, eol: int, events: List[Event]):
+        if pos == eol:
+            self._dispatch(events)
+            return
+        if buf[pos] == _COLON:
+            # Ignore comments
+            return
+
+        colon = buf.find(b":", pos, eol)
+        if colon == -1:
+            name_end = value = eol
+        else:
+            name_end, value = colon, colon + 1
+            if value < eol and buf[value] == _SPACE:
+                value += 1
+
+        size = name_end - pos
+        if size == 4 and buf.startswith(b"data", pos):
+            line = buf[value:eol]
+            if self._data is None:
+                self._data = [line]
+            else:
+                self._data.append(line)
+        elif size == 5 and buf.startswith(b"event", pos):
+            self._event = buf[value:eol].decode(self.encoding, "replace")
+        elif size == 2 and buf.startswith(b"id", pos):
+            if buf.find(b"\0", value, eol) == -1:
+                self._id = buf[value:eol].decode(self.encoding, "replace")
+        elif size == 5 and buf.startswith(b"retry", pos):
+            retry = buf[value:eol]
+            if retry.isdigit():
+                self.retry = int(retry)
+
+    def _dispatch(self, events: List[Event]):
+        if self._id is not None:
+            self.last_event_id = self._id
+        if self._data is not None:
+            data = self._data[0] if len(self._data) == 1 else b"\n".join(self._data)
+            event = Event(id=self._id, retry=self.retry)
+            if self._event:
+                event.event = self._event
+            event._data = data.decode(self.encoding, "replace")
+            events.append(event)
+        self._reset()
+
+
+def iter_chunks(r: requests.models.Response, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Iterates over the raw response bytes as soon as they arrive.
+
+    ``Response.iter_content`` blocks until ``chunk_size`` bytes are available,
+    so whenever possible we use ``read1`` to return whatever is already buffered,
+    up to ``chunk_size`` bytes.
+    """
+    raw = r.raw
+    read1 = getattr(raw, "read1", None)
+    if read1 is None and "content-encoding" not in r.headers:
+        read1 = getattr(getattr(raw, "_fp", None), "read1", None)
+    if read1 is None:
+        yield from r.iter_content(chunk_size=chunk_size)
+        return
+
+    while True:
+        chunk = read1(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_events(
+    r: requests.models.Response, chunk_size: int = DEFAULT_CHUNK_SIZE, retry: int = None
+) -> Iterator[Event]:
     """Iterates over the source data, one Event at a time.
     When stream=True is set on the request, this avoids reading the
     content at once into memory for large responses.
     .. note:: This method is not reentrant safe.
     """
-
-    event = None
-    r.encoding = r.encoding if r.encoding else "utf-8"
-    for line in r.iter_lines(chunk_size=128, decode_unicode=True):
-        if not line:
-            if event is not None and event.data is not None:
-                yield event
-            event = None
-        elif line.startswith(":"):
-            # Ignore comments
-            pass
-        else:
-            if event is None:
-                event = Event()
-            k, v = line.split(":", maxsplit=1) if ":" in line else (line, "")
-            if hasattr(event, k):
-                event.__setattr__(k, v[1:] if v.startswith(" ") else v)
+    parser = EventStreamParser(retry=retry)
+    for chunk in iter_chunks(r, chunk_size):
+        yield from parser.feed(chunk)
 
 
 requests.models.Response.iter_events = iter_events
@@ -0,0 +1,244 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Fan-out delivery of every smee event to several targets."""
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import requests
+
+from .metrics import LatencyStats
+from .spool import Record, Spool, SpoolDrainer
+from .transport import Transport, failed
+
+logger = logging.getLogger(__name__)
+
+#: Failure policies, what a target does with an event it could not deliver.
+DROP, RETRY, SPOOL = "drop", "retry", "spool"
+POLICIES = (DROP, RETRY, SPOOL)
+
+
+class Target(object):
+    """
+    One fan-out target, with its own delivery queue, worker thread and policy.
+
+    Events that could not be delivered (or did not fit in the queue) are dropped,
+    retried with an exponential backoff (blocking this target's queue only), or
+    appended to the target's spool and replayed in order once it is back.
+    """
+
+    def __init__(
+        self,
+        transport: Transport,
+        policy: str = DROP,
+        spool: Spool = None,
+        queue_size: int = 1024,
+        max_backoff: float = 30.0,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(
+                f"Unknown failure policy {policy!r}, use one of {POLICIES}"
+            )
+        if policy == SPOOL and spool is None:
+            raise ValueError(f"The {policy!r} policy requires a spool")
+        self.transport = transport
+        self.policy = policy
+        self.spool = spool
+        self.max_backoff = max_backoff
+        self.latency = LatencyStats()
+        self.counters = Counter()
+
+        self._queue: "queue.Queue[Tuple[str, Dict[str, str], bytes]]" = queue.Queue(
+            queue_size
+        )
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(
+            target=self._run, name=f"smee-target-{transport.url}", daemon=True
+        )
+        self._drainer = None
+        if spool is not None:
+            self._drainer = SpoolDrainer(spool, self._replay, max_backoff)
+
+    @property
+    def url(self) -> str:
+        return self.transport.url
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """The delivery counters, queue depth and latency (in seconds) of this target."""
+        with self._lock:
+            stats = dict(self.counters)
+        stats["queued"] = self._queue.qsize()
+        if self.spool is not None:
+            stats["spooled_pending"] = len(self.spool)
+        stats.update({f"latency_{k}": v for k, v in self.latency.stats.items()})
+        return stats
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self.counters[key] += n
+
+    def start(self):
+        self._worker.start()
+        if self._drainer is not None:
+            self._drainer.start()
+
+    def stop(self, timeout: float = None):
+        """Delivers the queued events (waiting at most ``timeout``), then stops."""
+        self.flush(timeout)
+        self._stopped.set()
+        self._worker.join(timeout)
+        if self._drainer is not None:
+            self._drainer.stop(timeout)
+            self.spool.flush()
+        self.transport.close()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Waits until every queued event was handled, returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        self.transport.flush()
+        if self.spool is not None:
+            self.spool.flush()
+        return True
+
+    def put(self, event_id: str, headers: Dict[str, str], body: bytes):
+        """Queues the event without blocking, the overflow follows the policy."""
+        try:
+            self._queue.put_nowait((event_id, headers, body))
+        except queue.Full:
+            self.count("overflow")
+            if self.policy == SPOOL:
+                self._spool(event_id, headers, body)
+            else:
+                logger.warning(
+                    f"{self.url} is falling behind, event {event_id} dropped."
+                )
+                self.count("dropped")
+
+    def _run(self):
+        while not (self._stopped.is_set() and self._queue.empty()):
+            try:
+                event_id, headers, body = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._deliver(event_id, headers, body)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, event_id: str, headers: Dict[str, str], body: bytes):
+        if self.policy == SPOOL and len(self.spool):
+            # Keep the delivery order, the backlog must be replayed first.
+            self._spool(event_id, headers, body)
+            return
+
+        backoff = min(0.5, self.max_backoff)
+        while not self.post(event_id, headers, body):
+            if self.policy == SPOOL:
+                self._spool(event_id, headers, body)
+                return
+            if self.policy == DROP or self._stopped.is_set():
+                self.count("dropped")
+                return
+            self.count("retried")
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def post(self, event_id: str, headers: Dict[str, str], body: bytes) -> bool:
+        start = time.perf_counter()
+        try:
+            r = self.transport.post(body, headers)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            logger.warning(
+                f"Event {event_id} was not delivered. {self.url} did not respond."
+            )
+            self.count("failed")
+            return False
+        finally:
+            self.latency.record(time.perf_counter() - start)
+        if failed(r):
+            logger.warning(
+                f"Event {event_id} was not delivered. {self.url} answered "
+                f"{r.status_code}."
+            )
+            self.count("failed")
+            return False
+        self.count("delivered")
+        return True
+
+    def _spool(self, event_id: str, headers: Dict[str, str], body: bytes):
+        if self.spool.append(event_id, headers, body):
+            self.count("spooled")
+        else:
+            self.count("dropped")
+
+    def _replay(self, record: Record) -> bool:
+        return self.post(record.event_id, record.headers, record.body)
+
+
+class FanOut(object):
+    """
+    Delivers every event to all the targets, it quacks like a :class:`Transport`.
+
+    ``post`` only queues the event on each target, so a slow or unreachable target
+    never holds back the event-stream nor the other targets.
+    """
+
+    def __init__(self, targets: List[Target], stop_timeout: float = 30.0):
+        self.targets = targets
+        self.stop_timeout = stop_timeout
+        self.url = ", ".join(t.url for t in targets)
+        for t in targets:
+            t.start()
+
+    def post(self, data: bytes, headers: Dict[str, str]):
+        event_id = headers.get("x-github-delivery")
+        for t in self.targets:
+            t.put(event_id, headers, data)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """The connection counters of all the targets' transports, summed."""
+        stats = Counter(requests=0, connections=0, reused=0)
+        for t in self.targets:
+            stats.update(getattr(t.transport, "stats", {}))
+        return dict(stats)
+
+    @property
+    def target_stats(self) -> Dict[str, Dict[str, float]]:
+        return {t.url: t.stats for t in self.targets}
+
+    def flush(self):
+        """Waits (at most ``stop_timeout`` per target) for the queued deliveries."""
+        for t in self.targets:
+            if not t.flush(self.stop_timeout):
+                logger.warning(f"{t.url} still has {t.stats['queued']} events queued.")
+
+    def close(self):
+        for t in self.targets:
+            t.stop(self.stop_timeout)
@@ -0,0 +1,65 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Latency counters shared by the smee delivery paths."""
+
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyStats(object):
+    """
+    Counts, sums and keeps the latest ``window`` latency samples (in seconds).
+
+    Percentiles are computed over the window, so they describe recent behaviour.
+    """
+
+    def __init__(self, window: int = 4096):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._samples.append(seconds)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """The count, mean, max and p50/p90/p99 latencies, in seconds."""
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total, max_ = self.count, self.total, self.max
+        return dict(
+            count=count,
+            mean=total / count if count else 0.0,
+            p50=percentile(samples, 50),
+            p90=percentile(samples, 90),
+            p99=percentile(samples, 99),
+            max=max_,
+        )
+
+
+def percentile(samples, p: float) -> float:
+    """The nearest-rank percentile of the sorted samples."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
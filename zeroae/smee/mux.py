@@ -0,0 +1,113 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Fan-in of many smee channels, each forwarded to its own target, in one process."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Callable, Dict, Hashable, List
+
+from . import SmeeClient, logger
+from .aio import KeyedDispatcher, pump, repository_key
+
+
+class MultiSmeeClient(object):
+    """
+    Multiplexes several SmeeClient channels over a single event loop.
+
+    Each channel keeps its own connection, reconnect state, transport, spool and
+    counters. Each channel also delivers with its own ``concurrency`` workers,
+    ordered per ``key``, so a hung target only holds back its own channel.
+
+    Reading a channel blocks in ``requests``, so every channel gets a reader
+    thread. The threads only wait on their sockets, parsing and scheduling happen
+    on the event loop.
+    """
+
+    def __init__(
+        self,
+        clients: List[SmeeClient],
+        concurrency: int = 8,
+        key: Callable[[Dict[str, str], bytes], Hashable] = repository_key,
+    ):
+        self.clients = clients
+        self.concurrency = concurrency
+        self.key = key
+
+    @classmethod
+    def connect(
+        cls, channels: Dict[str, str], client_factory=SmeeClient, **kwargs
+    ) -> "MultiSmeeClient":
+        """
+        Connects to every ``source: target`` channel using client_factory.
+
+        If a channel fails to connect, the channels already connected are closed.
+        """
+        clients = []
+        try:
+            for source, target in channels.items():
+                clients.append(client_factory(source, target))
+        except BaseException:
+            for client in clients:
+                client.close()
+            raise
+        return cls(clients, **kwargs)
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """The delivery and connection counters of every channel, by source."""
+        return {
+            client.source: dict(client.stats, **client.transport.stats)
+            for client in self.clients
+        }
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            with ExitStack() as stack:
+                for client in self.clients:
+                    stack.enter_context(client.running())
+                loop.run_until_complete(self.arun())
+        finally:
+            loop.close()
+
+    async def arun(self):
+        with ThreadPoolExecutor(len(self.clients), "smee-reader") as readers:
+            await asyncio.gather(
+                *(self._forward(client, readers) for client in self.clients)
+            )
+
+    async def _forward(self, client: SmeeClient, readers: ThreadPoolExecutor):
+        loop = asyncio.get_event_loop()
+        # The delivery threads are started on demand, idle channels use none.
+        with ThreadPoolExecutor(self.concurrency, "smee-deliver") as executor:
+
+            async def deliver(client, *args):
+                await loop.run_in_executor(executor, client.deliver, *args)
+
+            dispatcher = KeyedDispatcher(deliver, self.concurrency)
+            try:
+                await pump(client, dispatcher, readers, self.key)
+            except Exception:
+                logger.exception(f"Stopped forwarding {client.source}")
+            else:
+                logger.info(f"Stopped forwarding {client.source}")
+            await dispatcher.join()
@@ -0,0 +1,236 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""
+Compressed, indexed recordings of webhook streams.
+
+A recording is a sequence of zlib compressed blocks of events (their arrival time,
+delivery id, headers and body bytes), followed by an index of the blocks. The
+index is written when the recording is closed, recordings that were not closed
+are read by scanning their blocks instead.
+"""
+
+import bisect
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from .event_stream import Event
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"ZSMEREC1"
+_BLOCK = struct.Struct("<IIdI")  # compressed length, events, first timestamp, crc32
+_RECORD = struct.Struct("<dII")  # timestamp, meta length, body length
+_FOOTER = struct.Struct("<QI8s")  # index offset, index length, magic
+_INDEX_MAGIC = b"ZSMEIDX1"
+
+
+@dataclass
+class RecordedEvent(Event):
+    """A message Event replayed from a recording, already split from its envelope."""
+
+    timestamp: float = 0.0
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+
+@dataclass
+class Block:
+    offset: int
+    events: int
+    timestamp: float
+
+
+class Recorder(object):
+    """
+    Appends webhooks to a recording, it quacks like a :class:`Transport`.
+
+    Events are buffered and compressed in blocks of up to ``block_bytes``, blocks
+    are written when full, every ``flush_interval`` seconds and on flush.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        block_bytes: int = 256 << 10,
+        flush_interval: float = 1.0,
+        level: int = 6,
+    ):
+        self.url = path
+        self.block_bytes = block_bytes
+        self.flush_interval = flush_interval
+        self.level = level
+        self.blocks: List[Block] = []
+        self.events = 0
+
+        self._lock = threading.Lock()
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._pending_timestamp = None
+        self._flushed_at = time.monotonic()
+        self._file = open(path, "wb")
+        self._file.write(_MAGIC)
+
+    def post(self, data: bytes, headers: Dict[str, str]):
+        self.record(time.time(), headers.get("x-github-delivery"), headers, data)
+
+    def record(
+        self, timestamp: float, event_id: str, headers: Dict[str, str], body: bytes
+    ):
+        meta = json.dumps({"id": event_id, "headers": headers}).encode("utf-8")
+        with self._lock:
+            if self._pending_timestamp is None:
+                self._pending_timestamp = timestamp
+            self._pending += [_RECORD.pack(timestamp, len(meta), len(body)), meta, body]
+            self._pending_bytes += _RECORD.size + len(meta) + len(body)
+            self.events += 1
+            full = self._pending_bytes >= self.block_bytes
+            if full or time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._write_block()
+
+    def _write_block(self):
+        if not self._pending:
+            return
+        data = zlib.compress(b"".join(self._pending), self.level)
+        count = len(self._pending) // 3
+        block = Block(self._file.tell(), count, self._pending_timestamp)
+        header = _BLOCK.pack(len(data), count, block.timestamp, zlib.crc32(data))
+        self._file.write(header + data)
+        self._file.flush()
+        self.blocks.append(block)
+        self._pending.clear()
+        self._pending_bytes = 0
+        self._pending_timestamp = None
+        self._flushed_at = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._write_block()
+
+    def close(self):
+        """Writes the last block and the index."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._write_block()
+            index = json.dumps(
+                [[b.offset, b.events, b.timestamp] for b in self.blocks]
+            ).encode("utf-8")
+            offset = self._file.tell()
+            self._file.write(index + _FOOTER.pack(offset, len(index), _INDEX_MAGIC))
+            self._file.close()
+
+
+class Recording(object):
+    """Reads the events of a recording, in order."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.blocks = self._read_index()
+
+    def __len__(self) -> int:
+        return sum(b.events for b in self.blocks)
+
+    @property
+    def duration(self) -> float:
+        """Seconds between the first and the last recorded events."""
+        last = None
+        for last in self._iter_blocks(self.blocks[-1:]):
+            pass
+        return 0.0 if last is None else last.timestamp - self.blocks[0].timestamp
+
+    def __iter__(self) -> Iterator[RecordedEvent]:
+        return self._iter_blocks(self.blocks)
+
+    def since(self, timestamp: float) -> Iterator[RecordedEvent]:
+        """The events recorded at or after ``timestamp``, found with the index."""
+        i = bisect.bisect_right([b.timestamp for b in self.blocks], timestamp)
+        first = max(i - 1, 0)
+        for event in self._iter_blocks(self.blocks[first:]):
+            if event.timestamp >= timestamp:
+                yield event
+
+    def _iter_blocks(self, blocks: List[Block]) -> Iterator[RecordedEvent]:
+        with open(self.path, "rb") as f:
+            for block in blocks:
+                f.seek(block.offset)
+                data = self._read_block(f)
+                if data is None:
+                    logger.warning(f"{self.path} is truncated at {block.offset}")
+                    return
+                yield from self._parse_block(data)
+
+    @staticmethod
+    def _read_block(f) -> Optional[bytes]:
+        header = f.read(_BLOCK.size)
+        if len(header) < _BLOCK.size:
+            return None
+        length, _, _, crc = _BLOCK.unpack(header)
+        data = f.read(length)
+        if len(data) < length or zlib.crc32(data) != crc:
+            return None
+        return zlib.decompress(data)
+
+    @staticmethod
+    def _parse_block(data: bytes) -> Iterator[RecordedEvent]:
+        pos, end = 0, len(data)
+        while pos < end:
+            timestamp, meta_length, body_length = _RECORD.unpack_from(data, pos)
+            pos += _RECORD.size
+            end_meta = pos + meta_length
+            end_body = end_meta + body_length
+            meta = json.loads(data[pos:end_meta])
+            body = data[end_meta:end_body]
+            pos = end_body
+            yield RecordedEvent(
+                id=meta["id"], timestamp=timestamp, headers=meta["headers"], body=body
+            )
+
+    def _read_index(self) -> List[Block]:
+        with open(self.path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{self.path} is not a webhook recording")
+            size = f.seek(0, os.SEEK_END)
+            if size >= len(_MAGIC) + _FOOTER.size:
+                f.seek(size - _FOOTER.size)
+                offset, length, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+                if magic == _INDEX_MAGIC:
+                    f.seek(offset)
+                    return [Block(*b) for b in json.loads(f.read(length))]
+            return self._scan(f)
+
+    def _scan(self, f) -> List[Block]:
+        """Rebuilds the index of a recording that was not closed."""
+        logger.info(f"{self.path} has no index, scanning its blocks.")
+        blocks = []
+        f.seek(len(_MAGIC))
+        while True:
+            offset = f.tell()
+            header = f.read(_BLOCK.size)
+            if len(header) < _BLOCK.size:
+                return blocks
+            length, events, timestamp, crc = _BLOCK.unpack(header)
+            data = f.read(length)
+            if len(data) < length or zlib.crc32(data) != crc:
+                return blocks
+            blocks.append(Block(offset, events, timestamp))
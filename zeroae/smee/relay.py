@@ -0,0 +1,351 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""
+A local, smee.io compatible, webhook relay.
+
+Webhooks POSTed to ``/<channel>`` are wrapped in the smee.io envelope (the request
+headers, ``body``, ``query`` and ``timestamp``) and broadcast as
+``text/event-stream`` to every client subscribed with ``GET /<channel>``.
+``GET /new`` redirects to a new random channel, like smee.io does.
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+_READY = b"event:ready\ndata:{}\n\n"
+_PING = b"event:ping\ndata:{}\n\n"
+_STREAM_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/event-stream\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Connection: keep-alive\r\n"
+    b"\r\n"
+)
+# Connection specific headers, they do not describe the webhook itself.
+_HOP_BY_HOP = frozenset(
+    ["host", "connection", "keep-alive", "content-length", "transfer-encoding"]
+)
+_FORM = "application/x-www-form-urlencoded"
+_REASONS = {
+    200: "OK",
+    307: "Temporary Redirect",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+}
+
+
+class Channel(object):
+    """
+    The subscribers of one channel, and a ring buffer of its latest events.
+
+    Events published in the same event-loop iteration are written to each
+    subscriber at once, so a burst costs one write per subscriber, not one per event.
+    """
+
+    def __init__(self, name: str, relay: "Relay"):
+        self.name = name
+        self.relay = relay
+        self.last_id = 0
+        self.buffer: Deque[Tuple[int, bytes]] = deque(maxlen=relay.buffer_size)
+        self.subscribers: Set[asyncio.StreamWriter] = set()
+        self._pending: List[bytes] = []
+        self._expiry: Optional[asyncio.TimerHandle] = None
+
+    def publish(self, envelope: bytes) -> int:
+        """Buffers the envelope and schedules its broadcast, returns its event id."""
+        self.last_id += 1
+        frame = b"id:%d\ndata:%s\n\n" % (self.last_id, envelope)
+        self.buffer.append((self.last_id, frame))
+        if not self._pending:
+            asyncio.get_event_loop().call_soon(self._flush)
+        self._pending.append(frame)
+        return self.last_id
+
+    def since(self, last_event_id: Optional[str]) -> List[bytes]:
+        """The buffered frames after ``last_event_id``, for a reconnecting client."""
+        try:
+            last_id = int(last_event_id)
+        except (TypeError, ValueError):
+            return []
+        return [frame for i, frame in self.buffer if i > last_id]
+
+    def subscribe(self, writer: asyncio.StreamWriter, frames: List[bytes]):
+        writer.write(b"".join([_STREAM_HEADERS, _READY, *frames]))
+        self.subscribers.add(writer)
+        self.relay.stats["subscribed"] += 1
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+
+    def unsubscribe(self, writer: asyncio.StreamWriter):
+        self.subscribers.discard(writer)
+        if not self.subscribers:
+            self.expire()
+
+    def expire(self):
+        """Drops the channel after ``channel_ttl`` seconds without a subscriber."""
+        if self._expiry is not None:
+            self._expiry.cancel()
+        ttl = self.relay.channel_ttl
+        self._expiry = asyncio.get_event_loop().call_later(ttl, self._drop)
+
+    def _drop(self):
+        self._expiry = None
+        if not self.subscribers and self.relay.channels.get(self.name) is self:
+            del self.relay.channels[self.name]
+            self.relay.stats["expired"] += 1
+
+    def ping(self):
+        self.broadcast(_PING)
+
+    def _flush(self):
+        data = b"".join(self._pending)
+        self._pending.clear()
+        self.relay.stats["broadcast"] += len(self.subscribers)
+        self.broadcast(data)
+
+    def broadcast(self, data: bytes):
+        max_buffer = self.relay.max_subscriber_buffer
+        for writer in list(self.subscribers):
+            if writer.transport.get_write_buffer_size() > max_buffer:
+                # The subscriber is not keeping up, let it reconnect and catch up.
+                logger.warning(f"Dropped a slow subscriber of {self.name}")
+                self.relay.stats["slow"] += 1
+                self.unsubscribe(writer)
+                writer.transport.abort()
+                continue
+            writer.write(data)
+
+
+class Relay(object):
+    """
+    An asyncio smee.io compatible relay server.
+
+    :param buffer_size: Events kept per channel for ``Last-Event-ID`` catch-up.
+    :param ping_interval: Seconds between ping events sent to the subscribers.
+    :param max_subscriber_buffer: Bytes a subscriber may lag behind before it is
+        disconnected.
+    :param max_body: Largest accepted webhook, in bytes.
+    :param channel_ttl: Seconds a channel without subscribers (and its buffered
+        events) is kept, for the clients to reconnect.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 3300,
+        buffer_size: int = 1024,
+        ping_interval: float = 30.0,
+        max_subscriber_buffer: int = 4 << 20,
+        max_body: int = 25 << 20,
+        channel_ttl: float = 60.0,
+    ):
+        self.host = host
+        self.port = port
+        self.buffer_size = buffer_size
+        self.ping_interval = ping_interval
+        self.max_subscriber_buffer = max_subscriber_buffer
+        self.max_body = max_body
+        self.channel_ttl = channel_ttl
+        self.channels: Dict[str, Channel] = {}
+        self.stats = Counter()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._pinger: Optional[asyncio.Task] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._closed: Optional[asyncio.Event] = None
+
+    def channel(self, name: str) -> Channel:
+        channel = self.channels.get(name)
+        if channel is None:
+            channel = self.channels[name] = Channel(name, self)
+            channel.expire()
+        return channel
+
+    def publish(
+        self,
+        name: str,
+        headers: Dict[str, str],
+        body: bytes,
+        query: Dict[str, str] = None,
+    ) -> int:
+        """
+        Wraps the webhook in the smee.io envelope and broadcasts it to the channel.
+
+        The body is re-serialized as compact JSON, like smee.io's ``JSON.stringify``.
+        Form encoded webhooks become an object of their fields (i.e. ``payload``).
+
+        :raises ValueError: if the body can not be decoded.
+        """
+        headers = {k: v for k, v in headers.items() if k not in _HOP_BY_HOP}
+        if headers.get("content-type", "").startswith(_FORM):
+            payload = dict(parse_qsl(body.decode("utf-8")))
+        else:
+            payload = json.loads(body)
+        envelope = json.dumps(headers, separators=(",", ":"))[:-1]
+        body = json.dumps(payload, separators=(",", ":"))
+        tail = json.dumps(
+            {"query": query or {}, "timestamp": int(time.time() * 1_000)},
+            separators=(",", ":"),
+        )
+        envelope = "".join(
+            [envelope, "," if headers else "", '"body":', body, ",", tail[1:]]
+        )
+        self.stats["published"] += 1
+        return self.channel(name).publish(envelope.encode("ascii"))
+
+    async def start(self) -> "Relay":
+        self._closed = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._pinger = asyncio.ensure_future(self._ping())
+        logger.info(f"Relaying webhooks on http://{self.host}:{self.port}/")
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.wait_closed()
+
+    async def close(self):
+        """Stops listening, and hangs up on the publishers and subscribers."""
+        if self._pinger is not None:
+            self._pinger.cancel()
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in self._connections:
+            writer.close()
+        if self._connections:
+            await self._closed.wait()
+        await self._server.wait_closed()
+
+    async def _ping(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            for channel in self.channels.values():
+                channel.ping()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        self._closed.clear()
+        try:
+            while await self._handle_request(reader, writer):
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception("Relay request failed")
+        finally:
+            writer.close()
+            self._connections.discard(writer)
+            if not self._connections:
+                self._closed.set()
+
+    async def _handle_request(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        """Serves one request, returns True if the connection can be reused."""
+        request_line = await reader.readline()
+        if not request_line:
+            return False
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            self._respond(writer, 400)
+            return False
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+
+        url = urlsplit(target)
+        name = url.path.strip("/")
+        if method == "GET" and name == "new":
+            location = f"/{secrets.token_urlsafe(12)}"
+            self._respond(writer, 307, headers={"Location": location})
+            return True
+        if not name:
+            self._respond(writer, 404)
+            return True
+
+        if method == "GET":
+            await self._subscribe(name, headers, reader, writer)
+            return False
+        if method != "POST":
+            self._respond(writer, 405)
+            return True
+
+        if "content-length" not in headers:
+            self._respond(writer, 411)
+            return False
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._respond(writer, 400)
+            return False
+        if length > self.max_body:
+            self._respond(writer, 413)
+            return False
+        body = await reader.readexactly(length)
+        try:
+            self.publish(name, headers, body, dict(parse_qsl(url.query)))
+        except ValueError:
+            self._respond(writer, 400)
+        else:
+            self._respond(writer, 200)
+        return headers.get("connection", "").lower() != "close"
+
+    async def _subscribe(
+        self,
+        name: str,
+        headers: Dict[str, str],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        channel = self.channel(name)
+        channel.subscribe(writer, channel.since(headers.get("last-event-id")))
+        try:
+            # Subscribers never send anything else, wait for them to hang up.
+            while await reader.read(4096):
+                pass
+        finally:
+            channel.unsubscribe(writer)
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: int, headers=None):
+        body = _REASONS[status].encode("ascii")
+        lines = [f"HTTP/1.1 {status} {_REASONS[status]}"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        lines += ["Content-Type: text/plain", f"Content-Length: {len(body)}", "", ""]
+        writer.write("\r\n".join(lines).encode("latin-1") + body)
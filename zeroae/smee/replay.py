@@ -0,0 +1,131 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Time-scaled replay of recorded webhooks, through the SmeeClient delivery path."""
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, Tuple
+
+from . import SmeeClient, event_stream
+from .aio import AsyncSmeeClient
+from .metrics import LatencyStats
+from .recording import RecordedEvent, Recording
+
+
+class Playback(object):
+    """
+    Plays a recording back as an event-stream, in place of the smee.io response.
+
+    Events are yielded on the recording's schedule divided by ``speed``, or as fast
+    as possible when ``speed`` is 0. ``lag`` is how far behind the schedule the
+    slowest event was read, i.e. when deliveries can not keep up.
+    """
+
+    def __init__(self, recording: Recording, speed: float = 1.0):
+        self.recording = recording
+        self.speed = speed
+        self.url = recording.path
+        self.lag = 0.0
+
+    def iter_events(self, retry: int = None) -> Iterator[RecordedEvent]:
+        start = origin = None
+        for event in self.recording:
+            if self.speed:
+                if start is None:
+                    start, origin = time.monotonic(), event.timestamp
+                delay = start + (event.timestamp - origin) / self.speed
+                delay -= time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.lag = max(self.lag, -delay)
+            yield event
+
+    def close(self):
+        pass
+
+
+@dataclass
+class ReplayClient(SmeeClient):
+    """
+    SmeeClient that forwards the events of a recording instead of a smee channel.
+
+    Every delivery is timed, ``report()`` returns the throughput and latencies.
+    """
+
+    speed: float
+    latency: LatencyStats
+
+    def __init__(self, recording: str, target, transport=None, speed=1.0, **kwargs):
+        self.speed = speed
+        self.latency = LatencyStats(window=1 << 20)
+        self._started = self._finished = None
+        kwargs.setdefault("reconnect", False)
+        super().__init__(recording, target, transport, **kwargs)
+
+    def _connect(self, url: str) -> Playback:
+        return Playback(Recording(url), self.speed)
+
+    def run(self):
+        self._started = time.perf_counter()
+        try:
+            super().run()
+        finally:
+            self._finished = time.perf_counter()
+
+    def unwrap(self, event: event_stream.Event) -> Tuple[Dict[str, str], bytes]:
+        if isinstance(event, RecordedEvent):
+            return event.headers, event.body
+        return super().unwrap(event)
+
+    def post(self, event_id: str, headers: Dict[str, str], body: bytes) -> bool:
+        start = time.perf_counter()
+        try:
+            return super().post(event_id, headers, body)
+        finally:
+            self.latency.record(time.perf_counter() - start)
+
+    def report(self) -> Dict[str, float]:
+        """Events per second, lag behind the schedule and delivery latencies."""
+        end = time.perf_counter() if self._finished is None else self._finished
+        elapsed = end - self._started if self._started is not None else 0.0
+        latency = self.latency.stats
+        return dict(
+            events=latency["count"],
+            delivered=self.stats["delivered"],
+            failed=self.stats["failed"],
+            elapsed=elapsed,
+            throughput=latency["count"] / elapsed if elapsed else 0.0,
+            lag=self._events.lag,
+            **{f"latency_{k}": v for k, v in latency.items() if k != "count"},
+        )
+
+
+class AsyncReplayClient(ReplayClient, AsyncSmeeClient):
+    """ReplayClient delivering up to ``concurrency`` events at a time."""
+
+
+def speed(value: str) -> float:
+    """Parses ``1x``, ``10x``, ``0.5`` or ``max`` (as fast as possible) speeds."""
+    value = value.strip().lower()
+    if value in ("max", "0", "0x"):
+        return 0.0
+    rv = float(value[:-1] if value.endswith("x") else value)
+    if not math.isfinite(rv) or rv < 0:
+        raise ValueError(f"Invalid replay speed {value}")
+    return rv
@@ -0,0 +1,342 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Durable, append-only on-disk spool for events the target did not accept."""
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<II")  # payload length, payload crc32
+_SUFFIX = ".log"
+_CURSOR = "cursor"
+
+
+@dataclass
+class Record:
+    event_id: str
+    headers: Dict[str, str]
+    body: bytes
+
+
+class Spool(object):
+    """
+    A segmented append-only log of undelivered events, read back in order.
+
+    Records are appended to the tail segment and fsync'ed in batches of
+    ``fsync_every`` records (or every ``fsync_interval`` seconds, the SpoolDrainer
+    also syncs the records appended just before an idle period). The read position
+    is persisted in the ``cursor`` file, so delivery is at-least-once across restarts.
+
+    Compaction deletes segments once every record in them has been acknowledged, a
+    drained tail is rotated once it is larger than ``compact_bytes``. When the spool
+    would grow past ``max_bytes`` the oldest segments are dropped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 1 << 30,
+        segment_bytes: int = 16 << 20,
+        compact_bytes: int = 1 << 20,
+        fsync_every: int = 64,
+        fsync_interval: float = 1.0,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.segment_bytes = min(segment_bytes, max_bytes)
+        self.compact_bytes = compact_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.dropped = 0
+
+        self._cv = threading.Condition()
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+        os.makedirs(path, exist_ok=True)
+        self._segments: List[int] = sorted(
+            int(name[: -len(_SUFFIX)])
+            for name in os.listdir(path)
+            if name.endswith(_SUFFIX) and name[: -len(_SUFFIX)].isdigit()
+        )
+        self._sizes = {
+            s: os.path.getsize(self._segment_path(s)) for s in self._segments
+        }
+        if not self._segments:
+            self._segments.append(0)
+            self._sizes[0] = 0
+        self._truncate_torn_tail()
+        self._writer = open(self._segment_path(self._segments[-1]), "ab")
+
+        self._reader = None
+        self._read_segment, self._read_offset = self._load_cursor()
+        self._peeked: Optional[int] = None
+        self._pending = self._count_pending()
+
+    def __len__(self) -> int:
+        """The number of records not yet acknowledged."""
+        return self._pending
+
+    @property
+    def size(self) -> int:
+        """The number of bytes used on disk."""
+        return sum(self._sizes.values())
+
+    def append(self, event_id: str, headers: Dict[str, str], body: bytes) -> bool:
+        meta = json.dumps({"id": event_id, "headers": headers}, separators=(",", ":"))
+        payload = meta.encode("utf-8") + b"\n" + body
+        record = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        if len(record) > self.segment_bytes:
+            logger.error(f"Event {event_id} is too large for the spool, dropped.")
+            self.dropped += 1
+            return False
+
+        with self._cv:
+            tail = self._segments[-1]
+            if self._sizes[tail] + len(record) > self.segment_bytes:
+                tail = self._rotate()
+            while self.size + len(record) > self.max_bytes:
+                self._drop_oldest()
+
+            self._writer.write(record)
+            self._writer.flush()
+            self._sizes[tail] += len(record)
+            self._pending += 1
+            self._unsynced += 1
+            elapsed = time.monotonic() - self._synced_at
+            if self._unsynced >= self.fsync_every or elapsed >= self.fsync_interval:
+                self._fsync()
+            self._cv.notify_all()
+        return True
+
+    def peek(self, timeout: float = None) -> Optional[Record]:
+        """Returns the oldest unacknowledged record, waiting up to timeout for one."""
+        with self._cv:
+            if not self._cv.wait_for(lambda: self._pending > 0, timeout):
+                return None
+            return self._read()
+
+    def ack(self):
+        """Acknowledges the record returned by the last peek."""
+        with self._cv:
+            if self._peeked is None:
+                return
+            self._read_offset, self._peeked = self._peeked, None
+            self._pending -= 1
+            self._compact()
+            self._save_cursor()
+
+    def flush(self):
+        with self._cv:
+            self._fsync()
+
+    def sync(self):
+        """Fsyncs the appended records once ``fsync_interval`` has passed."""
+        with self._cv:
+            if time.monotonic() - self._synced_at >= self.fsync_interval:
+                self._fsync()
+
+    def close(self):
+        with self._cv:
+            self._fsync()
+            self._writer.close()
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:012d}{_SUFFIX}")
+
+    def _fsync(self):
+        if self._unsynced:
+            os.fsync(self._writer.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def _rotate(self) -> int:
+        self._fsync()
+        self._writer.close()
+        tail = self._segments[-1] + 1
+        self._segments.append(tail)
+        self._sizes[tail] = 0
+        self._writer = open(self._segment_path(tail), "ab")
+        return tail
+
+    def _remove(self, segment: int):
+        self._segments.remove(segment)
+        del self._sizes[segment]
+        os.remove(self._segment_path(segment))
+
+    def _drop_oldest(self):
+        if len(self._segments) == 1:
+            self._rotate()
+        head = self._segments[0]
+        offset = self._read_offset if head == self._read_segment else 0
+        dropped, _ = self._scan(head, offset)
+        if head == self._read_segment:
+            self._close_reader()
+            self._read_segment, self._read_offset = self._segments[1], 0
+            self._peeked = None
+            self._save_cursor()
+        self._remove(head)
+        self._pending -= dropped
+        self.dropped += dropped
+        logger.warning(f"Spool is full, dropped {dropped} undelivered events.")
+
+    def _compact(self):
+        """Removes fully acknowledged segments, rotating a large drained tail."""
+        while self._read_offset >= self._sizes[self._read_segment]:
+            if self._read_segment == self._segments[-1]:
+                if self._read_offset == 0 or self._read_offset < self.compact_bytes:
+                    return
+                self._rotate()
+            self._close_reader()
+            self._remove(self._read_segment)
+            self._read_segment, self._read_offset = self._segments[0], 0
+
+    def _read(self) -> Optional[Record]:
+        while True:
+            self._compact()
+            if self._reader is None:
+                self._reader = open(self._segment_path(self._read_segment), "rb")
+            self._reader.seek(self._read_offset)
+            size, crc = _HEADER.unpack(self._reader.read(_HEADER.size))
+            payload = self._reader.read(size)
+            if len(payload) == size and zlib.crc32(payload) == crc:
+                break
+
+            # Skip the rest of a corrupted segment, but keep the ones after it.
+            logger.error(
+                f"Corrupted record in {self._segment_path(self._read_segment)} at "
+                f"offset {self._read_offset}, skipping the rest of the segment."
+            )
+            self._read_offset = self._sizes[self._read_segment]
+            self._pending = self._count_pending()
+            self._save_cursor()
+            if self._pending == 0:
+                return None
+
+        self._peeked = self._read_offset + _HEADER.size + size
+        meta, body = payload.split(b"\n", 1)
+        meta = json.loads(meta)
+        return Record(event_id=meta["id"], headers=meta["headers"], body=body)
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _scan(self, segment: int, offset: int):
+        """Returns the number of complete records after offset, and where they end."""
+        count = 0
+        size = self._sizes[segment]
+        if offset + _HEADER.size > size:
+            return count, offset
+        with open(self._segment_path(segment), "rb") as f:
+            while offset + _HEADER.size <= size:
+                f.seek(offset)
+                length, _ = _HEADER.unpack(f.read(_HEADER.size))
+                if offset + _HEADER.size + length > size:
+                    break
+                offset += _HEADER.size + length
+                count += 1
+        return count, offset
+
+    def _count_pending(self) -> int:
+        count = 0
+        for segment in self._segments:
+            if segment >= self._read_segment:
+                offset = self._read_offset if segment == self._read_segment else 0
+                count += self._scan(segment, offset)[0]
+        return count
+
+    def _truncate_torn_tail(self):
+        """Removes a partially written record left behind by a crash."""
+        tail = self._segments[-1]
+        _, end = self._scan(tail, 0)
+        if end != self._sizes[tail]:
+            logger.warning(f"Truncating partial record in {self._segment_path(tail)}")
+            os.truncate(self._segment_path(tail), end)
+            self._sizes[tail] = end
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.path, _CURSOR)) as f:
+                segment, offset = map(int, f.read().split())
+        except (OSError, ValueError):
+            return self._segments[0], 0
+        if segment not in self._sizes:
+            return self._segments[0], 0
+        return segment, offset
+
+    def _save_cursor(self):
+        cursor = os.path.join(self.path, _CURSOR)
+        with open(cursor + ".tmp", "w") as f:
+            f.write(f"{self._read_segment} {self._read_offset}")
+        os.replace(cursor + ".tmp", cursor)
+
+
+class SpoolDrainer(threading.Thread):
+    """Replays spooled records, in order, once the target accepts them again."""
+
+    def __init__(
+        self,
+        spool: Spool,
+        deliver: Callable[[Record], bool],
+        max_backoff: float = 30.0,
+    ):
+        super().__init__(name="smee-spool-drainer", daemon=True)
+        self.spool = spool
+        self.deliver = deliver
+        self.max_backoff = max_backoff
+        self._stopped = threading.Event()
+
+    def stop(self, timeout: float = None):
+        self._stopped.set()
+        self.join(timeout)
+
+    def run(self):
+        backoff = 0.5
+        while not self._stopped.is_set():
+            self.spool.sync()
+            record = self.spool.peek(timeout=min(0.5, self.spool.fsync_interval))
+            if record is None:
+                continue
+            if self.deliver(record):
+                self.spool.ack()
+                backoff = 0.5
+            else:
+                self._wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _wait(self, seconds: float):
+        """Waits for the backoff, still syncing the spool every fsync_interval."""
+        deadline = time.monotonic() + seconds
+        while not self._stopped.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._stopped.wait(min(remaining, self.spool.fsync_interval))
+            self.spool.sync()
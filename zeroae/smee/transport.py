@@ -0,0 +1,100 @@
+# ------------------------------------------------------------------------------
+#  Copyright (c) 2020 Zero A.E., LLC.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ------------------------------------------------------------------------------
+
+"""Pooled keep-alive HTTP transport used to forward events to their target."""
+
+from typing import Dict, Iterable
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# urllib3 renamed method_whitelist to allowed_methods in 1.26
+_ALLOWED_METHODS = (
+    "allowed_methods"
+    if hasattr(Retry, "DEFAULT_ALLOWED_METHODS")
+    else "method_whitelist"
+)
+
+
+def failed(response: requests.Response) -> bool:
+    """True if the target answered with a server error, even after the retries."""
+    # FanOut and Recorder only queue the events, they return no response.
+    return response is not None and response.status_code >= 500
+
+
+class Transport(object):
+    """
+    A keep-alive connection pool to a single target URL.
+
+    Connections are reused across deliveries, so only the first request (per pooled
+    connection) pays for the TCP and TLS handshakes.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = 10,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 30.0,
+        retries: int = 3,
+        backoff_factor: float = 0.3,
+        retry_statuses: Iterable[int] = (502, 503, 504),
+    ):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=retries,
+            read=0,
+            backoff_factor=backoff_factor,
+            status_forcelist=frozenset(retry_statuses),
+            raise_on_status=False,
+            **{_ALLOWED_METHODS: frozenset(["POST"])},
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    def post(self, data: bytes, headers: Dict[str, str]) -> requests.Response:
+        return self.session.post(
+            self.url, data=data, headers=headers, timeout=self.timeout
+        )
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Requests sent, connections opened, and requests sent on a reused connection."""
+        pools = self.adapter.poolmanager.pools
+        requests_sent = connections = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+        return dict(
+            requests=requests_sent,
+            connections=connections,
+            reused=max(requests_sent - connections, 0),
+        )
+
+    def flush(self):
+        """Posts are synchronous, there is never anything left to send."""
+
+    def close(self):
+        self.session.close()